@@ -0,0 +1,292 @@
+import argparse
+import importlib.util
+import json
+import math
+import os
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import boto3
+
+# Defaults for the action group under test
+DEFAULT_FUNCTION_NAME = os.environ.get('ACTION_GROUP_FUNCTION', 'trendboard-actiongroup')
+DEFAULT_WINDOW_MINUTES = 120
+DEFAULT_REPEAT = 3
+DEFAULT_TOP_K = 10
+SENTIMENTS = ("positive", "negative", "neutral")
+
+def load_label_counts(path):
+    """Load per-window label counts written by synthetic-data-generator.py"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def parse_window_start(key):
+    return datetime.strptime(key, "%Y-%m-%dT%H:%M:00Z")
+
+def window_truth(label_counts, window_minutes, end_time=None):
+    """Sum the label windows that fall inside the analysis window ending at end_time"""
+    window_size = timedelta(minutes=label_counts["window_minutes"])
+    windows = label_counts["windows"]
+    if not windows:
+        raise ValueError("Label counts contain no windows")
+    if end_time is None:
+        end_time = max(parse_window_start(key) for key in windows) + window_size
+    start_time = end_time - timedelta(minutes=window_minutes)
+
+    truth = {"posts": 0, "deceptive": 0, "hashtags": {}, "sentiment": {}, "brands": {}}
+    for key, window in windows.items():
+        window_start = parse_window_start(key)
+        if window_start < start_time or window_start + window_size > end_time:
+            continue
+        truth["posts"] += window["posts"]
+        truth["deceptive"] += window["deceptive"]
+        for field in ("hashtags", "sentiment"):
+            for name, count in window[field].items():
+                truth[field][name] = truth[field].get(name, 0) + count
+        for name, counts in window["brands"].items():
+            brand = truth["brands"].setdefault(name, dict.fromkeys(SENTIMENTS, 0))
+            for sentiment, count in counts.items():
+                brand[sentiment] += count
+    truth["start_time"] = start_time.isoformat() + "Z"
+    truth["end_time"] = end_time.isoformat() + "Z"
+    return truth
+
+def build_event(api_path, properties):
+    """Bedrock agent action group event for one API call"""
+    return {
+        "messageVersion": "1.0",
+        "actionGroup": "analytics-benchmark",
+        "apiPath": api_path,
+        "httpMethod": "POST",
+        "requestBody": {
+            "content": {
+                "application/json": {
+                    "properties": [
+                        {"name": name, "type": "string", "value": str(value)}
+                        for name, value in properties.items()
+                    ]
+                }
+            }
+        }
+    }
+
+def lambda_invoker(function_name):
+    """Invoke the deployed action group Lambda"""
+    lambda_client = boto3.client('lambda')
+
+    def invoke(event):
+        response = lambda_client.invoke(FunctionName=function_name, Payload=json.dumps(event).encode('utf-8'))
+        return json.loads(response['Payload'].read())
+    return invoke
+
+def local_invoker(path, corpus=None, reference_time=None):
+    """Call lambda_handler from a local action group file.
+
+    The action group reads its configuration at import, so the corpus and
+    reference time are set in the environment first. Its result cache is
+    turned off, or every repeat would time a cache hit.
+    """
+    if corpus:
+        os.environ['POSTS_CORPUS_PATH'] = corpus
+    if reference_time:
+        os.environ['ANALYSIS_REFERENCE_TIME'] = reference_time
+    os.environ['RESULT_CACHE_SIZE'] = '0'
+    spec = importlib.util.spec_from_file_location("action_group_under_test", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return lambda event: module.lambda_handler(event, None)
+
+def call_endpoint(invoke, api_path, properties):
+    """Call one endpoint, returning (latency_ms, body, error)"""
+    start = time.perf_counter()
+    try:
+        result = invoke(build_event(api_path, properties))
+        latency_ms = (time.perf_counter() - start) * 1000
+        response = result["response"]
+        body = response["responseBody"]["application/json"]
+        if isinstance(body, dict) and "body" in body and isinstance(body["body"], str):
+            body = json.loads(body["body"])
+        if response.get("httpStatusCode", 200) != 200:
+            return latency_ms, None, body.get("error", f"HTTP {response.get('httpStatusCode')}")
+        return latency_ms, body, None
+    except Exception as e:
+        return (time.perf_counter() - start) * 1000, None, f"{type(e).__name__}: {str(e)}"
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def relative_error(predicted, actual):
+    return abs(predicted - actual) / max(actual, 1)
+
+def score_sentiment(body, truth_counts):
+    """Percentage-point error of the sentiment split and relative error of the post count"""
+    total = sum(truth_counts.values())
+    distribution = body.get("sentimentDistribution", {})
+    errors = []
+    for sentiment in SENTIMENTS:
+        actual = truth_counts.get(sentiment, 0) * 100 / total if total else 0
+        predicted = distribution.get(sentiment, {}).get("percentage", 0)
+        errors.append(abs(predicted - actual))
+    return {
+        "sentiment_mae_pct": round(sum(errors) / len(errors), 2),
+        "post_count_error": round(relative_error(body.get("totalPosts", 0), total), 4)
+    }
+
+def score_fake_news(body, truth):
+    """Relative error of the suspicious post count against the injected deceptive posts"""
+    summary = body.get("summary", {})
+    detected = summary.get("totalSuspiciousPosts", len(body.get("fakeNewsDetections", [])))
+    return {
+        "deceptive_count_error": round(relative_error(detected, truth["deceptive"]), 4),
+        "detected": detected,
+        "actual": truth["deceptive"]
+    }
+
+def score_top_hashtags(body, truth, top_k):
+    """Precision of the reported top hashtags against the true top k"""
+    actual = sorted(truth["hashtags"].items(), key=lambda item: (-item[1], item[0]))[:top_k]
+    actual_tags = {tag for tag, _ in actual}
+    reported = [item.get("hashtag") for item in body.get("top_hashtags", [])[:top_k]]
+    hits = sum(1 for tag in reported if tag in actual_tags)
+    return {
+        "precision_at_k": round(hits / len(actual_tags), 4) if actual_tags else 0,
+        "reported": len(reported)
+    }
+
+def benchmark_endpoint(invoke, api_path, properties, repeat, score):
+    """Time repeated calls to one endpoint and score its last successful answer.
+
+    The first call loads the window and may miss caches the later ones hit, so
+    it is reported on its own and the percentiles cover the repeats after it.
+    """
+    latencies = []
+    errors = []
+    body = None
+    for _ in range(repeat):
+        latency_ms, result, error = call_endpoint(invoke, api_path, properties)
+        latencies.append(latency_ms)
+        if error:
+            errors.append(error)
+        else:
+            body = result
+    repeats = latencies[1:] or latencies
+    return {
+        "api_path": api_path,
+        "properties": properties,
+        "calls": repeat,
+        "failed_calls": len(errors),
+        "errors": sorted(set(errors)) or None,
+        "latency_ms": {
+            "first": round(latencies[0], 2) if latencies else 0,
+            "p50": round(percentile(repeats, 50), 2),
+            "p99": round(percentile(repeats, 99), 2),
+            "mean": round(sum(repeats) / len(repeats), 2) if repeats else 0
+        },
+        "score": score(body) if body is not None else None
+    }
+
+def run_benchmark(invoke, truth, window_minutes, repeat=DEFAULT_REPEAT, top_k=DEFAULT_TOP_K, brands=None):
+    """Score the sentiment, fake-news and trend endpoints against the label truth"""
+    time_window = f"{window_minutes}m"
+    results = []
+
+    brands = brands or sorted(truth["brands"])
+    for brand in brands:
+        truth_counts = truth["brands"].get(brand, dict.fromkeys(SENTIMENTS, 0))
+        results.append(benchmark_endpoint(
+            invoke, '/analyze-brand-sentiment', {"brand": brand, "timeWindow": time_window}, repeat,
+            lambda body, counts=truth_counts: score_sentiment(body, counts)
+        ))
+
+    results.append(benchmark_endpoint(
+        invoke, '/detect-fake-news', {"brand": "AnyCompany", "timeWindow": time_window}, repeat,
+        lambda body: score_fake_news(body, truth)
+    ))
+
+    results.append(benchmark_endpoint(
+        invoke, '/extract-top-hashtags-keywords',
+        {"time_window": f"{window_minutes} minutes", "limit": top_k}, repeat,
+        lambda body: score_top_hashtags(body, truth, top_k)
+    ))
+
+    return results
+
+def summarize(results):
+    """Roll endpoint results up per API path"""
+    summary = {}
+    for result in results:
+        entry = summary.setdefault(result["api_path"], {
+            "calls": 0, "failed_calls": 0, "first_ms": [], "p50_ms": [], "scores": []
+        })
+        entry["calls"] += result["calls"]
+        entry["failed_calls"] += result["failed_calls"]
+        entry["first_ms"].append(result["latency_ms"]["first"])
+        entry["p50_ms"].append(result["latency_ms"]["p50"])
+        if result["score"]:
+            entry["scores"].append(result["score"])
+    for entry in summary.values():
+        entry["first_ms"] = round(sum(entry["first_ms"]) / len(entry["first_ms"]), 2)
+        entry["p50_ms"] = round(sum(entry["p50_ms"]) / len(entry["p50_ms"]), 2)
+        numeric = {}
+        for score in entry["scores"]:
+            for name, value in score.items():
+                numeric.setdefault(name, []).append(value)
+        entry["scores"] = {name: round(sum(values) / len(values), 4) for name, values in numeric.items()}
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score the analytics action group against generator labels")
+    parser.add_argument('--label-counts', required=True,
+                        help="Per-window label counts from synthetic-data-generator.py --label-counts")
+    parser.add_argument('--function-name', default=DEFAULT_FUNCTION_NAME, help="Action group Lambda to invoke")
+    parser.add_argument('--local', default=None, help="Call lambda_handler from this file instead of invoking Lambda")
+    parser.add_argument('--corpus', default=None,
+                        help="With --local, analyse this generator JSONL output (sets POSTS_CORPUS_PATH) so the "
+                             "windows match the labels instead of querying the knowledge base")
+    parser.add_argument('--reference-time', choices=['latest', 'now'], default='latest',
+                        help="With --local, ANALYSIS_REFERENCE_TIME: 'latest' ends windows at the newest post, "
+                             "matching the default --end-time of the labels")
+    parser.add_argument('--window-minutes', type=int, default=DEFAULT_WINDOW_MINUTES)
+    parser.add_argument('--end-time', default=None, help="UTC end of the analysis window (default: last labelled window)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Calls per endpoint for latency stats")
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+    parser.add_argument('--brands', default=None, help="Comma-separated brands (default: every labelled brand)")
+    parser.add_argument('--output', default=None, help="Write the full report as JSON to this path")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        end_time = datetime.fromisoformat(args.end_time.rstrip('Z')) if args.end_time else None
+        truth = window_truth(load_label_counts(args.label_counts), args.window_minutes, end_time)
+        if args.local:
+            invoke = local_invoker(args.local, args.corpus, args.reference_time)
+        else:
+            invoke = lambda_invoker(args.function_name)
+        brands = args.brands.split(',') if args.brands else None
+
+        results = run_benchmark(invoke, truth, args.window_minutes, args.repeat, args.top_k, brands)
+        report = {
+            "target": args.local or args.function_name,
+            "window": {"start": truth["start_time"], "end": truth["end_time"], "posts": truth["posts"]},
+            "summary": summarize(results),
+            "results": results
+        }
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+        print(json.dumps(report["summary"], indent=2))
+        return report
+    except Exception as e:
+        print(f"Benchmark failed: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        raise
+
+if __name__ == "__main__":
+    main()
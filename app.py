@@ -122,9 +122,16 @@ DUMMY_USER = "admin"
 DUMMY_PASS = "password123"
 
 # API endpoints
-CHATBOT_API = "https://hng6z3kml8.execute-api.us-east-1.amazonaws.com/default/simple-streamlit-chatbot/embeddings"
+CHATBOT_API = os.environ.get("CHATBOT_API", "https://hng6z3kml8.execute-api.us-east-1.amazonaws.com/default/simple-streamlit-chatbot/embeddings")
+# Ask the chat endpoint to stream its answer as server-sent events. Off by default because the
+# deployed chat Lambda does not stream: API Gateway returns its events in one response. Only
+# chat-stream-test-server.py sends tokens as they are generated
+CHATBOT_STREAMING = os.environ.get("CHATBOT_STREAMING", "false").lower() == "true"
 QUICKSIGHT_API = "https://hng6z3kml8.execute-api.us-east-1.amazonaws.com/default/quicksight"
 
+# Competitor platforms compared against AnyCompany on the Brand Score tab
+COMPETITORS = ["Instagram", "Twitter", "TikTok", "Facebook", "Threads"]
+
 # Page configuration
 st.set_page_config(
     page_title="AnyCompany Platform",
@@ -292,6 +299,68 @@ def analyze_sentiment(text):
     except Exception as e:
         print(f"Error calling Bedrock: {str(e)}")
         return f"Error: {str(e)}"
+# Function for multi-brand sentiment comparison in a single agent call
+def compare_brand_sentiment(brands):
+    try:
+        brand_list = ", ".join(brands)
+        response = bedrock_runtime.invoke_agent(
+            agentId=st.session_state.sentiment_agent_id,
+            agentAliasId=st.session_state.sentiment_agent_alias_id,
+            sessionId=str(datetime.now().timestamp()),
+            inputText=f"""Compare the sentiment for these brands in one comparison: {brand_list}
+
+            Use a single brand comparison request for all of the brands rather than analyzing them one by one.
+
+            Format as a markdown table with one row per brand, highest net sentiment first:
+            | Brand | Posts | Share of Voice | Positive | Neutral | Negative | Net Sentiment | Trend | Top Topic |
+
+            Then add:
+            Leader: [brand with the highest net sentiment]
+            Key Observations:
+            - [Observation 1]
+            - [Observation 2]"""
+        )
+
+        final_answer = ""
+        for event in response.get('completion', []):
+            if 'chunk' in event:
+                final_answer += event['chunk']['bytes'].decode('utf-8')
+
+        if not final_answer:
+            return "Error: No response received from the brand comparison."
+        return final_answer.strip()
+
+    except Exception as e:
+        print(f"Error calling Bedrock: {str(e)}")
+        return f"Error: {str(e)}"
+
+# Function for reading a streamed chat answer
+def iter_chat_events(response):
+    """Yield (event, data) pairs from a server-sent event response"""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+    if data:
+        yield event, json.loads("\n".join(data))
+
+def read_chat_stream(response, placeholder):
+    """Render streamed tokens into the placeholder and return the final response data"""
+    streamed_text = ""
+    for event, data in iter_chat_events(response):
+        if event == "token":
+            streamed_text += data.get("text", "")
+            placeholder.markdown(streamed_text + "▌")
+        elif event == "done":
+            return data
+    raise RuntimeError("Chat stream ended before the answer was complete")
+
 # Function for QuickSight embedding
 def get_quicksight_q_embedding():
     try:
@@ -1405,19 +1474,25 @@ else:
                     # Prepare the request payload
                     payload = {
                         "query": prompt,
-                        "conversation_history": st.session_state.messages[-5:]
+                        "conversation_history": st.session_state.messages[-5:],
+                        "stream": CHATBOT_STREAMING
                     }
                     
                     # Make API call
                     response = requests.post(
                         CHATBOT_API,
                         json=payload,
-                        headers={"Content-Type": "application/json"}
+                        headers={"Content-Type": "application/json"},
+                        stream=CHATBOT_STREAMING
                     )
                     
                     if response.status_code == 200:
                         try:
-                            response_data = response.json()
+                            # Cached and video answers come back as plain JSON even when streaming
+                            if response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                                response_data = read_chat_stream(response, message_placeholder)
+                            else:
+                                response_data = response.json()
                             
                             # Handle video responses
                             if response_data.get('type') == 'video':
@@ -1787,6 +1862,26 @@ else:
             else:
                 st.warning("Please enter a brand name to analyze.")
 
+        st.subheader("⚖️ Competitor Comparison")
+        compare_input = st.text_input(
+            "Brands to compare:",
+            value=", ".join(["AnyCompany"] + COMPETITORS),
+            key="compare_brands_input",
+            help="Comma-separated brand names"
+        )
+
+        if st.button("Compare Brands", key="compare_button"):
+            brands = [brand.strip() for brand in compare_input.split(',') if brand.strip()]
+            if len(brands) >= 2:
+                with st.spinner(f"Comparing sentiment for {len(brands)} brands..."):
+                    comparison = compare_brand_sentiment(brands)
+                if comparison.startswith("Error:"):
+                    st.error(f"Comparison failed: {comparison}")
+                else:
+                    st.markdown(comparison)
+            else:
+                st.warning("Please enter at least two brands to compare.")
+
         
         with st.expander("Analysis Information"):
             st.markdown("""
@@ -1,3 +1,6 @@
+import time
+_MODULE_START = time.perf_counter()
+
 import boto3
 import json
 import os
@@ -6,21 +9,227 @@ import logging
 import hashlib
 import base64
 import re
-import time
 import random
 import traceback
-from opensearchpy import OpenSearch, RequestsHttpConnection
-from requests_aws4auth import AWS4Auth
+from array import array
+from collections import OrderedDict
+
+np = None  # NumPy is imported on first use by the semantic cache
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Simple in-memory cache
-response_cache = {}
+# Response cache: entries live until their TTL or until the byte budget evicts them
+RESPONSE_CACHE_TTL_SECONDS = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', 3600))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+RESPONSE_CACHE_SWEEP_SECONDS = 60
+# Messages of conversation history included in the LLM prompt
+HISTORY_CONTEXT_MESSAGES = 3
+# Queries that refer back to the conversation; only their answers depend on history
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|that|those|this|these|they|them|their|he|she|above|previous|earlier|again|more|else|also)\b"
+    r"|^(and|but|so|why|what about|how about)\b",
+    re.IGNORECASE
+)
+
+class ResponseCache:
+    """LRU cache with per-entry TTLs and a memory budget in bytes.
+
+    Expired entries are dropped lazily when looked up and by a sweep over the
+    whole cache at most every RESPONSE_CACHE_SWEEP_SECONDS; least recently
+    used entries are evicted while the cache is over its byte budget. Entry
+    size is the length of the response's JSON encoding.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.last_sweep = time.monotonic()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key):
+        self._maybe_sweep()
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            self._remove(key)
+            self.stats['expirations'] += 1
+            entry = None
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return entry[0]
+
+    def put(self, key, data, ttl=None):
+        size = len(json.dumps(data))
+        if key in self.entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (data, time.monotonic() + (ttl or self.ttl), size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.stats['evictions'] += 1
+
+    def _remove(self, key):
+        self.bytes -= self.entries.pop(key)[2]
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self.last_sweep < RESPONSE_CACHE_SWEEP_SECONDS:
+            return
+        self.last_sweep = now
+        for key in [key for key, entry in self.entries.items() if entry[1] <= now]:
+            self._remove(key)
+            self.stats['expirations'] += 1
+
+    def metrics(self):
+        return {**self.stats, 'entries': len(self.entries), 'bytes': self.bytes}
+
+response_cache = ResponseCache()
+
+# Milliseconds spent on imports and on each lazily initialized dependency, logged on cold start
+INIT_TIMINGS = {}
+INIT_TIMINGS_REPORTED = False
+
+def record_init(name, started):
+    """Record how long an initialization step took since started"""
+    INIT_TIMINGS[name] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info(f"Initialized {name} in {INIT_TIMINGS[name]} ms")
+
+record_init('imports', _MODULE_START)
+
+# Clients are created once per container on first use
+_clients = {}
+
+def get_client(service_name):
+    """Shared boto3 client for a service"""
+    client = _clients.get(service_name)
+    if client is None:
+        started = time.perf_counter()
+        client = boto3.client(service_name, region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+        _clients[service_name] = client
+        record_init(f"{service_name}_client", started)
+    return client
+
+_opensearch_modules = None
+
+def load_opensearch_modules():
+    """Import opensearchpy and requests_aws4auth on first use; only text queries need them"""
+    global _opensearch_modules
+    if _opensearch_modules is None:
+        started = time.perf_counter()
+        from opensearchpy import OpenSearch, RequestsHttpConnection
+        from requests_aws4auth import AWS4Auth
+        _opensearch_modules = (OpenSearch, RequestsHttpConnection, AWS4Auth)
+        record_init('opensearch_imports', started)
+    return _opensearch_modules
+
+# Pooled keep-alive connections to OpenSearch, kept for the life of the container
+OPENSEARCH_POOL_MAXSIZE = int(os.environ.get('OPENSEARCH_POOL_MAXSIZE', 10))
+OPENSEARCH_TIMEOUT_SECONDS = int(os.environ.get('OPENSEARCH_TIMEOUT_SECONDS', 10))
+
+class OpenSearchClientManager:
+    """Container-scoped OpenSearch client with SigV4 credentials refreshed near expiry.
+
+    The client and its requests session (and so its pooled TLS connections)
+    are built once. The manager itself is the session's auth hook: each
+    request is signed from the session's frozen credentials, which botocore
+    only refreshes when they near expiry, and the signer is rebuilt only when
+    they change.
+    """
+
+    def __init__(self, endpoint, region, service='aoss'):
+        self.endpoint = endpoint
+        self.region = region
+        self.service = service
+        self.credentials = boto3.Session().get_credentials()
+        self.signer = None
+        self.signer_key = None
+        self.client = None
+        self.stats = {'clients_created': 0, 'credential_refreshes': 0, 'requests_signed': 0}
+
+    def __call__(self, request):
+        self.stats['requests_signed'] += 1
+        return self._current_signer()(request)
+
+    def _current_signer(self):
+        frozen = self.credentials.get_frozen_credentials()
+        key = (frozen.access_key, frozen.token)
+        if key != self.signer_key:
+            _, _, AWS4Auth = load_opensearch_modules()
+            if self.signer_key is not None:
+                self.stats['credential_refreshes'] += 1
+            self.signer = AWS4Auth(frozen.access_key, frozen.secret_key, self.region, self.service,
+                                   session_token=frozen.token)
+            self.signer_key = key
+        return self.signer
+
+    def get_client(self):
+        """The shared OpenSearch client, created on first use"""
+        if self.client is None:
+            OpenSearch, RequestsHttpConnection, _ = load_opensearch_modules()
+            started = time.perf_counter()
+            self.client = OpenSearch(
+                hosts=[{'host': self.endpoint, 'port': 443}],
+                http_auth=self,
+                use_ssl=True,
+                verify_certs=True,
+                connection_class=RequestsHttpConnection,
+                pool_maxsize=OPENSEARCH_POOL_MAXSIZE,
+                timeout=OPENSEARCH_TIMEOUT_SECONDS
+            )
+            self.stats['clients_created'] += 1
+            record_init('opensearch_client', started)
+        return self.client
+
+    def connection_stats(self):
+        """Client, credential and HTTP connection reuse counters"""
+        opened = requests_sent = 0
+        if self.client is not None:
+            for connection in self.client.transport.connection_pool.connections:
+                # The same adapter is mounted for http:// and https://
+                for adapter in {id(adapter): adapter for adapter in connection.session.adapters.values()}.values():
+                    pools = adapter.poolmanager.pools
+                    for pool in (pools[key] for key in pools.keys()):
+                        opened += pool.num_connections
+                        requests_sent += pool.num_requests
+        return {
+            **self.stats,
+            'connections_opened': opened,
+            'http_requests': requests_sent,
+            'connection_reuse_rate': round(1 - opened / requests_sent, 4) if requests_sent else 0.0
+        }
+
+OPENSEARCH_MANAGER = None
+
+def get_opensearch_manager(endpoint, region):
+    """Shared OpenSearch client manager for the configured endpoint"""
+    global OPENSEARCH_MANAGER
+    if OPENSEARCH_MANAGER is None or OPENSEARCH_MANAGER.endpoint != endpoint or OPENSEARCH_MANAGER.region != region:
+        OPENSEARCH_MANAGER = OpenSearchClientManager(endpoint, region)
+    return OPENSEARCH_MANAGER
+
+def report_init_timings():
+    """Log the initialization profile once per container"""
+    global INIT_TIMINGS_REPORTED
+    if not INIT_TIMINGS_REPORTED:
+        INIT_TIMINGS_REPORTED = True
+        logger.info(f"Cold start init timings (ms): {json.dumps(INIT_TIMINGS)}")
+
+ENVIRONMENT_VALIDATED = False
 
 def validate_environment():
-    """Validate required environment variables"""
+    """Validate required environment variables once per container"""
+    global ENVIRONMENT_VALIDATED
+    if ENVIRONMENT_VALIDATED:
+        return
+    started = time.perf_counter()
     required_vars = [
         'OPENSEARCH_ENDPOINT',
         'USER_EMBEDDINGS_INDEX',
@@ -34,37 +243,314 @@ def validate_environment():
             raise Exception(f"Missing required environment variable: {var}")
         if var == 'OUTPUT_S3_BUCKET':
             try:
-                s3_client = boto3.client('s3')
-                s3_client.head_bucket(Bucket=value)
+                get_client('s3').head_bucket(Bucket=value)
             except Exception as e:
                 raise Exception(f"S3 bucket validation failed: {str(e)}")
+    # Only a successful validation is memoized, so a fixed configuration is picked up on the next call
+    ENVIRONMENT_VALIDATED = True
+    record_init('environment_validation', started)
+
+# Query embeddings: an in-process LRU of float32 vectors over an optional shared tier
+EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v2:0"
+EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', 2048))
+DEFAULT_EMBEDDING_CACHE_DIR = '/tmp/embedding-cache'
+
+def normalize_query(text):
+    """Case, spacing, quote and trailing punctuation differences don't change the embedding key"""
+    text = text.lower().replace('\u2019', "'").replace('\u2018', "'")
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text.rstrip('?!. ')
+
+class FileEmbeddingStore:
+    """Shared embedding tier as one float32 file per key, standing in for DynamoDB off AWS"""
+
+    def __init__(self, directory=DEFAULT_EMBEDDING_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.f32')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                vector = array('f')
+                vector.frombytes(f.read())
+                return vector
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, vector):
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(vector.tobytes())
+        os.replace(temp_path, path)
+
+class DynamoDBEmbeddingStore:
+    """Shared embedding tier on a DynamoDB table with a string partition key named embedding_key"""
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+
+    def get(self, key):
+        item = get_client('dynamodb').get_item(
+            TableName=self.table_name, Key={'embedding_key': {'S': key}}
+        ).get('Item')
+        if not item:
+            return None
+        vector = array('f')
+        vector.frombytes(item['vector']['B'])
+        return vector
+
+    def put(self, key, vector):
+        get_client('dynamodb').put_item(
+            TableName=self.table_name,
+            Item={'embedding_key': {'S': key}, 'vector': {'B': vector.tobytes()}}
+        )
+
+def create_embedding_store(backend=None):
+    """Shared embedding tier from EMBEDDING_CACHE_BACKEND: 'dynamodb', 'file' or 'none' (the default)"""
+    table_name = os.environ.get('EMBEDDING_CACHE_TABLE')
+    backend = backend or os.environ.get('EMBEDDING_CACHE_BACKEND') or ('dynamodb' if table_name else 'none')
+    if backend == 'dynamodb':
+        if not table_name:
+            raise ValueError("EMBEDDING_CACHE_TABLE is required for the dynamodb embedding cache backend")
+        return DynamoDBEmbeddingStore(table_name)
+    if backend == 'file':
+        return FileEmbeddingStore(os.environ.get('EMBEDDING_CACHE_DIR', DEFAULT_EMBEDDING_CACHE_DIR))
+    if backend == 'none':
+        return None
+    raise ValueError(f"Unknown embedding cache backend: {backend}")
+
+class EmbeddingCache:
+    """Bounded LRU of query embeddings stored as float32 arrays, over an optional shared tier"""
+
+    def __init__(self, store=None, size=EMBEDDING_CACHE_SIZE):
+        self.store = store
+        self.size = size
+        self.vectors = OrderedDict()
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'shared_errors': 0}
+
+    def get(self, key):
+        vector = self.vectors.get(key)
+        if vector is not None:
+            self.vectors.move_to_end(key)
+            self.stats['local_hits'] += 1
+            return vector
+        if self.store is not None:
+            try:
+                vector = self.store.get(key)
+            except Exception as e:
+                logger.error(f"Embedding cache read failed: {str(e)}")
+                self.stats['shared_errors'] += 1
+            if vector is not None:
+                self._remember(key, vector)
+                self.stats['shared_hits'] += 1
+                return vector
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, key, vector):
+        self._remember(key, vector)
+        if self.store is not None:
+            try:
+                self.store.put(key, vector)
+            except Exception as e:
+                logger.error(f"Embedding cache write failed: {str(e)}")
+                self.stats['shared_errors'] += 1
+
+    def _remember(self, key, vector):
+        self.vectors[key] = vector
+        self.vectors.move_to_end(key)
+        while len(self.vectors) > self.size:
+            self.vectors.popitem(last=False)
+
+EMBEDDING_CACHE = None
+
+def get_embedding_cache():
+    """Shared embedding cache, created on first use"""
+    global EMBEDDING_CACHE
+    if EMBEDDING_CACHE is None:
+        try:
+            store = create_embedding_store()
+        except Exception as e:
+            logger.error(f"Embedding cache backend unavailable, caching in process only: {str(e)}")
+            store = None
+        EMBEDDING_CACHE = EmbeddingCache(store)
+    return EMBEDDING_CACHE
+
+def get_query_embedding(bedrock_runtime, text):
+    """Titan embedding of a query, from the cache when an equivalent query was embedded before"""
+    cache = get_embedding_cache()
+    key = f"{EMBEDDING_MODEL_ID}:{normalize_query(text)}"
+    vector = cache.get(key)
+    if vector is None:
+        response = bedrock_runtime.invoke_model(
+            modelId=EMBEDDING_MODEL_ID,
+            contentType="application/json",
+            accept="application/json",
+            body=json.dumps({"inputText": text})
+        )
+        vector = array('f', json.loads(response['body'].read())['embedding'])
+        cache.put(key, vector)
+    logger.info(f"Embedding cache stats: {json.dumps(cache.stats)}")
+    return vector.tolist()
+
+def answer_history(user_query, conversation_history):
+    """The prompt's history messages if the query is a follow-up that depends on them, else None"""
+    if conversation_history and FOLLOW_UP_PATTERN.search(user_query):
+        return [
+            [message.get('role', ''), message.get('content', '')]
+            for message in conversation_history[-HISTORY_CONTEXT_MESSAGES:]
+        ]
+    return None
+
+def response_cache_key(user_query, conversation_history, is_video_request):
+    """Cache key from the normalized query, plus the prompt's history only for follow-up questions.
+
+    Retrieval only ever uses the query, and a standalone question gets the
+    same answer whatever was said before, so history is left out of the key
+    unless the query refers back to it.
+    """
+    key = {'query': normalize_query(user_query), 'video': is_video_request}
+    history = answer_history(user_query, conversation_history) if not is_video_request else None
+    if history:
+        key['history'] = history
+    return hashlib.md5(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+# Semantic cache: answers to recent queries, matched by query embedding similarity
+SEMANTIC_CACHE_SIZE = int(os.environ.get('SEMANTIC_CACHE_SIZE', 512))
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.95))
+
+def load_numpy():
+    global np
+    if np is None:
+        started = time.perf_counter()
+        import numpy
+        np = numpy
+        record_init('numpy_import', started)
+    return np
+
+class SemanticCache:
+    """In-process vector index of recently answered queries.
+
+    Unit-length query embeddings sit in a fixed float32 matrix used as a ring
+    buffer, so the oldest answer is replaced first. A lookup is one
+    matrix-vector product: the most similar live entry with the same
+    retrieval context hash is a hit if its cosine similarity reaches the
+    threshold.
+    """
+
+    def __init__(self, size=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        load_numpy()
+        self.size = size
+        self.threshold = threshold
+        self.ttl = ttl
+        self.vectors = None
+        self.contexts = np.zeros(size, dtype=np.int64)
+        self.expires = np.zeros(size)
+        self.responses = [None] * size
+        self.next_slot = 0
+        self.stats = {'hits': 0, 'misses': 0, 'entries': 0}
+
+    @staticmethod
+    def context_hash(context):
+        return int(hashlib.md5(json.dumps(context, sort_keys=True).encode()).hexdigest()[:15], 16)
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, embedding, context):
+        """(cached response, similarity) of the closest live answer with the same context, or (None, similarity)"""
+        if self.vectors is None:
+            self.stats['misses'] += 1
+            return None, 0.0
+        similarities = self.vectors @ self._unit(embedding)
+        live = (self.expires > time.monotonic()) & (self.contexts == self.context_hash(context))
+        if not live.any():
+            self.stats['misses'] += 1
+            return None, 0.0
+        similarities[~live] = -1.0
+        best = int(similarities.argmax())
+        similarity = float(similarities[best])
+        if similarity < self.threshold:
+            self.stats['misses'] += 1
+            return None, similarity
+        self.stats['hits'] += 1
+        return self.responses[best], similarity
+
+    def add(self, embedding, context, response):
+        vector = self._unit(embedding)
+        if self.vectors is None or self.vectors.shape[1] != len(vector):
+            self.vectors = np.zeros((self.size, len(vector)), dtype=np.float32)
+            self.expires[:] = 0
+        slot = self.next_slot
+        self.vectors[slot] = vector
+        self.contexts[slot] = self.context_hash(context)
+        self.expires[slot] = time.monotonic() + self.ttl
+        self.responses[slot] = response
+        self.next_slot = (slot + 1) % self.size
+        self.stats['entries'] = int((self.expires > 0).sum())
+
+SEMANTIC_CACHE = None
+
+def get_semantic_cache():
+    """Shared semantic cache, created on first use; None without NumPy"""
+    global SEMANTIC_CACHE
+    if SEMANTIC_CACHE is None:
+        try:
+            SEMANTIC_CACHE = SemanticCache()
+        except ImportError as e:
+            logger.error(f"Semantic cache disabled: {str(e)}")
+            SEMANTIC_CACHE = False
+    return SEMANTIC_CACHE or None
 
 def get_from_cache(key):
     """Get a response from the cache if it exists and is not expired"""
-    if key in response_cache:
-        entry = response_cache[key]
-        if entry['expiry'] > datetime.datetime.now().timestamp():
-            logger.info(f"Cache hit for key: {key}")
-            return entry['data']
-    return None
+    data = response_cache.get(key)
+    logger.info(f"Response cache {'hit' if data is not None else 'miss'}: {json.dumps(response_cache.metrics())}")
+    return data
 
-def store_in_cache(key, data, ttl=3600):
+def store_in_cache(key, data, ttl=RESPONSE_CACHE_TTL_SECONDS):
     """Store a response in the cache with an expiry time"""
-    expiry = datetime.datetime.now().timestamp() + ttl
-    response_cache[key] = {
-        'data': data,
-        'expiry': expiry
-    }
+    response_cache.put(key, data, ttl)
     logger.info(f"Stored in cache: {key}")
 
-import json
-import boto3
+def sse_event(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_llm_text(bedrock_runtime, model_id, llm_request):
+    """Yield the text of a Claude completion as Bedrock streams it"""
+    started = time.perf_counter()
+    response = bedrock_runtime.invoke_model_with_response_stream(
+        modelId=model_id,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(llm_request)
+    )
+    first_token = True
+    for event in response['body']:
+        if 'chunk' not in event:
+            raise RuntimeError(f"Bedrock stream error: {json.dumps(event, default=str)[:200]}")
+        chunk = json.loads(event['chunk']['bytes'])
+        if chunk.get('type') != 'content_block_delta':
+            continue
+        text = chunk.get('delta', {}).get('text', '')
+        if text:
+            if first_token:
+                logger.info(f"LLM time to first token: {(time.perf_counter() - started) * 1000:.2f} ms")
+                first_token = False
+            yield text
+    logger.info(f"LLM stream completed in {(time.perf_counter() - started) * 1000:.2f} ms")
 
 def generate_video_with_nova(text, s3_bucket):
     """Generate video using Nova Reel and store in S3"""
     try:
-        # Create the Bedrock Runtime client.
-        bedrock_runtime = boto3.client("bedrock-runtime")
+        bedrock_runtime = get_client("bedrock-runtime")
 
         # Create unique folder for this generation
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -118,6 +604,7 @@ def lambda_handler(event, context):
     try:
         # Log the entire event for debugging
         logger.info(f"Received event: {json.dumps(event)}")
+        report_init_timings()
         
         # Validate environment variables
         validate_environment()
@@ -168,33 +655,32 @@ def lambda_handler(event, context):
         if isinstance(body, dict) and 'conversation_history' in body:
             conversation_history = body.get('conversation_history', [])
         
-        # Create cache key
-        cache_key = hashlib.md5(
-            (user_query + json.dumps(conversation_history)).encode()
-        ).hexdigest()
+        # Stream the answer as server-sent events when the client asks for it
+        stream_response = isinstance(body, dict) and body.get('stream') is True
+        
+        # Check if this is a video generation request
+        is_video_request = any(phrase in user_query.lower() for phrase in [
+            'generate video', 'create video', 'make video',
+            'brand video', 'campaign video'
+        ])
         
         # Check cache first
+        cache_key = response_cache_key(user_query, conversation_history, is_video_request)
         cached_response = get_from_cache(cache_key)
         if cached_response:
+            # The key is the normalized query, so echo the query as this user asked it
             return {
                 'statusCode': 200,
                 'headers': {
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': '*'
                 },
-                'body': json.dumps(cached_response)
+                'body': json.dumps(dict(cached_response, query=user_query))
             }
 
-        # Initialize Bedrock client
         region = os.environ.get('AWS_REGION', 'us-east-1')
-        bedrock_runtime = boto3.client('bedrock-runtime', region_name=region)
+        bedrock_runtime = get_client('bedrock-runtime')
 
-        # Check if this is a video generation request
-        is_video_request = any(phrase in user_query.lower() for phrase in [
-            'generate video', 'create video', 'make video',
-            'brand video', 'campaign video'
-        ])
-        
         if is_video_request:
             try:
                 # Extract video prompt
@@ -268,22 +754,10 @@ def lambda_handler(event, context):
         model_id = os.environ.get('MODEL_ID', 'anthropic.claude-3-haiku-20240307-v1:0')
         
         # Generate embedding
-        request_body = json.dumps({
-            "inputText": user_query
-        })
-        
-        logger.info("Calling Bedrock to generate embeddings")
+        logger.info("Getting query embedding")
         
         try:
-            response = bedrock_runtime.invoke_model(
-                modelId="amazon.titan-embed-text-v2:0",
-                contentType="application/json",
-                accept="application/json",
-                body=request_body
-            )
-            
-            response_body = json.loads(response['body'].read())
-            user_embedding = response_body['embedding']
+            user_embedding = get_query_embedding(bedrock_runtime, user_query)
             logger.info(f"Successfully generated embedding")
             
         except Exception as e:
@@ -297,23 +771,9 @@ def lambda_handler(event, context):
                 'body': json.dumps({'error': f'Error generating embedding: {str(e)}'})
             }
         
-        # Connect to OpenSearch
-        credentials = boto3.Session().get_credentials()
-        awsauth = AWS4Auth(
-            credentials.access_key,
-            credentials.secret_key,
-            region,
-            'aoss',
-            session_token=credentials.token
-        )
-        
-        opensearch = OpenSearch(
-            hosts=[{'host': opensearch_endpoint, 'port': 443}],
-            http_auth=awsauth,
-            use_ssl=True,
-            verify_certs=True,
-            connection_class=RequestsHttpConnection
-        )
+        # Reuse the container's OpenSearch client and its pooled connections
+        opensearch_manager = get_opensearch_manager(opensearch_endpoint, region)
+        opensearch = opensearch_manager.get_client()
         
         # Store user query embedding
         user_document = {
@@ -331,6 +791,25 @@ def lambda_handler(event, context):
         except Exception as e:
             logger.error(f"Error indexing to OpenSearch: {str(e)}")
         
+        # A close enough recent query with the same retrieval context skips the search and the LLM
+        semantic_cache = get_semantic_cache()
+        semantic_context = [kb_embeddings_index, model_id, answer_history(user_query, conversation_history)]
+        if semantic_cache is not None:
+            cached_answer, similarity = semantic_cache.lookup(user_embedding, semantic_context)
+            logger.info(f"Semantic cache {'hit' if cached_answer else 'miss'} "
+                        f"(similarity {similarity:.4f}): {json.dumps(semantic_cache.stats)}")
+            if cached_answer:
+                response_data = dict(cached_answer, query=user_query)
+                store_in_cache(cache_key, response_data)
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps(response_data)
+                }
+
         # Search query
         query = {
             "size": 5,
@@ -351,6 +830,8 @@ def lambda_handler(event, context):
             body=query
         )
         
+        logger.info(f"OpenSearch connection stats: {json.dumps(opensearch_manager.connection_stats())}")
+
         # Process results
         hits = search_results['hits']['hits']
         results = []
@@ -372,13 +853,15 @@ def lambda_handler(event, context):
         conversation_context = ""
         if conversation_history:
             conversation_context = "Previous conversation:\n"
-            for message in conversation_history[-3:]:
+            for message in conversation_history[-HISTORY_CONTEXT_MESSAGES:]:
                 role = message.get('role', '')
                 content = message.get('content', '')
                 conversation_context += f"{role}: {content}\n"
             conversation_context += "\n"
         
         # Generate LLM response
+        llm_answered = False
+        stream_events = []
         try:
             prompt = f"""
             You are a helpful assistant for AnyCompany, a social media platform. 
@@ -428,28 +911,38 @@ def lambda_handler(event, context):
                 "top_p": 0.9
             }
             
-            llm_response = bedrock_runtime.invoke_model(
-                modelId=model_id,
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps(llm_request)
-            )
-            
-            llm_response_body = json.loads(llm_response['body'].read())
-            
-            if "content" in llm_response_body:
-                content_list = llm_response_body.get("content", [])
-                if content_list and len(content_list) > 0:
-                    first_content = content_list[0]
-                    if isinstance(first_content, dict) and "text" in first_content:
-                        generated_text = first_content["text"]
-                    else:
-                        generated_text = str(first_content)
-                else:
+            if stream_response:
+                generated_text = ""
+                for text in stream_llm_text(bedrock_runtime, model_id, llm_request):
+                    stream_events.append(sse_event('token', {'text': text}))
+                    generated_text += text
+                llm_answered = bool(generated_text)
+                if not generated_text:
                     generated_text = "No content in LLM response"
             else:
-                logger.error(f"Unexpected response format: {json.dumps(llm_response_body)[:200]}...")
-                generated_text = "Error: Unexpected response format from LLM"
+                llm_response = bedrock_runtime.invoke_model(
+                    modelId=model_id,
+                    contentType="application/json",
+                    accept="application/json",
+                    body=json.dumps(llm_request)
+                )
+                
+                llm_response_body = json.loads(llm_response['body'].read())
+                
+                if "content" in llm_response_body:
+                    content_list = llm_response_body.get("content", [])
+                    if content_list and len(content_list) > 0:
+                        first_content = content_list[0]
+                        if isinstance(first_content, dict) and "text" in first_content:
+                            generated_text = first_content["text"]
+                            llm_answered = True
+                        else:
+                            generated_text = str(first_content)
+                    else:
+                        generated_text = "No content in LLM response"
+                else:
+                    logger.error(f"Unexpected response format: {json.dumps(llm_response_body)[:200]}...")
+                    generated_text = "Error: Unexpected response format from LLM"
             
         except Exception as e:
             logger.error(f"Error generating LLM response: {str(e)}")
@@ -471,6 +964,23 @@ def lambda_handler(event, context):
         
         # Store in cache
         store_in_cache(cache_key, response_data)
+        if semantic_cache is not None and llm_answered:
+            semantic_cache.add(user_embedding, semantic_context, response_data)
+        
+        if stream_response:
+            # Tokens first, then the full response; the final text replaces any partial stream.
+            # This does not stream: API Gateway returns the whole body once the answer is complete,
+            # so the deployed endpoint's time to first token is unchanged
+            stream_events.append(sse_event('done', response_data))
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'text/event-stream',
+                    'Cache-Control': 'no-cache',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': ''.join(stream_events)
+            }
         
         return {
             'statusCode': 200,
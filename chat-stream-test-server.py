@@ -0,0 +1,103 @@
+import argparse
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Fake chat endpoint for trying the Streamlit Chat tab without AWS.
+# Run it, then start the app with CHATBOT_API=http://localhost:8502/embeddings CHATBOT_STREAMING=true
+DEFAULT_PORT = 8502
+DEFAULT_FIRST_TOKEN_DELAY = 0.8
+DEFAULT_TOKEN_DELAY = 0.05
+
+FAKE_CITATIONS = [
+    {'text': "Loving the new AnyCompany creator tools, posting has never been easier #AnyCompany", 'score': 0.91},
+    {'text': "AnyCompany feed keeps crashing after the update, switching to Instagram for now", 'score': 0.87}
+]
+
+def sse_event(event, data):
+    """One server-sent event with a JSON payload, as chat-embeddings-generator.py sends it"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def fake_answer(query):
+    return (
+        f"Here is what recent posts say about **{query}**:\n\n"
+        "- Sentiment is mostly positive, driven by the new creator tools\n"
+        "- Negative posts focus on feed stability after the latest update\n"
+        "- A few users mention moving to Instagram while the crashes last\n\n"
+        "Overall the conversation is favourable but stability is the main risk."
+    )
+
+class ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # chunked transfer encoding needs HTTP/1.1
+    first_token_delay = DEFAULT_FIRST_TOKEN_DELAY
+    token_delay = DEFAULT_TOKEN_DELAY
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        query = body.get('query', '')
+        if not query:
+            self.send_json(400, {'error': 'No query provided or invalid request format'})
+            return
+        response_data = {
+            'type': 'text',
+            'query': query,
+            'generated_response': fake_answer(query),
+            'citations': FAKE_CITATIONS
+        }
+        if body.get('stream') is True:
+            self.send_stream(response_data)
+        else:
+            time.sleep(self.first_token_delay + self.token_delay * len(response_data['generated_response'].split()))
+            self.send_json(200, response_data)
+
+    def send_json(self, status, data):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_stream(self, response_data):
+        """Send the answer word by word as chunked server-sent events"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(self.first_token_delay)
+        for text in re.findall(r'\S+\s*|\s+', response_data['generated_response']):
+            self.write_chunk(sse_event('token', {'text': text}))
+            time.sleep(self.token_delay)
+        self.write_chunk(sse_event('done', response_data))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fake streaming chat endpoint for local testing")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--first-token-delay', type=float, default=DEFAULT_FIRST_TOKEN_DELAY,
+                        help="Seconds before the first token, standing in for retrieval and model latency")
+    parser.add_argument('--token-delay', type=float, default=DEFAULT_TOKEN_DELAY, help="Seconds between tokens")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    ChatHandler.first_token_delay = args.first_token_delay
+    ChatHandler.token_delay = args.token_delay
+    server = ThreadingHTTPServer(('localhost', args.port), ChatHandler)
+    print(f"Fake chat endpoint on http://localhost:{args.port}/embeddings")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,62 @@
+from abc import ABC, abstractmethod
+import argparse
+import gzip
 import json
+import math
+from fractions import Fraction
+import multiprocessing
 import random
+import sqlite3
 from datetime import datetime, timedelta
 import pytz
 import boto3
 import time
 import traceback
 import os
+import re
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for the columnar engine
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for the Parquet and Arrow sinks
+    pa = None
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib json encoder
+    orjson = None
+
+# Every JSON lines output uses the compact UTF-8 form orjson produces
+dump_json = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, check_circular=False).encode
 
 # Initialize AWS client
 kinesis_client = boto3.client('kinesis')
 
 # Configuration
 STREAM_NAME = 'synthetic_data_stream'
+# Optional side stream for ground-truth labels
+LABEL_STREAM_NAME = os.environ.get('LABEL_STREAM_NAME')
+
+# Kinesis PutRecords limits
+MAX_RECORDS_PER_PUT = 500
+MAX_BYTES_PER_PUT = 5 * 1024 * 1024
+MAX_BYTES_PER_RECORD = 1024 * 1024
+MAX_PUT_RETRIES = 5
+RETRY_BASE_DELAY = 0.05
+THROTTLING_ERROR_CODES = ("ProvisionedThroughputExceededException", "ThrottlingException")
+SERVER_ERROR_CODES = ("InternalFailure", "InternalServerError", "ServiceUnavailable", "ServiceUnavailableException")
+
+# Batch and throughput mode defaults
+DEFAULT_BATCH_SIZE = 15
+DEFAULT_DURATION_SECONDS = 60
+THROUGHPUT_TICK_SECONDS = 0.1
+LAMBDA_TIME_BUFFER_MS = 3000
 
 # Global locations list
 LOCATIONS = [
@@ -710,34 +755,278 @@ SECONDARY_TOPICS = {
     }
 }
 
-# Helper Functions
-def select_demographics(demographic_weights):
-    """Select gender and age based on demographic weights"""
-    try:
-        gender = random.choices(
-            list(demographic_weights["gender"].keys()),
-            weights=list(demographic_weights["gender"].values())
-        )[0]
-        
-        age_group = random.choices(
-            list(demographic_weights["age_groups"].keys()),
-            weights=list(demographic_weights["age_groups"].values())
-        )[0]
-        
-        age_ranges = {
-            "18-25": (18, 25),
-            "26-35": (26, 35),
-            "36-50": (36, 50),
-            "51-65": (51, 65)
+# Sampling constants shared by the catalog and the generators
+AGE_GROUPS = ["18-25", "26-35", "36-50", "51-65"]
+AGE_RANGES = {"18-25": (18, 25), "26-35": (26, 35), "36-50": (36, 50), "51-65": (51, 65)}
+GENDERS = ["male", "female"]
+SOURCES = ["Android", "iOS", "Web"]
+POST_KINDS = ["trending", "secondary", "competitor"]
+POST_KIND_SHARES = [0.6, 0.25, 0.15]
+# Variant columns per kind: trending has one post list, secondary posts are
+# positive/negative/neutral and competitor posts are better/worse
+KIND_VARIANTS = {
+    "trending": ["posts"],
+    "secondary": ["positive", "negative", "neutral"],
+    "competitor": ["better", "worse"]
+}
+KIND_VARIANT_WEIGHTS = {
+    "trending": [1.0],
+    "secondary": [0.6, 0.2, 0.2],
+    "competitor": [0.5, 0.5]
+}
+
+def normalize_secondary_topics(secondary_topics):
+    """Flatten SECONDARY_TOPICS into per-category entities and competitors.
+
+    Fashion lists "brands", Sports lists "leagues" and AnyCompany only has
+    standalone posts plus comparisons against competitor platforms.
+    """
+    entities = {}
+    competitors = {}
+    for category, data in secondary_topics.items():
+        if "brands" in data or "leagues" in data:
+            entities[category] = data.get("brands") or data.get("leagues")
+        if "standalone" in data:
+            entities[category] = {
+                category: {
+                    "posts": data["standalone"],
+                    "weight": data["weight"],
+                    "demographics": data["demographics"]
+                }
+            }
+        for competitor, comparisons in data.get("comparisons", {}).items():
+            competitors[competitor] = {
+                "features": comparisons,
+                "weight": data["weight"],
+                "demographics": data["demographics"]
+            }
+    return entities, competitors
+
+SECONDARY_ENTITIES, COMPETITORS = normalize_secondary_topics(SECONDARY_TOPICS)
+
+class AliasSampler:
+    """Walker alias table for O(1) weighted draws"""
+
+    def __init__(self, items, weights):
+        self.items = tuple(items)
+        n = len(self.items)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("AliasSampler needs at least one positive weight")
+
+        self.probabilities = [w / total for w in weights]
+        scaled = [p * n for p in self.probabilities]
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            under = small.pop()
+            over = large.pop()
+            self.prob[under] = scaled[under]
+            self.alias[under] = over
+            scaled[over] -= 1.0 - scaled[under]
+            (small if scaled[over] < 1.0 else large).append(over)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+        if np is not None:
+            self.prob_array = np.asarray(self.prob, dtype=np.float64)
+            self.alias_array = np.asarray(self.alias, dtype=np.int64)
+
+    def sample_index(self, rng=random):
+        """Draw one index"""
+        i = int(rng.random() * len(self.items))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+    def sample(self, rng=random):
+        """Draw one item"""
+        return self.items[self.sample_index(rng)]
+
+    def sample_indices(self, np_rng, size):
+        """Draw size indices at once with a NumPy generator"""
+        i = np_rng.integers(0, len(self.items), size)
+        return np.where(np_rng.random(size) < self.prob_array[i], i, self.alias_array[i])
+
+class CatalogEntry:
+    """One hashtag, brand or competitor flattened for sampling"""
+
+    __slots__ = ("kind", "name", "hashtag", "topic", "category", "weight", "posts",
+                 "gender_weights", "age_weights", "gender", "age_group")
+
+    def __init__(self, kind, name, hashtag, topic, category, data, variant_posts):
+        self.kind = kind
+        self.name = sys.intern(name)
+        self.hashtag = sys.intern(hashtag)
+        self.topic = sys.intern(topic)
+        self.category = sys.intern(category) if category else None
+        self.weight = data["weight"]
+        self.posts = {
+            sys.intern(variant): tuple(sys.intern(text) for text in variant_posts.get(variant, []))
+            for variant in KIND_VARIANTS[kind]
         }
-        min_age, max_age = age_ranges[age_group]
-        specific_age = random.randint(min_age, max_age)
-        
-        return gender, specific_age, age_group
-    except Exception as e:
-        print(f"Error in select_demographics: {str(e)}")
-        return "female", 25, "18-25"
-def calculate_engagement_metrics(base_weight, demographics):
+        self.gender_weights = [data["demographics"]["gender"].get(g, 0) for g in GENDERS]
+        self.age_weights = [data["demographics"]["age_groups"].get(a, 0) for a in AGE_GROUPS]
+        self.gender = AliasSampler(GENDERS, self.gender_weights)
+        self.age_group = AliasSampler(AGE_GROUPS, self.age_weights)
+
+class PostCatalog:
+    """Hashtags, brands, competitors and locations compiled once for fast sampling"""
+
+    def __init__(self, trending_hashtags, secondary_topics, locations):
+        entities, competitors = normalize_secondary_topics(secondary_topics)
+        self.locations = tuple(sys.intern(location) for location in locations)
+
+        self.trending = [
+            CatalogEntry("trending", hashtag, hashtag, hashtag.strip('#'), "trending", data,
+                         {"posts": data["posts"]})
+            for hashtag, data in trending_hashtags.items()
+        ]
+        self.secondary = [
+            CatalogEntry("secondary", brand, f"#{brand}", brand, category, data, data["posts"])
+            for category, brands in entities.items()
+            for brand, data in brands.items()
+        ]
+        self.competitors = [
+            CatalogEntry("competitor", competitor, f"#{competitor}", f"{competitor} vs AnyCompany",
+                         None, data, data["features"])
+            for competitor, data in competitors.items()
+        ]
+
+        # Trending is weighted, secondary picks a category then a brand uniformly
+        # and competitors are uniform, as in the original generators
+        self.trending_sampler = AliasSampler(self.trending, [e.weight for e in self.trending])
+        self.secondary_sampler = AliasSampler(
+            self.secondary,
+            [1 / (len(entities) * len(entities[e.category])) for e in self.secondary]
+        )
+        self.competitor_sampler = AliasSampler(self.competitors, [1] * len(self.competitors))
+        self.by_hashtag = {e.hashtag: e for e in self.trending + self.secondary + self.competitors}
+        self.variant_samplers = {
+            kind: AliasSampler(KIND_VARIANTS[kind], KIND_VARIANT_WEIGHTS[kind]) for kind in POST_KINDS
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a catalog from a dict shaped like the module-level tables"""
+        return cls(
+            data.get("trending_hashtags", TRENDING_HASHTAGS),
+            data.get("secondary_topics", SECONDARY_TOPICS),
+            data.get("locations", LOCATIONS)
+        )
+
+    @classmethod
+    def from_json_file(cls, path):
+        """Build a catalog from a JSON file"""
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def sample_demographics(self, entry, rng=random):
+        """Draw gender, specific age and age group for an entry"""
+        gender = entry.gender.sample(rng)
+        age_group = entry.age_group.sample(rng)
+        min_age, max_age = AGE_RANGES[age_group]
+        return gender, rng.randint(min_age, max_age), age_group
+
+    def sample_location(self, rng=random):
+        """Draw a location uniformly"""
+        return self.locations[int(rng.random() * len(self.locations))]
+
+def catalog_source():
+    """CATALOG_PATH and its modification time, or (None, None) for the module tables"""
+    path = os.environ.get('CATALOG_PATH')
+    return (path, os.path.getmtime(path)) if path else (None, None)
+
+def load_catalog(source=None):
+    """Build the catalog from CATALOG_PATH if set, otherwise from the module tables"""
+    path = (source or catalog_source())[0]
+    if path:
+        return PostCatalog.from_json_file(path)
+    return PostCatalog(TRENDING_HASHTAGS, SECONDARY_TOPICS, LOCATIONS)
+
+# Compiled once per container
+CATALOG_SOURCE = catalog_source()
+CATALOG = load_catalog(CATALOG_SOURCE)
+
+def refresh_catalog():
+    """Rebuild the catalog only if CATALOG_PATH or the file's modification time has changed"""
+    global CATALOG, CATALOG_SOURCE, COLUMNAR_ENGINE
+    source = catalog_source()
+    if source != CATALOG_SOURCE:
+        catalog = load_catalog(source)
+        engine = ColumnarPostEngine(catalog) if np is not None else None
+        CATALOG, COLUMNAR_ENGINE, CATALOG_SOURCE = catalog, engine, source
+    return CATALOG
+
+class SyntheticStream:
+    """Source of randomness, post IDs and time for the generators.
+
+    A seeded stream is fully reproducible: given the same seed, worker_id and
+    start_time it produces byte-identical posts. Child streams from spawn()
+    are independent and use disjoint post ID spaces, so workers never collide.
+    """
+
+    def __init__(self, seed=None, worker_id=0, start_time=None):
+        self.seed = seed
+        self.worker_id = worker_id
+        self.sequence = 0
+        self.current_time = start_time
+        self.location_sampler = None
+        if seed is None:
+            # Unseeded streams key their IDs on the container start and a random node id
+            self.rng = random.Random()
+            self.id_prefix = f"{int(time.time() * 1000)}-{os.urandom(4).hex()}"
+        else:
+            self.rng = random.Random(f"{seed}:{worker_id}")
+            self.id_prefix = f"{seed}-{worker_id}"
+        self._np_rng = None
+
+    @property
+    def np_rng(self):
+        """NumPy generator derived from the same seed and worker id"""
+        if self._np_rng is None:
+            if self.seed is None:
+                self._np_rng = np.random.default_rng()
+            else:
+                # Spawned worker ids look like "0.3.1"; each level becomes a seed word
+                words = [int(self.seed)] + [int(part) for part in str(self.worker_id).split('.')]
+                self._np_rng = np.random.default_rng(words)
+        return self._np_rng
+
+    def spawn(self, worker_id):
+        """Independent child stream for a worker"""
+        seed = self.seed if self.seed is not None else self.rng.getrandbits(63)
+        return SyntheticStream(seed, worker_id=f"{self.worker_id}.{worker_id}", start_time=self.current_time)
+
+    def reserve_ids(self, count):
+        """Reserve count consecutive sequence numbers, returning the first"""
+        start = self.sequence
+        self.sequence += count
+        return start
+
+    def next_post_id(self):
+        """Next collision-free post ID"""
+        return f"p{self.id_prefix}-{self.reserve_ids(1)}"
+
+    def now(self):
+        """Simulated time if one is set, otherwise the wall clock"""
+        return self.current_time if self.current_time is not None else datetime.now(pytz.UTC)
+
+    def set_time(self, current_time):
+        """Move the simulated clock"""
+        self.current_time = current_time
+
+    def sample_location(self):
+        """Draw a location, from the location sampler if one is set"""
+        if self.location_sampler is not None:
+            return self.location_sampler.sample(self.rng)
+        return CATALOG.sample_location(self.rng)
+
+# Stream used by live invocations that don't pass one explicitly
+DEFAULT_STREAM = SyntheticStream()
+
+# Helper Functions
+def calculate_engagement_metrics(base_weight, demographics, rng=random):
     """Calculate engagement metrics based on various factors"""
     try:
         base_multiplier = base_weight / 10
@@ -747,16 +1036,16 @@ def calculate_engagement_metrics(base_weight, demographics):
         age_multiplier = 1.2 if age_group in ["18-25", "26-35"] else 1.0
         
         # Random variation
-        variation = random.uniform(0.8, 1.2)
+        variation = rng.uniform(0.8, 1.2)
         
         # Calculate final metrics
-        base_engagement = random.randint(100, 1000)
+        base_engagement = rng.randint(100, 1000)
         total_multiplier = base_multiplier * age_multiplier * variation
         
         engagement = {
-            "likes": int(base_engagement * total_multiplier * random.uniform(1.0, 2.0)),
-            "retweets": int(base_engagement * total_multiplier * random.uniform(0.3, 0.7)),
-            "replies": int(base_engagement * total_multiplier * random.uniform(0.1, 0.4))
+            "likes": int(base_engagement * total_multiplier * rng.uniform(1.0, 2.0)),
+            "retweets": int(base_engagement * total_multiplier * rng.uniform(0.3, 0.7)),
+            "replies": int(base_engagement * total_multiplier * rng.uniform(0.1, 0.4))
         }
         
         return engagement
@@ -764,77 +1053,76 @@ def calculate_engagement_metrics(base_weight, demographics):
         print(f"Error in calculate_engagement_metrics: {str(e)}")
         return {"likes": 100, "retweets": 20, "replies": 10}
 
-def generate_post_id():
+class SampledPost(dict):
+    """A post record that also remembers the sentiment its content was sampled with.
+
+    The sentiment is an attribute rather than a field, so it reaches the labels
+    but never the stream or the sinks.
+    """
+
+    def __init__(self, fields, sentiment_type=None):
+        super().__init__(fields)
+        self.sentiment_type = sentiment_type
+
+def generate_post_id(stream=None):
     """Generate a unique post ID"""
-    timestamp = int(time.time() * 1000)
-    random_suffix = random.randint(1000, 9999)
-    return f"p{timestamp}{random_suffix}"
+    return (stream or DEFAULT_STREAM).next_post_id()
 
-def get_current_timestamp():
+def get_current_timestamp(stream=None):
     """Get current timestamp in UTC"""
-    return datetime.now(pytz.UTC).strftime("%Y-%m-%d %H:%M:%S UTC")
-
-def validate_post_content(content, max_length=280):
-    """Validate and clean post content"""
-    if not content:
-        return False, "Empty content"
-    
-    content = ' '.join(content.split())
-    
-    if len(content) > max_length:
-        content = content[:max_length-3] + "..."
-    
-    return True, content
+    return (stream or DEFAULT_STREAM).now().strftime("%Y-%m-%d %H:%M:%S UTC")
 
-def generate_deceptive_post():
+def generate_deceptive_post(stream=None):
     """Generate a deceptively crafted post with suspicious patterns"""
     try:
+        stream = stream or DEFAULT_STREAM
+        rng = stream.rng
         suspicious_patterns = [
             {
-                "content": f"Make ${random.randint(1000,10000)} daily! DM for secret method!",
+                "content": f"Make ${rng.randint(1000,10000)} daily! DM for secret method!",
                 "hashtags": ["#EasyMoney", "#GetRichQuick"]
             },
             {
-                "content": f"FREE {random.choice(['iPhone15', 'MacBook', 'PS5'])}! Click: {random.choice(['bit.ly/win', 'tinyurl.com/prize'])}",
+                "content": f"FREE {rng.choice(['iPhone15', 'MacBook', 'PS5'])}! Click: {rng.choice(['bit.ly/win', 'tinyurl.com/prize'])}",
                 "hashtags": ["#Giveaway", "#FreePrize"]
             },
             {
-                "content": f"URGENT: Account security check required! Verify here: {random.choice(['securelogin.net', 'verify-account.com'])}",
+                "content": f"URGENT: Account security check required! Verify here: {rng.choice(['securelogin.net', 'verify-account.com'])}",
                 "hashtags": ["#Security", "#Urgent"]
             },
             {
-                "content": f"Investment opportunity! {random.randint(500,1000)}% guaranteed returns in 24hrs!",
+                "content": f"Investment opportunity! {rng.randint(500,1000)}% guaranteed returns in 24hrs!",
                 "hashtags": ["#Investment", "#Crypto"]
             },
             {
-                "content": f"EXCLUSIVE DEAL! Limited spots! Join now: {random.choice(['exclusive-offer.net', 'special-deal.com'])}",
+                "content": f"EXCLUSIVE DEAL! Limited spots! Join now: {rng.choice(['exclusive-offer.net', 'special-deal.com'])}",
                 "hashtags": ["#Exclusive", "#Limited"]
             }
         ]
         
-        chosen_pattern = random.choice(suspicious_patterns)
+        chosen_pattern = rng.choice(suspicious_patterns)
         
         # Generate artificially high engagement
         engagement = {
-            "likes": random.randint(50000, 100000),
-            "retweets": random.randint(25000, 50000),
-            "replies": random.randint(10000, 25000)
+            "likes": rng.randint(50000, 100000),
+            "retweets": rng.randint(25000, 50000),
+            "replies": rng.randint(10000, 25000)
         }
 
         return {
-            "post_id": generate_post_id(),
-            "timestamp": get_current_timestamp(),
-            "username": f"user_{random.randint(100000, 999999)}_{random.randint(1000, 9999)}",
-            "location": random.choice(LOCATIONS),
+            "post_id": generate_post_id(stream),
+            "timestamp": get_current_timestamp(stream),
+            "username": f"user_{rng.randint(100000, 999999)}_{rng.randint(1000, 9999)}",
+            "location": stream.sample_location(),
             "language": "en",
             "content": chosen_pattern["content"],
             "hashtags": chosen_pattern["hashtags"][:1],  # Keep one hashtag to match other posts
-            "mentions": [f"@user_{random.randint(1000, 9999)}" for _ in range(5)],
+            "mentions": [f"@user_{rng.randint(1000, 9999)}" for _ in range(5)],
             "topic": "promotion",
             "engagement": engagement,
-            "source": random.choice(["web", "mobile", "unknown"]),
-            "user_age": random.randint(18, 25),
-            "user_gender": random.choice(["male", "female"]),
+            "source": rng.choice(["web", "mobile", "unknown"]),
+            "user_age": rng.randint(18, 25),
+            "user_gender": rng.choice(["male", "female"]),
             "post_type": "promotional",
             "category": "other",
             "age_group": "18-25"
@@ -843,37 +1131,39 @@ def generate_deceptive_post():
         print(f"Error in generate_deceptive_post: {str(e)}")
         return None
 
-def generate_trending_post():
-    """Generate a trending topic post"""
+def generate_trending_post(stream=None, hashtag=None):
+    """Generate a trending topic post, optionally for a specific hashtag"""
     try:
-        current_time = datetime.now(pytz.UTC) - timedelta(minutes=random.randint(0, 5))
-        
-        hashtag = random.choices(
-            list(TRENDING_HASHTAGS.keys()),
-            weights=[data['weight'] for data in TRENDING_HASHTAGS.values()]
-        )[0]
+        stream = stream or DEFAULT_STREAM
+        rng = stream.rng
+        current_time = stream.now()
+        if stream.current_time is None:
+            # Live trending posts are back-dated by up to 5 minutes; a simulated clock is already exact
+            current_time -= timedelta(minutes=rng.randint(0, 5))
         
-        topic_data = TRENDING_HASHTAGS[hashtag]
-        gender, age, age_group = select_demographics(topic_data["demographics"])
-        content = random.choice(topic_data["posts"])
+        entry = CATALOG.by_hashtag[hashtag] if hashtag else CATALOG.trending_sampler.sample(rng)
+        hashtag = entry.hashtag
+        gender, age, age_group = CATALOG.sample_demographics(entry, rng)
+        content = rng.choice(entry.posts["posts"])
         
         engagement = calculate_engagement_metrics(
-            topic_data['weight'],
-            (gender, age, age_group)
+            entry.weight,
+            (gender, age, age_group),
+            rng
         )
 
         return {
-            "post_id": generate_post_id(),
+            "post_id": generate_post_id(stream),
             "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S UTC"),
-            "username": f"user_{random.randint(1000, 9999)}",
-            "location": random.choice(LOCATIONS),
+            "username": f"user_{rng.randint(1000, 9999)}",
+            "location": stream.sample_location(),
             "language": "en",
             "content": f"{content} {hashtag}",
             "hashtags": [hashtag],
-            "mentions": [f"@user_{random.randint(1000, 9999)}" for _ in range(random.randint(0, 2))],
-            "topic": hashtag.strip('#'),
+            "mentions": [f"@user_{rng.randint(1000, 9999)}" for _ in range(rng.randint(0, 2))],
+            "topic": entry.topic,
             "engagement": engagement,
-            "source": random.choice(["Android", "iOS", "Web"]),
+            "source": rng.choice(["Android", "iOS", "Web"]),
             "user_age": age,
             "user_gender": gender,
             "post_type": "trending",
@@ -883,74 +1173,80 @@ def generate_trending_post():
     except Exception as e:
         print(f"Error in generate_trending_post: {str(e)}")
         return None
-def generate_secondary_post():
-    """Generate a post about secondary topics (fashion, sports)"""
+def generate_secondary_post(stream=None, hashtag=None):
+    """Generate a post about secondary topics (fashion, sports), optionally for a specific brand hashtag"""
     try:
-        category = random.choice(list(SECONDARY_TOPICS.keys()))
-        brand = random.choice(list(SECONDARY_TOPICS[category]["brands"].keys()))
-        brand_data = SECONDARY_TOPICS[category]["brands"][brand]
+        stream = stream or DEFAULT_STREAM
+        rng = stream.rng
+        entry = CATALOG.by_hashtag[hashtag] if hashtag else CATALOG.secondary_sampler.sample(rng)
+        brand = entry.name
+        category = entry.category
         
-        gender, age, age_group = select_demographics(brand_data["demographics"])
-        sentiment_type = random.choices(["positive", "negative", "neutral"], weights=[0.6, 0.2, 0.2])[0]
-        content = random.choice(brand_data["posts"][sentiment_type])
-        hashtag = f"#{brand}"
+        gender, age, age_group = CATALOG.sample_demographics(entry, rng)
+        sentiment_type = CATALOG.variant_samplers["secondary"].sample(rng)
+        content = rng.choice(entry.posts[sentiment_type])
+        hashtag = entry.hashtag
         
         engagement = calculate_engagement_metrics(
-            brand_data['weight'],
-            (gender, age, age_group)
+            entry.weight,
+            (gender, age, age_group),
+            rng
         )
 
-        return {
-            "post_id": generate_post_id(),
-            "timestamp": get_current_timestamp(),
-            "username": f"user_{random.randint(1000, 9999)}",
-            "location": random.choice(LOCATIONS),
+        return SampledPost({
+            "post_id": generate_post_id(stream),
+            "timestamp": get_current_timestamp(stream),
+            "username": f"user_{rng.randint(1000, 9999)}",
+            "location": stream.sample_location(),
             "language": "en",
             "content": f"{content} {hashtag}",
             "hashtags": [hashtag],
-            "mentions": [f"@user_{random.randint(1000, 9999)}" for _ in range(random.randint(0, 2))],
+            "mentions": [f"@user_{rng.randint(1000, 9999)}" for _ in range(rng.randint(0, 2))],
             "topic": brand,
             "engagement": engagement,
-            "source": random.choice(["Android", "iOS", "Web"]),
+            "source": rng.choice(["Android", "iOS", "Web"]),
             "user_age": age,
             "user_gender": gender,
             "post_type": "secondary",
             "category": category,
             "brand": brand,
             "age_group": age_group
-        }
+        }, sentiment_type)
     except Exception as e:
         print(f"Error in generate_secondary_post: {str(e)}")
         return None
 
-def generate_competitor_post():
-    """Generate a post comparing competitor features with AnyCompany"""
+def generate_competitor_post(stream=None, hashtag=None):
+    """Generate a post comparing competitor features with AnyCompany, optionally for a specific competitor hashtag"""
     try:
-        competitor = random.choice(list(COMPETITORS.keys()))
-        competitor_data = COMPETITORS[competitor]
+        stream = stream or DEFAULT_STREAM
+        rng = stream.rng
+        entry = CATALOG.by_hashtag[hashtag] if hashtag else CATALOG.competitor_sampler.sample(rng)
+        competitor = entry.name
         
-        gender, age, age_group = select_demographics(competitor_data["demographics"])
-        comparison_type = random.choice(["better", "worse"])
-        content = random.choice(competitor_data["features"][comparison_type])
-        hashtag = f"#{competitor}"
+        gender, age, age_group = CATALOG.sample_demographics(entry, rng)
+        comparison_type = CATALOG.variant_samplers["competitor"].sample(rng)
+        content = rng.choice(entry.posts[comparison_type])
+        hashtag = entry.hashtag
         
         engagement = calculate_engagement_metrics(
-            competitor_data['weight'],
-            (gender, age, age_group)
+            entry.weight,
+            (gender, age, age_group),
+            rng
         )
 
         return {
-            "post_id": generate_post_id(),
-            "timestamp": get_current_timestamp(),
-            "username": f"user_{random.randint(1000, 9999)}",
-            "location": random.choice(LOCATIONS),
+            "post_id": generate_post_id(stream),
+            "timestamp": get_current_timestamp(stream),
+            "username": f"user_{rng.randint(1000, 9999)}",
+            "location": stream.sample_location(),
             "language": "en",
             "content": f"{content} {hashtag}",
             "hashtags": [hashtag],
-            "mentions": [f"@user_{random.randint(1000, 9999)}" for _ in range(random.randint(0, 2))],
-            "topic": f"{competitor} vs AnyCompany",
+            "mentions": [f"@user_{rng.randint(1000, 9999)}" for _ in range(rng.randint(0, 2))],
+            "topic": entry.topic,
             "engagement": engagement,
-            "source": random.choice(["Android", "iOS", "Web"]),
+            "source": rng.choice(["Android", "iOS", "Web"]),
             "user_age": age,
             "user_gender": gender,
             "post_type": "competitor",
@@ -962,8 +1258,9 @@ def generate_competitor_post():
         print(f"Error in generate_competitor_post: {str(e)}")
         return None
 
-def generate_mixed_posts(batch_size=15):
+def generate_mixed_posts(batch_size=15, stream=None):
     """Generate a mixed batch of posts"""
+    stream = stream or DEFAULT_STREAM
     posts = []
     distribution = {
         "trending": int(batch_size * 0.6),
@@ -980,173 +1277,1455 @@ def generate_mixed_posts(batch_size=15):
         for _ in range(count):
             post = None
             if post_type == "trending":
-                post = generate_trending_post()
+                post = generate_trending_post(stream)
             elif post_type == "secondary":
-                post = generate_secondary_post()
+                post = generate_secondary_post(stream)
             else:
-                post = generate_competitor_post()
+                post = generate_competitor_post(stream)
             
             if post:
                 posts.append(post)
     
-    random.shuffle(posts)
+    stream.rng.shuffle(posts)
     return posts
 
+# Columnar generation engine
+class ColumnarPostEngine:
+    """Draws N posts at a time as NumPy columns from a compiled PostCatalog"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        entries = catalog.trending + catalog.secondary + catalog.competitors
+        self.entity_kind = [e.kind for e in entries]
+        self.entity_kind_index = np.asarray([POST_KINDS.index(e.kind) for e in entries], dtype=np.int8)
+        self.entity_index = {e.hashtag: i for i, e in enumerate(entries)}
+        self.entity_name = [e.name for e in entries]
+        self.entity_hashtag = [e.hashtag for e in entries]
+        self.entity_topic = [e.topic for e in entries]
+        self.entity_category = [e.category for e in entries]
+        self.locations = catalog.locations
+
+        # Content templates flattened into one table with (start, count) per entity variant
+        self.contents = []
+        content_start = []
+        content_count = []
+        for e in entries:
+            starts = []
+            counts = []
+            for variant in KIND_VARIANTS[e.kind] + [None] * (3 - len(KIND_VARIANTS[e.kind])):
+                posts = e.posts[variant] if variant else ()
+                starts.append(len(self.contents))
+                counts.append(len(posts))
+                self.contents.extend(posts)
+            content_start.append(starts)
+            content_count.append(counts)
+
+        self.entity_weight = np.asarray([e.weight for e in entries], dtype=np.float64)
+        self.gender_cdf = np.cumsum(np.asarray([e.gender_weights for e in entries], dtype=np.float64), axis=1)
+        self.gender_cdf /= self.gender_cdf[:, -1:]
+        self.age_cdf = np.cumsum(np.asarray([e.age_weights for e in entries], dtype=np.float64), axis=1)
+        self.age_cdf /= self.age_cdf[:, -1:]
+        self.content_start = np.array(content_start, dtype=np.int64)
+        self.content_count = np.array(content_count, dtype=np.int64)
+        self.age_bounds = np.array([AGE_RANGES[a] for a in AGE_GROUPS], dtype=np.int64)
+
+        # Entity ids of each kind, in the order of the catalog samplers
+        offsets = np.cumsum([0, len(catalog.trending), len(catalog.secondary)])
+        self.kind_samplers = [catalog.trending_sampler, catalog.secondary_sampler, catalog.competitor_sampler]
+        self.kind_offsets = offsets.tolist()
+
+    def generate(self, n, stream=None, timestamps=None, location_sampler=None, forced_entity=None):
+        """Generate n posts as a dict of NumPy columns.
+
+        Backfills pass per-post epoch-second timestamps, a location sampler for
+        the hour's diurnal mix, and forced_entity ids (-1 for a free draw) for
+        burst posts.
+        """
+        stream = stream or DEFAULT_STREAM
+        rng = stream.np_rng
+        now = stream.now()
+
+        free = np.ones(n, dtype=bool) if forced_entity is None else forced_entity < 0
+        free_count = int(free.sum())
+
+        # Same 60/25/15 split as generate_mixed_posts, shuffled
+        counts = [int(free_count * share) for share in POST_KIND_SHARES]
+        counts[0] += free_count - sum(counts)
+        kind = np.empty(n, dtype=np.int8)
+        kind[free] = rng.permutation(np.repeat(np.arange(len(POST_KINDS), dtype=np.int8), counts))
+
+        entity = np.empty(n, dtype=np.int64)
+        variant = np.empty(n, dtype=np.int64)
+        if forced_entity is not None:
+            entity[~free] = forced_entity[~free]
+            kind[~free] = self.entity_kind_index[forced_entity[~free]]
+        for k, kind_name in enumerate(POST_KINDS):
+            mask = kind == k
+            size = int(mask.sum())
+            if not size:
+                continue
+            free_mask = mask & free
+            free_size = int(free_mask.sum())
+            if free_size:
+                entity[free_mask] = self.kind_offsets[k] + self.kind_samplers[k].sample_indices(rng, free_size)
+            variant[mask] = self.catalog.variant_samplers[kind_name].sample_indices(rng, size)
+
+        # Demographics from the per-entity cumulative tables
+        gender = (rng.random(n)[:, None] > self.gender_cdf[entity]).sum(axis=1).clip(0, len(GENDERS) - 1)
+        age_group = (rng.random(n)[:, None] > self.age_cdf[entity]).sum(axis=1).clip(0, len(AGE_GROUPS) - 1)
+        bounds = self.age_bounds[age_group]
+        age = rng.integers(bounds[:, 0], bounds[:, 1] + 1)
+
+        count = self.content_count[entity, variant]
+        content = self.content_start[entity, variant] + (rng.random(n) * count).astype(np.int64)
+
+        # Engagement follows calculate_engagement_metrics
+        age_multiplier = np.where(age_group <= 1, 1.2, 1.0)
+        base = rng.integers(100, 1001, n) * (self.entity_weight[entity] / 10) * age_multiplier * rng.uniform(0.8, 1.2, n)
+        likes = (base * rng.uniform(1.0, 2.0, n)).astype(np.int64)
+        retweets = (base * rng.uniform(0.3, 0.7, n)).astype(np.int64)
+        replies = (base * rng.uniform(0.1, 0.4, n)).astype(np.int64)
+
+        if timestamps is None:
+            timestamps = np.full(n, int(now.timestamp()), dtype=np.int64)
+            if stream.current_time is None:
+                # Live trending posts are back-dated by up to 5 minutes; a simulated clock is already exact
+                timestamps -= np.where(kind == 0, rng.integers(0, 6, n) * 60, 0)
+
+        return {
+            "size": n,
+            "id_prefix": stream.id_prefix,
+            "id_start": stream.reserve_ids(n),
+            "kind": kind,
+            "entity": entity,
+            "variant": variant,
+            "content": content,
+            "gender": gender,
+            "age": age,
+            "age_group": age_group,
+            "likes": likes,
+            "retweets": retweets,
+            "replies": replies,
+            "timestamp": timestamps,
+            "username": rng.integers(1000, 10000, n),
+            "location": (location_sampler.sample_indices(rng, n) if location_sampler is not None
+                         else rng.integers(0, len(self.locations), n)),
+            "source": rng.integers(0, len(SOURCES), n),
+            "mention_count": rng.integers(0, 3, n),
+            "mentions": rng.integers(1000, 10000, (n, 2))
+        }
+
+    def iter_posts(self, columns):
+        """Materialize post dicts from generated columns"""
+        id_prefix = columns["id_prefix"]
+        id_start = columns["id_start"]
+
+        # Only a handful of distinct timestamps exist, so format each one once
+        unique_seconds, timestamp_index = np.unique(columns["timestamp"], return_inverse=True)
+        timestamps = [
+            datetime.fromtimestamp(int(s), pytz.UTC).strftime("%Y-%m-%d %H:%M:%S UTC")
+            for s in unique_seconds
+        ]
+
+        rows = zip(
+            columns["kind"].tolist(), columns["entity"].tolist(), columns["variant"].tolist(),
+            columns["content"].tolist(), columns["gender"].tolist(), columns["age"].tolist(),
+            columns["age_group"].tolist(), columns["likes"].tolist(), columns["retweets"].tolist(),
+            columns["replies"].tolist(), timestamp_index.tolist(), columns["username"].tolist(),
+            columns["location"].tolist(), columns["source"].tolist(),
+            columns["mention_count"].tolist(), columns["mentions"].tolist()
+        )
+        deceptive = columns.get("deceptive") or {}
+        for i, (kind, entity, variant, content, gender, age, age_group, likes, retweets, replies,
+                ts, username, location, source, mention_count, mentions) in enumerate(rows):
+            if i in deceptive:
+                yield deceptive[i]
+                continue
+            hashtag = self.entity_hashtag[entity]
+            post = {
+                "post_id": f"p{id_prefix}-{id_start + i}",
+                "timestamp": timestamps[ts],
+                "username": f"user_{username}",
+                "location": self.locations[location],
+                "language": "en",
+                "content": f"{self.contents[content]} {hashtag}",
+                "hashtags": [hashtag],
+                "mentions": [f"@user_{m}" for m in mentions[:mention_count]],
+                "topic": self.entity_topic[entity],
+                "engagement": {"likes": likes, "retweets": retweets, "replies": replies},
+                "source": SOURCES[source],
+                "user_age": age,
+                "user_gender": GENDERS[gender],
+                "post_type": POST_KINDS[kind]
+            }
+            if kind == 0:
+                post["category"] = "trending"
+            elif kind == 1:
+                post["category"] = self.entity_category[entity]
+                post["brand"] = self.entity_name[entity]
+            else:
+                post["platform"] = self.entity_name[entity]
+                post["comparison_type"] = KIND_VARIANTS["competitor"][variant]
+            post["age_group"] = AGE_GROUPS[age_group]
+            yield SampledPost(post, KIND_VARIANTS["secondary"][variant]) if kind == 1 else post
+
+    def iter_labels(self, columns):
+        """Ground-truth labels for generated columns, matching label_post on the materialized posts"""
+        id_prefix = columns["id_prefix"]
+        id_start = columns["id_start"]
+        unique_seconds, timestamp_index = np.unique(columns["timestamp"], return_inverse=True)
+        timestamps = [
+            datetime.fromtimestamp(int(s), pytz.UTC).strftime("%Y-%m-%d %H:%M:%S UTC")
+            for s in unique_seconds
+        ]
+        rows = zip(columns["kind"].tolist(), columns["entity"].tolist(),
+                   columns["variant"].tolist(), timestamp_index.tolist())
+        deceptive = columns.get("deceptive") or {}
+        for i, (kind, entity, variant, ts) in enumerate(rows):
+            if i in deceptive:
+                yield label_post(deceptive[i])
+                continue
+            post_type = POST_KINDS[kind]
+            label = new_label(f"p{id_prefix}-{id_start + i}", timestamps[ts], post_type,
+                              self.entity_hashtag[entity])
+            if kind == 1:
+                label["brand"] = self.entity_name[entity]
+                label["sentiment"] = KIND_VARIANTS[post_type][variant]
+            elif kind == 2:
+                label["brand"] = LABEL_HOME_BRAND
+                label["competitor"] = self.entity_name[entity]
+                label["sentiment"] = COMPARISON_SENTIMENT[KIND_VARIANTS[post_type][variant]]
+            yield label
+
+    def to_jsonl(self, columns):
+        """Serialize generated columns as newline-delimited JSON without building dicts"""
+        id_prefix = columns["id_prefix"]
+        id_start = columns["id_start"]
+
+        # Every string field comes from a small table, so encode each value once
+        dumps = dump_json
+        content_json = [
+            dumps(f"{text} {self.entity_hashtag[e]}") if text is not None else None
+            for text, e in self._content_entities()
+        ]
+        hashtag_json = [dumps(h) for h in self.entity_hashtag]
+        topic_json = [dumps(t) for t in self.entity_topic]
+        location_json = [dumps(loc) for loc in self.locations]
+        tail_json = [
+            [self._kind_tail_json(e, v) for v in range(3)]
+            for e in range(len(self.entity_name))
+        ]
+        unique_seconds, timestamp_index = np.unique(columns["timestamp"], return_inverse=True)
+        timestamps = [
+            datetime.fromtimestamp(int(s), pytz.UTC).strftime("%Y-%m-%d %H:%M:%S UTC")
+            for s in unique_seconds
+        ]
+
+        lines = []
+        append = lines.append
+        rows = zip(
+            columns["kind"].tolist(), columns["entity"].tolist(), columns["variant"].tolist(),
+            columns["content"].tolist(), columns["gender"].tolist(), columns["age"].tolist(),
+            columns["age_group"].tolist(), columns["likes"].tolist(), columns["retweets"].tolist(),
+            columns["replies"].tolist(), timestamp_index.tolist(), columns["username"].tolist(),
+            columns["location"].tolist(), columns["source"].tolist(),
+            columns["mention_count"].tolist(), columns["mentions"].tolist()
+        )
+        deceptive = columns.get("deceptive") or {}
+        for i, (kind, entity, variant, content, gender, age, age_group, likes, retweets, replies,
+                ts, username, location, source, mention_count, mentions) in enumerate(rows):
+            if i in deceptive:
+                append(dump_json(deceptive[i]) + '\n')
+                continue
+            mention_json = ','.join(f'"@user_{m}"' for m in mentions[:mention_count])
+            append(
+                f'{{"post_id":"p{id_prefix}-{id_start + i}","timestamp":"{timestamps[ts]}",'
+                f'"username":"user_{username}","location":{location_json[location]},'
+                f'"language":"en","content":{content_json[content]},'
+                f'"hashtags":[{hashtag_json[entity]}],"mentions":[{mention_json}],'
+                f'"topic":{topic_json[entity]},'
+                f'"engagement":{{"likes":{likes},"retweets":{retweets},"replies":{replies}}},'
+                f'"source":"{SOURCES[source]}","user_age":{age},'
+                f'"user_gender":"{GENDERS[gender]}","post_type":"{POST_KINDS[kind]}"'
+                f'{tail_json[entity][variant]},"age_group":"{AGE_GROUPS[age_group]}"}}\n'
+            )
+        return ''.join(lines)
+
+    def _content_entities(self):
+        """Pair every content template with the entity that owns it"""
+        owners = [None] * len(self.contents)
+        for e in range(len(self.entity_name)):
+            for start, count in zip(self.content_start[e].tolist(), self.content_count[e].tolist()):
+                for index in range(start, start + count):
+                    owners[index] = e
+        return [(text, owner) for text, owner in zip(self.contents, owners)]
+
+    def _kind_tail_json(self, entity, variant):
+        """JSON for the kind-specific fields between post_type and age_group"""
+        kind = self.entity_kind[entity]
+        if kind == "trending":
+            return ',"category":"trending"'
+        if kind == "secondary":
+            return (f',"category":{dump_json(self.entity_category[entity])},'
+                    f'"brand":{dump_json(self.entity_name[entity])}')
+        comparison = KIND_VARIANTS["competitor"][variant] if variant < 2 else None
+        return (f',"platform":{dump_json(self.entity_name[entity])},'
+                f'"comparison_type":{dump_json(comparison)}')
+
+# Built once per container when NumPy is available
+COLUMNAR_ENGINE = ColumnarPostEngine(CATALOG) if np is not None else None
+
+def generate_posts_columnar(n, seed=None, stream=None):
+    """Generate n posts with the columnar engine"""
+    if COLUMNAR_ENGINE is None:
+        raise ImportError("NumPy is required for columnar post generation")
+    if stream is None and seed is not None:
+        stream = SyntheticStream(seed)
+    return COLUMNAR_ENGINE.generate(n, stream)
+
+def materialize_posts(columns):
+    """Turn columnar output into a list of post dicts"""
+    return list(COLUMNAR_ENGINE.iter_posts(columns))
+
+def inject_deceptive_posts(chunk, stream, sequence_start, fraction):
+    """Swap in deceptive posts where the chunk's slice of the global post sequence schedules them.
+
+    Chunks cover consecutive ranges of one sequence, so the output holds exactly
+    floor(N * fraction) deceptive posts in its first N however the chunks were
+    spread over workers. Each deceptive post takes the timestamp of the post it
+    replaces. Columnar chunks keep them under "deceptive" by offset. Without a
+    fraction nothing is injected; only the Lambda defaults to DECEPTIVE_FRACTION.
+    """
+    if fraction is None:
+        return chunk
+    columnar = isinstance(chunk, dict)
+    size = chunk["size"] if columnar else len(chunk)
+    offsets = DeceptionScheduler(fraction).positions(sequence_start, size)
+    deceptive = {}
+    for offset in offsets:
+        post = generate_deceptive_post(stream)
+        if post:
+            if columnar:
+                post["timestamp"] = datetime.fromtimestamp(int(chunk["timestamp"][offset]), pytz.UTC).strftime(
+                    "%Y-%m-%d %H:%M:%S UTC")
+            else:
+                post["timestamp"] = chunk[offset]["timestamp"]
+            deceptive[offset] = post
+    if isinstance(chunk, dict):
+        chunk["deceptive"] = deceptive
+    else:
+        for offset, post in deceptive.items():
+            chunk[offset] = post
+    return chunk
+
+def generate_chunk(seed, chunk_index, size, start_time=None, columnar=True, as_jsonl=True,
+                   sequence_start=0, deceptive_fraction=None):
+    """Generate one deterministic chunk of posts.
+
+    Returns JSON lines, or the raw chunk (NumPy columns when columnar, a list of
+    post dicts otherwise) when as_jsonl is False. sequence_start is the chunk's
+    position in the run, which places its share of deceptive posts.
+    """
+    stream = SyntheticStream(seed, worker_id=chunk_index, start_time=start_time)
+    if columnar and COLUMNAR_ENGINE is not None:
+        columns = inject_deceptive_posts(COLUMNAR_ENGINE.generate(size, stream), stream,
+                                         sequence_start, deceptive_fraction)
+        return COLUMNAR_ENGINE.to_jsonl(columns) if as_jsonl else columns
+    posts = inject_deceptive_posts(generate_mixed_posts(size, stream), stream, sequence_start, deceptive_fraction)
+    return ''.join(dump_json(post) + '\n' for post in posts) if as_jsonl else posts
+
+def _generate_chunk_task(args):
+    """Pool entry point for generate_chunk"""
+    return generate_chunk(*args)
+
+def generate_parallel(total_posts, seed, chunk_size=100000, workers=None, start_time=None,
+                      columnar=True, as_jsonl=True, deceptive_fraction=None):
+    """Fan post generation across processes and yield chunks in order.
+
+    Each chunk gets its own child stream keyed by its index rather than by the
+    process that ran it, so the output is identical for any number of workers.
+    Pass start_time as well as seed for byte-identical replays. Lambda has no
+    /dev/shm, so this is meant for local backfills.
+    """
+    tasks = [
+        (seed, index, min(chunk_size, total_posts - offset), start_time, columnar, as_jsonl,
+         offset, deceptive_fraction)
+        for index, offset in enumerate(range(0, total_posts, chunk_size))
+    ]
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _generate_chunk_task(task)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        for chunk in pool.imap(_generate_chunk_task, tasks):
+            yield chunk
+
+# Historical backfill
+LOCATION_TIMEZONES = {
+    "New York USA": "America/New_York", "San Francisco USA": "America/Los_Angeles",
+    "Toronto Canada": "America/Toronto", "Vancouver Canada": "America/Vancouver",
+    "Mexico City Mexico": "America/Mexico_City",
+    "London UK": "Europe/London", "Paris France": "Europe/Paris", "Berlin Germany": "Europe/Berlin",
+    "Amsterdam Netherlands": "Europe/Amsterdam", "Madrid Spain": "Europe/Madrid",
+    "Tokyo Japan": "Asia/Tokyo", "Singapore": "Asia/Singapore", "Seoul South Korea": "Asia/Seoul",
+    "Mumbai India": "Asia/Kolkata", "Dubai UAE": "Asia/Dubai",
+    "Sydney Australia": "Australia/Sydney", "Melbourne Australia": "Australia/Melbourne",
+    "Auckland New Zealand": "Pacific/Auckland",
+    "São Paulo Brazil": "America/Sao_Paulo", "Buenos Aires Argentina": "America/Argentina/Buenos_Aires",
+    "Lagos Nigeria": "Africa/Lagos", "Cape Town South Africa": "Africa/Johannesburg",
+    "Nairobi Kenya": "Africa/Nairobi"
+}
+
+# Relative posting activity by local hour of day
+DIURNAL_ACTIVITY = [
+    0.35, 0.25, 0.18, 0.15, 0.15, 0.20, 0.35, 0.55, 0.70, 0.75, 0.80, 0.85,
+    0.95, 0.90, 0.85, 0.85, 0.90, 0.95, 1.00, 1.00, 0.95, 0.85, 0.70, 0.50
+]
+
+DEFAULT_POSTS_PER_DAY = 15 * 12 * 24  # one 15-post batch every 5 minutes
+
+def location_activity(hour_start, locations):
+    """Diurnal activity weight of each location for a UTC hour"""
+    weights = []
+    for location in locations:
+        tz = pytz.timezone(LOCATION_TIMEZONES.get(location, "UTC"))
+        weights.append(DIURNAL_ACTIVITY[hour_start.astimezone(tz).hour])
+    return weights
+
+def parse_bursts(bursts):
+    """Normalize burst definitions to (hashtag, start, end, multiplier) tuples.
+
+    Each burst is a dict with "hashtag", "start" (ISO-8601 UTC), "duration_minutes"
+    and "multiplier", e.g. {"hashtag": "#KPopFever", "start": "2025-08-01T18:00:00",
+    "duration_minutes": 45, "multiplier": 8}.
+    """
+    parsed = []
+    for burst in bursts or []:
+        hashtag = burst["hashtag"]
+        if hashtag not in CATALOG.by_hashtag:
+            raise ValueError(f"Bursts must target a trending, brand or competitor hashtag: {hashtag}")
+        start = burst["start"]
+        if isinstance(start, str):
+            start = datetime.fromisoformat(start)
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=pytz.UTC)
+        end = start + timedelta(minutes=burst.get("duration_minutes", 30))
+        parsed.append((hashtag, start, end, float(burst.get("multiplier", 5))))
+    return parsed
+
+def hashtag_share(entry):
+    """Probability that an ordinary post carries the entry's hashtag"""
+    if entry.kind == "trending":
+        return POST_KIND_SHARES[0] * CATALOG.trending_sampler.probabilities[CATALOG.trending.index(entry)]
+    if entry.kind == "competitor":
+        return POST_KIND_SHARES[2] * CATALOG.competitor_sampler.probabilities[CATALOG.competitors.index(entry)]
+    return POST_KIND_SHARES[1] * CATALOG.secondary_sampler.probabilities[CATALOG.secondary.index(entry)]
+
+def plan_backfill(days, end_time=None, posts_per_day=DEFAULT_POSTS_PER_DAY, bursts=None):
+    """Split a backfill into hours of (hour_start, [(free posts, {burst hashtag: extra posts})] per minute).
+
+    Planning only does arithmetic, so the fractional carries that keep totals on
+    the curve run once here and the hours can then be generated in any order.
+    """
+    end_time = (end_time or datetime.now(pytz.UTC)).replace(minute=0, second=0, microsecond=0)
+    start_time = end_time - timedelta(days=days)
+    bursts = parse_bursts(bursts)
+    burst_shares = {hashtag: hashtag_share(CATALOG.by_hashtag[hashtag]) for hashtag, _, _, _ in bursts}
+    average_activity = sum(DIURNAL_ACTIVITY) / len(DIURNAL_ACTIVITY)
+    carry = 0.0
+    burst_carry = {hashtag: 0.0 for hashtag in burst_shares}
+
+    hours = []
+    hour_start = start_time
+    while hour_start < end_time:
+        weights = location_activity(hour_start, CATALOG.locations)
+        minute_volume = posts_per_day / 1440 * (sum(weights) / len(weights)) / average_activity
+
+        minutes = []
+        for minute in range(60):
+            minute_start = hour_start + timedelta(minutes=minute)
+
+            # Fractional volume carries over so totals match the curve exactly
+            carry += minute_volume
+            count = int(carry)
+            carry -= count
+
+            extras = {}
+            for hashtag, burst_start, burst_end, multiplier in bursts:
+                if burst_start <= minute_start < burst_end:
+                    burst_carry[hashtag] += minute_volume * burst_shares[hashtag] * (multiplier - 1)
+                    extra = int(burst_carry[hashtag])
+                    burst_carry[hashtag] -= extra
+                    if extra:
+                        extras[hashtag] = extras.get(hashtag, 0) + extra
+            minutes.append((count, extras))
+
+        hours.append((hour_start, minutes))
+        hour_start += timedelta(hours=1)
+    return hours
+
+def generate_backfill_hour(seed, hour_index, hour_start, minutes, columnar=False,
+                           sequence_start=0, deceptive_fraction=None):
+    """Generate one planned hour with its own child stream.
+
+    Returns NumPy columns when columnar, otherwise a list of post dicts. Each
+    post is timestamped at a random second of its planned minute, and the
+    hour's slice of the backfill sequence places its deceptive posts.
+    """
+    stream = SyntheticStream(seed, worker_id=hour_index, start_time=hour_start)
+    location_sampler = AliasSampler(CATALOG.locations, location_activity(hour_start, CATALOG.locations))
+
+    if columnar and COLUMNAR_ENGINE is not None:
+        rng = stream.np_rng
+        hour_seconds = int(hour_start.timestamp())
+        minute_offsets = []
+        forced = []
+        for minute, (count, extras) in enumerate(minutes):
+            minute_offsets.extend([minute * 60] * count)
+            forced.extend([-1] * count)
+            for hashtag, extra in extras.items():
+                minute_offsets.extend([minute * 60] * extra)
+                forced.extend([COLUMNAR_ENGINE.entity_index[hashtag]] * extra)
+        n = len(forced)
+        timestamps = hour_seconds + np.asarray(minute_offsets, dtype=np.int64) + rng.integers(0, 60, n)
+        columns = COLUMNAR_ENGINE.generate(n, stream, timestamps=timestamps, location_sampler=location_sampler,
+                                           forced_entity=np.asarray(forced, dtype=np.int64))
+        return inject_deceptive_posts(columns, stream, sequence_start, deceptive_fraction)
+
+    rng = stream.rng
+    stream.location_sampler = location_sampler
+    kind_sampler = AliasSampler(POST_KINDS, POST_KIND_SHARES)
+    generators = {
+        "trending": generate_trending_post,
+        "secondary": generate_secondary_post,
+        "competitor": generate_competitor_post
+    }
+    posts = []
+    for minute, (count, extras) in enumerate(minutes):
+        minute_start = hour_start + timedelta(minutes=minute)
+        planned = [(kind_sampler.sample(rng), None) for _ in range(count)]
+        for hashtag, extra in extras.items():
+            planned.extend((CATALOG.by_hashtag[hashtag].kind, hashtag) for _ in range(extra))
+
+        for kind, hashtag in planned:
+            stream.set_time(minute_start + timedelta(seconds=rng.randint(0, 59)))
+            if hashtag:
+                post = generators[kind](stream, hashtag=hashtag)
+            else:
+                post = generators[kind](stream)
+            if post:
+                posts.append(post)
+    return inject_deceptive_posts(posts, stream, sequence_start, deceptive_fraction)
+
+def _generate_backfill_task(args):
+    """Pool entry point for generate_backfill_hour"""
+    return generate_backfill_hour(*args)
+
+def generate_backfill(days, end_time=None, posts_per_day=DEFAULT_POSTS_PER_DAY, bursts=None,
+                      seed=None, workers=1, columnar=False, deceptive_fraction=None):
+    """Generate N days of posts on a simulated clock, yielding (hour_start, chunk) per hour.
+
+    Hourly volume follows DIURNAL_ACTIVITY in each location's local time, and
+    the location mix shifts with it. Bursts add extra posts for a hashtag on top
+    of the normal volume. Nothing sleeps, so this runs as fast as the CPU allows.
+    Hours are keyed by index like generate_parallel chunks, so a seeded backfill
+    is identical for any number of workers.
+    """
+    if seed is None:
+        seed = random.getrandbits(32)
+    tasks = []
+    sequence_start = 0
+    for index, (hour_start, minutes) in enumerate(plan_backfill(days, end_time, posts_per_day, bursts)):
+        tasks.append((seed, index, hour_start, minutes, columnar, sequence_start, deceptive_fraction))
+        sequence_start += sum(count + sum(extras.values()) for count, extras in minutes)
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield task[2], _generate_backfill_task(task)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        for task, chunk in zip(tasks, pool.imap(_generate_backfill_task, tasks)):
+            yield task[2], chunk
+
+REQUIRED_POST_FIELDS = (
+    "post_id", "timestamp", "username", "content",
+    "hashtags", "engagement", "user_age",
+    "user_gender", "post_type"
+)
+ENGAGEMENT_FIELDS = ("likes", "retweets", "replies")
+
+# Content only needs collapsing when it has runs of whitespace, non-space
+# whitespace or leading/trailing whitespace
+_CONTENT_NEEDS_CLEANING = re.compile(r'\s\s|[^\S ]|^\s|\s$')
+
+def compile_post_validator(max_length=280):
+    """Build a validator with the schema resolved once.
+
+    The returned function cleans the post's content in place and returns None
+    for a valid post or the error message otherwise.
+    """
+    required = frozenset(REQUIRED_POST_FIELDS)
+    engagement_fields = frozenset(ENGAGEMENT_FIELDS)
+    genders = frozenset(GENDERS)
+    needs_cleaning = _CONTENT_NEEDS_CLEANING.search
+
+    def validate(post):
+        if not post.keys() >= required:
+            missing = next(field for field in REQUIRED_POST_FIELDS if field not in post)
+            return f"Missing required field: {missing}"
+
+        hashtags = post["hashtags"]
+        if type(hashtags) is not list or len(hashtags) != 1:
+            return "Invalid hashtags format or count"
+
+        if not post["engagement"].keys() >= engagement_fields:
+            return "Missing engagement metrics"
+
+        age = post["user_age"]
+        if not isinstance(age, int) or not (18 <= age <= 65):
+            return "Invalid user age"
+
+        if post["user_gender"] not in genders:
+            return "Invalid user gender"
+
+        content = post["content"]
+        if not content:
+            return "Invalid content"
+        if needs_cleaning(content):
+            content = ' '.join(content.split())
+        if len(content) > max_length:
+            content = content[:max_length-3] + "..."
+        post["content"] = content
+        return None
+
+    return validate
+
+POST_VALIDATOR = compile_post_validator()
+
 def validate_post(post):
     """Validate post structure and content"""
     try:
-        required_fields = [
-            "post_id", "timestamp", "username", "content", 
-            "hashtags", "engagement", "user_age",
-            "user_gender", "post_type"
-        ]
-        for field in required_fields:
-            if field not in post:
-                return False, f"Missing required field: {field}"
-        
-        if not isinstance(post["hashtags"], list) or len(post["hashtags"]) != 1:
-            return False, "Invalid hashtags format or count"
-        
-        if not all(key in post["engagement"] for key in ["likes", "retweets", "replies"]):
-            return False, "Missing engagement metrics"
-        
-        if not isinstance(post["user_age"], int) or not (18 <= post["user_age"] <= 65):
-            return False, "Invalid user age"
-        
-        if post["user_gender"] not in ["male", "female"]:
-            return False, "Invalid user gender"
-        
-        is_valid_content, cleaned_content = validate_post_content(post["content"])
-        if not is_valid_content:
-            return False, "Invalid content"
-        
-        post["content"] = cleaned_content
-        
+        error = POST_VALIDATOR(post)
+        if error:
+            return False, error
         return True, "Valid post"
     except Exception as e:
         return False, f"Validation error: {str(e)}"
 
-def analyze_distribution(posts):
-    """Analyze the distribution of posts"""
-    analysis = {
-        "total_posts": len(posts),
-        "post_types": {},
-        "hashtags": {},
-        "demographics": {
-            "gender": {"male": 0, "female": 0},
-            "age_groups": {"18-25": 0, "26-35": 0, "36-50": 0, "51-65": 0}
-        },
-        "engagement": {
-            "total_likes": 0,
-            "total_retweets": 0,
-            "total_replies": 0,
-            "average_engagement_per_post": 0
-        },
-        "topics": {},
-        "temporal_distribution": {}
-    }
-    
+class PostEncoder:
+    """Encodes posts as JSON lines with orjson when available, the stdlib otherwise.
+
+    Both backends produce the same bytes, so outputs never mix formats.
+    """
+
+    def __init__(self, backend=None):
+        backend = backend or ('orjson' if orjson is not None else 'json')
+        if backend == 'orjson':
+            if orjson is None:
+                raise ImportError("orjson is not installed")
+            self.encode = lambda post: orjson.dumps(post, option=orjson.OPT_APPEND_NEWLINE)
+        else:
+            self.encode = lambda post: (dump_json(post) + '\n').encode('utf-8')
+        self.backend = backend
+        self.buffer = bytearray()
+
+    def encode_jsonl(self, posts):
+        """Encode a batch into the reusable buffer and return a view of it"""
+        buffer = self.buffer
+        buffer.clear()
+        encode = self.encode
+        for post in posts:
+            buffer += encode(post)
+        return memoryview(buffer)
+
+POST_ENCODER = PostEncoder(os.environ.get('POST_SERIALIZER'))
+
+def validate_and_encode_posts(posts, encoder=None):
+    """Validate and encode a batch in one pass.
+
+    Returns the valid posts, their encoded JSON lines, the failure count and
+    the error messages.
+    """
+    encode = (encoder or POST_ENCODER).encode
+    validate = POST_VALIDATOR
+    valid_posts = []
+    encoded = []
+    failed_records = 0
+    errors = []
     for post in posts:
+        if not post:
+            failed_records += 1
+            continue
+        post_id = 'unknown'
+        try:
+            post_id = post.get('post_id', 'unknown')
+            error = validate(post)
+            if error is None:
+                data = encode(post)
+        except Exception as e:
+            error = f"Validation error: {str(e)}"
+        if error:
+            failed_records += 1
+            errors.append(f"Post {post_id}: {error}")
+            continue
+        valid_posts.append(post)
+        encoded.append(data)
+    return valid_posts, encoded, failed_records, errors
+
+PARTITION_KEYS = [str(i) for i in range(1, 101)]
+
+def build_kinesis_record(data):
+    """Build a PutRecords entry for an encoded post"""
+    return {
+        'Data': data,
+        'PartitionKey': random.choice(PARTITION_KEYS)
+    }
+
+def chunk_records(records):
+    """Pack Kinesis records into chunks within the PutRecords count and size limits"""
+    chunk = []
+    chunk_bytes = 0
+    for record in records:
+        record_bytes = len(record['Data']) + len(record['PartitionKey'].encode('utf-8'))
+        if chunk and (len(chunk) >= MAX_RECORDS_PER_PUT or chunk_bytes + record_bytes > MAX_BYTES_PER_PUT):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(record)
+        chunk_bytes += record_bytes
+    if chunk:
+        yield chunk
+
+def get_error_code(error):
+    """Extract the AWS error code from a botocore exception"""
+    return getattr(error, 'response', {}).get('Error', {}).get('Code', type(error).__name__)
+
+def is_retryable_error(error_code, status_code=None):
+    """Throttling and server-side failures are worth retrying; anything else will fail again"""
+    return (error_code in THROTTLING_ERROR_CODES or error_code in SERVER_ERROR_CODES
+            or (status_code or 0) >= 500)
+
+def put_records_with_retry(records, max_retries=MAX_PUT_RETRIES, stream_name=STREAM_NAME):
+    """Send one PutRecords chunk, retrying only the failed entries with backoff"""
+    result = {
+        'successful_records': 0,
+        'failed_records': 0,
+        'throttled_records': 0,
+        'shard_counts': {},
+        'errors': []
+    }
+    pending = records
+    attempt = 0
+
+    while pending:
+        retry = []
+        try:
+            response = kinesis_client.put_records(StreamName=stream_name, Records=pending)
+            for record, entry in zip(pending, response['Records']):
+                if 'ErrorCode' in entry:
+                    message = f"{entry['ErrorCode']}: {entry.get('ErrorMessage', '')}"
+                    if entry['ErrorCode'] in THROTTLING_ERROR_CODES:
+                        result['throttled_records'] += 1
+                    if is_retryable_error(entry['ErrorCode']):
+                        retry.append((record, message))
+                    else:
+                        # e.g. KMS access errors on an encrypted stream fail the same way every time
+                        result['failed_records'] += 1
+                        if message not in result['errors']:
+                            result['errors'].append(message)
+                else:
+                    shard_id = entry['ShardId']
+                    result['shard_counts'][shard_id] = result['shard_counts'].get(shard_id, 0) + 1
+                    result['successful_records'] += 1
+        except Exception as e:
+            # The whole call failed; only throttling and 5xx errors are retried,
+            # others such as AccessDenied or ResourceNotFound are raised at once
+            error_code = get_error_code(e)
+            status_code = getattr(e, 'response', {}).get('ResponseMetadata', {}).get('HTTPStatusCode')
+            if not is_retryable_error(error_code, status_code):
+                raise
+            if error_code in THROTTLING_ERROR_CODES:
+                result['throttled_records'] += len(pending)
+            retry = [(record, f"{error_code}: {str(e)}") for record in pending]
+
+        if not retry:
+            break
+
+        if attempt >= max_retries:
+            result['failed_records'] += len(retry)
+            result['errors'].extend(sorted(set(message for _, message in retry)))
+            break
+
+        # Exponential backoff with jitter before resending the failed entries
+        time.sleep(RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.0))
+        attempt += 1
+        pending = [record for record, _ in retry]
+
+    return result
+
+def send_posts_batch(posts, encoded=None, stream_name=STREAM_NAME):
+    """Send validated posts to Kinesis using batched PutRecords calls"""
+    summary = {
+        'successful_records': 0,
+        'failed_records': 0,
+        'throttled_records': 0,
+        'put_records_calls': 0,
+        'shard_counts': {},
+        'errors': []
+    }
+
+    if encoded is None:
+        encoded = [POST_ENCODER.encode(post) for post in posts]
+
+    records = []
+    for post, data in zip(posts, encoded):
+        record = build_kinesis_record(data)
+        if len(record['Data']) + len(record['PartitionKey']) > MAX_BYTES_PER_RECORD:
+            summary['failed_records'] += 1
+            summary['errors'].append(f"Post {post.get('post_id', 'unknown')}: record exceeds 1 MB limit")
+            continue
+        records.append(record)
+
+    for chunk in chunk_records(records):
+        chunk_result = put_records_with_retry(chunk, stream_name=stream_name)
+        summary['put_records_calls'] += 1
+        summary['successful_records'] += chunk_result['successful_records']
+        summary['failed_records'] += chunk_result['failed_records']
+        summary['throttled_records'] += chunk_result['throttled_records']
+        summary['errors'].extend(chunk_result['errors'])
+        for shard_id, count in chunk_result['shard_counts'].items():
+            summary['shard_counts'][shard_id] = summary['shard_counts'].get(shard_id, 0) + count
+
+    return summary
+
+class DistributionAggregator:
+    """Mergeable running counters behind analyze_distribution.
+
+    Each post is folded in with O(1) work, aggregators from different batches or
+    workers can be merged, and the state round-trips through JSON so cumulative
+    distributions survive across invocations without keeping posts around.
+    """
+
+    def __init__(self):
+        self.total_posts = 0
+        self.post_types = {}
+        self.hashtags = {}
+        self.gender = {"male": 0, "female": 0}
+        self.age_groups = {age_group: 0 for age_group in AGE_GROUPS}
+        self.total_likes = 0
+        self.total_retweets = 0
+        self.total_replies = 0
+        self.topics = {}
+        self.hours = {}
+
+    def add(self, post):
+        """Fold one post into the counters"""
+        self.total_posts += 1
         post_type = post["post_type"]
-        analysis["post_types"][post_type] = analysis["post_types"].get(post_type, 0) + 1
-        
+        self.post_types[post_type] = self.post_types.get(post_type, 0) + 1
+
         hashtag = post["hashtags"][0]
-        analysis["hashtags"][hashtag] = analysis["hashtags"].get(hashtag, 0) + 1
-        
-        analysis["demographics"]["gender"][post["user_gender"]] += 1
-        analysis["demographics"]["age_groups"][post["age_group"]] += 1
-        
+        self.hashtags[hashtag] = self.hashtags.get(hashtag, 0) + 1
+
+        self.gender[post["user_gender"]] += 1
+        self.age_groups[post["age_group"]] += 1
+
         engagement = post["engagement"]
-        analysis["engagement"]["total_likes"] += engagement["likes"]
-        analysis["engagement"]["total_retweets"] += engagement["retweets"]
-        analysis["engagement"]["total_replies"] += engagement["replies"]
-        
-        topic = post["topic"]
-        if topic not in analysis["topics"]:
-            analysis["topics"][topic] = {
-                "count": 0,
-                "engagement": 0
+        likes = engagement["likes"]
+        retweets = engagement["retweets"]
+        replies = engagement["replies"]
+        self.total_likes += likes
+        self.total_retweets += retweets
+        self.total_replies += replies
+
+        topic = self.topics.get(post["topic"])
+        if topic is None:
+            topic = self.topics[post["topic"]] = {"count": 0, "engagement": 0}
+        topic["count"] += 1
+        topic["engagement"] += likes + retweets + replies
+
+        # Timestamps are "YYYY-MM-DD HH:MM:SS UTC", so the hour is a fixed slice
+        hour = post["timestamp"][11:13] + ":00"
+        self.hours[hour] = self.hours.get(hour, 0) + 1
+
+    def update(self, posts):
+        """Fold a batch of posts into the counters"""
+        for post in posts:
+            if post:
+                self.add(post)
+        return self
+
+    def merge(self, other):
+        """Add another aggregator's counters into this one"""
+        self.total_posts += other.total_posts
+        for mine, theirs in ((self.post_types, other.post_types), (self.hashtags, other.hashtags),
+                             (self.gender, other.gender), (self.age_groups, other.age_groups),
+                             (self.hours, other.hours)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        self.total_likes += other.total_likes
+        self.total_retweets += other.total_retweets
+        self.total_replies += other.total_replies
+        for topic, stats in other.topics.items():
+            mine = self.topics.setdefault(topic, {"count": 0, "engagement": 0})
+            mine["count"] += stats["count"]
+            mine["engagement"] += stats["engagement"]
+        return self
+
+    def analysis(self):
+        """Distribution report in the analyze_distribution format"""
+        total_engagement = self.total_likes + self.total_retweets + self.total_replies
+        return {
+            "total_posts": self.total_posts,
+            "post_types": dict(self.post_types),
+            "hashtags": dict(self.hashtags),
+            "demographics": {
+                "gender": dict(self.gender),
+                "age_groups": dict(self.age_groups)
+            },
+            "engagement": {
+                "total_likes": self.total_likes,
+                "total_retweets": self.total_retweets,
+                "total_replies": self.total_replies,
+                "average_engagement_per_post": (
+                    total_engagement / self.total_posts if self.total_posts > 0 else 0
+                )
+            },
+            "topics": {topic: dict(stats) for topic, stats in self.topics.items()},
+            "temporal_distribution": dict(self.hours),
+            "top_hashtags": dict(
+                sorted(self.hashtags.items(), key=lambda x: x[1], reverse=True)[:10]
+            )
+        }
+
+    def to_dict(self):
+        """JSON-serializable snapshot of the counters"""
+        return {
+            "total_posts": self.total_posts,
+            "post_types": self.post_types,
+            "hashtags": self.hashtags,
+            "gender": self.gender,
+            "age_groups": self.age_groups,
+            "total_likes": self.total_likes,
+            "total_retweets": self.total_retweets,
+            "total_replies": self.total_replies,
+            "topics": self.topics,
+            "hours": self.hours
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Restore an aggregator from a snapshot"""
+        aggregator = cls()
+        for key, value in data.items():
+            setattr(aggregator, key, value)
+        return aggregator
+
+    def save(self, path):
+        """Write a snapshot atomically"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a snapshot, or start empty if there is none yet"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+def analyze_distribution(posts):
+    """Analyze the distribution of posts"""
+    return DistributionAggregator().update(posts).analysis()
+
+def update_cumulative_distribution(aggregator):
+    """Merge a batch into the snapshot at DISTRIBUTION_SNAPSHOT_PATH, if configured"""
+    path = os.environ.get('DISTRIBUTION_SNAPSHOT_PATH')
+    if not path:
+        return None
+    cumulative = DistributionAggregator.load(path).merge(aggregator)
+    cumulative.save(path)
+    return cumulative.analysis()
+
+# Ground-truth labels
+LABEL_HOME_BRAND = "AnyCompany"
+# A competitor comparison is about AnyCompany, positive when AnyCompany comes out better
+COMPARISON_SENTIMENT = {"better": "positive", "worse": "negative"}
+OPPOSITE_SENTIMENT = {"positive": "negative", "negative": "positive", "neutral": "neutral"}
+LABEL_SENTIMENTS = ("positive", "negative", "neutral")
+
+def new_label(post_id, timestamp, post_type, hashtag):
+    """Empty label record for a post"""
+    return {
+        "post_id": post_id,
+        "timestamp": timestamp,
+        "post_type": post_type,
+        "hashtag": hashtag,
+        "brand": None,
+        "competitor": None,
+        "sentiment": None,
+        "is_deceptive": post_type == "promotional"
+    }
+
+def label_post(post):
+    """Ground-truth label for a generated post.
+
+    Secondary posts remember the sentiment their content was sampled with, so the
+    label survives content cleaning and truncation. Competitor comparisons
+    count towards AnyCompany, and towards the competitor with the opposite
+    sentiment; trending posts have no sentiment label.
+    """
+    post_type = post.get("post_type")
+    hashtags = post.get("hashtags") or [None]
+    label = new_label(post.get("post_id"), post.get("timestamp"), post_type, hashtags[0])
+    if post_type == "secondary":
+        label["brand"] = post.get("brand")
+        label["sentiment"] = getattr(post, "sentiment_type", None)
+    elif post_type == "competitor":
+        label["brand"] = LABEL_HOME_BRAND
+        label["competitor"] = post.get("platform")
+        label["sentiment"] = COMPARISON_SENTIMENT.get(post.get("comparison_type"))
+    return label
+
+def label_posts(posts):
+    """Labels for a batch of posts"""
+    return [label_post(post) for post in posts if post]
+
+class LabelCounts:
+    """Exact per-window label counts by brand, hashtag and sentiment"""
+
+    def __init__(self, window_minutes=1):
+        self.window_minutes = window_minutes
+        self.windows = {}
+        self._window_keys = {}
+
+    def window_key(self, timestamp):
+        """Start of the window holding a post timestamp, as an ISO-8601 string"""
+        key = self._window_keys.get(timestamp)
+        if key is None:
+            moment = pytz.UTC.localize(datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S UTC"))
+            minutes = int(moment.timestamp()) // 60
+            start = (minutes - minutes % self.window_minutes) * 60
+            key = datetime.fromtimestamp(start, pytz.UTC).strftime("%Y-%m-%dT%H:%M:00Z")
+            if len(self._window_keys) > 10000:
+                self._window_keys.clear()
+            self._window_keys[timestamp] = key
+        return key
+
+    def _window(self, key):
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = {
+                "posts": 0,
+                "deceptive": 0,
+                "hashtags": {},
+                "sentiment": {},
+                "brands": {}
             }
-        analysis["topics"][topic]["count"] += 1
-        analysis["topics"][topic]["engagement"] += sum(engagement.values())
-        
-        hour = datetime.strptime(post["timestamp"], "%Y-%m-%d %H:%M:%S UTC").strftime("%H:00")
-        analysis["temporal_distribution"][hour] = analysis["temporal_distribution"].get(hour, 0) + 1
-    
-    if len(posts) > 0:
-        total_engagement = (
-            analysis["engagement"]["total_likes"] +
-            analysis["engagement"]["total_retweets"] +
-            analysis["engagement"]["total_replies"]
+        return window
+
+    def add(self, label):
+        """Count one label"""
+        window = self._window(self.window_key(label["timestamp"]))
+        window["posts"] += 1
+        if label["is_deceptive"]:
+            window["deceptive"] += 1
+        hashtag = label["hashtag"]
+        if hashtag:
+            window["hashtags"][hashtag] = window["hashtags"].get(hashtag, 0) + 1
+        sentiment = label["sentiment"]
+        if sentiment:
+            window["sentiment"][sentiment] = window["sentiment"].get(sentiment, 0) + 1
+            brand = window["brands"].setdefault(label["brand"], dict.fromkeys(LABEL_SENTIMENTS, 0))
+            brand[sentiment] += 1
+            if label["competitor"]:
+                # Same attribution rule as the action group: the competitor gets the opposite sentiment
+                competitor = window["brands"].setdefault(label["competitor"], dict.fromkeys(LABEL_SENTIMENTS, 0))
+                competitor[OPPOSITE_SENTIMENT[sentiment]] += 1
+        return self
+
+    def update(self, labels):
+        """Count a batch of labels"""
+        for label in labels:
+            self.add(label)
+        return self
+
+    def merge(self, other):
+        """Fold another set of counts with the same window size into this one"""
+        if other.window_minutes != self.window_minutes:
+            raise ValueError("Cannot merge label counts with different window sizes")
+        for key, theirs in other.windows.items():
+            window = self._window(key)
+            window["posts"] += theirs["posts"]
+            window["deceptive"] += theirs["deceptive"]
+            for field in ("hashtags", "sentiment"):
+                for name, count in theirs[field].items():
+                    window[field][name] = window[field].get(name, 0) + count
+            for name, counts in theirs["brands"].items():
+                brand = window["brands"].setdefault(name, dict.fromkeys(LABEL_SENTIMENTS, 0))
+                for sentiment, count in counts.items():
+                    brand[sentiment] += count
+        return self
+
+    def to_dict(self):
+        return {
+            "window_minutes": self.window_minutes,
+            "windows": {key: self.windows[key] for key in sorted(self.windows)}
+        }
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+class LabelWriter:
+    """Writes labels as JSON lines and keeps per-window counts for them; either output is optional"""
+
+    def __init__(self, path=None, counts_path=None, window_minutes=1):
+        self.path = path
+        self.counts_path = counts_path
+        self.file = None
+        if path:
+            self.file = gzip.open(path, 'wb') if path.endswith('.gz') else open(path, 'wb')
+        self.encoder = PostEncoder()
+        self.counts = LabelCounts(window_minutes)
+
+    def write_labels(self, labels):
+        self.counts.update(labels)
+        if self.file:
+            self.file.write(self.encoder.encode_jsonl(labels))
+
+    def write_chunk(self, chunk):
+        """Label a raw chunk of post dicts or NumPy columns"""
+        if isinstance(chunk, dict):
+            self.write_labels(list(COLUMNAR_ENGINE.iter_labels(chunk)))
+        else:
+            self.write_labels(label_posts(chunk))
+
+    def close(self):
+        if self.file:
+            self.file.close()
+        if self.counts_path:
+            self.counts.save(self.counts_path)
+        return {
+            'path': self.path,
+            'counts_path': self.counts_path,
+            'rows': sum(window["posts"] for window in self.counts.windows.values())
+        }
+
+def emit_labels(labels):
+    """Send labels to LABEL_STREAM_NAME when one is configured"""
+    if not LABEL_STREAM_NAME or not labels:
+        return None
+    result = send_posts_batch(labels, stream_name=LABEL_STREAM_NAME)
+    return {
+        'stream_name': LABEL_STREAM_NAME,
+        'successful_records': result['successful_records'],
+        'failed_records': result['failed_records']
+    }
+
+def validate_posts(posts):
+    """Validate a list of posts, returning the valid ones with failure details"""
+    valid_posts, _, failed_records, errors = validate_and_encode_posts(posts)
+    return valid_posts, failed_records, errors
+
+# Shared generator state
+DEFAULT_STATE_DB_PATH = '/tmp/synthetic-generator-state.db'
+# The legacy rule swapped one post into every 18th batch of 15
+DEFAULT_DECEPTIVE_FRACTION = Fraction(1, 18 * DEFAULT_BATCH_SIZE)
+
+class SQLiteStateStore:
+    """Counter store backed by a local SQLite file, safe across processes"""
+
+    def __init__(self, path=DEFAULT_STATE_DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
         )
-        analysis["engagement"]["average_engagement_per_post"] = total_engagement / len(posts)
-    
-    analysis["top_hashtags"] = dict(
-        sorted(
-            analysis["hashtags"].items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:10]
-    )
-    
-    return analysis
+
+    def increment(self, name, amount=1):
+        """Atomically add amount to a counter and return the new value"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 0) ON CONFLICT(name) DO NOTHING", (name,)
+            )
+            self.conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (amount, name))
+            value = self.conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def get(self, name):
+        row = self.conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+class DynamoDBStateStore:
+    """Counter store backed by atomic ADD updates on a DynamoDB table
+
+    The table needs a string partition key named counter_name.
+    """
+
+    def __init__(self, table_name, client=None):
+        self.table_name = table_name
+        self.client = client or boto3.client('dynamodb')
+
+    def increment(self, name, amount=1):
+        """Atomically add amount to a counter and return the new value"""
+        response = self.client.update_item(
+            TableName=self.table_name,
+            Key={'counter_name': {'S': name}},
+            UpdateExpression='ADD counter_value :amount',
+            ExpressionAttributeValues={':amount': {'N': str(amount)}},
+            ReturnValues='UPDATED_NEW'
+        )
+        return int(response['Attributes']['counter_value']['N'])
+
+    def get(self, name):
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key={'counter_name': {'S': name}},
+            ConsistentRead=True
+        )
+        item = response.get('Item')
+        return int(item['counter_value']['N']) if item else 0
+
+def create_state_store(backend=None):
+    """Pick the counter store from STATE_BACKEND, using DynamoDB when a table is configured"""
+    table_name = os.environ.get('STATE_TABLE_NAME')
+    backend = backend or os.environ.get('STATE_BACKEND') or ('dynamodb' if table_name else 'sqlite')
+    if backend == 'dynamodb':
+        if not table_name:
+            raise ValueError("STATE_TABLE_NAME is required for the dynamodb state backend")
+        return DynamoDBStateStore(table_name)
+    if backend == 'sqlite':
+        return SQLiteStateStore(os.environ.get('STATE_DB_PATH', DEFAULT_STATE_DB_PATH))
+    raise ValueError(f"Unknown state backend: {backend}")
+
+STATE_STORE = None
+
+def get_state_store():
+    """Shared counter store, created on first use"""
+    global STATE_STORE
+    if STATE_STORE is None:
+        STATE_STORE = create_state_store()
+    return STATE_STORE
+
+def require_shared_state_store():
+    """In Lambda, refuse the per-container SQLite counters unless STATE_BACKEND asks for them"""
+    if not os.environ.get('AWS_LAMBDA_FUNCTION_NAME') or not isinstance(get_state_store(), SQLiteStateStore):
+        return
+    if os.environ.get('STATE_BACKEND') != 'sqlite':
+        raise ValueError("STATE_TABLE_NAME is required in Lambda; SQLite counters reset on every cold start")
+    print("WARNING: STATE_BACKEND=sqlite keeps batch and deceptive post counters per container")
+
+def parse_fraction(value):
+    """Parse a rate such as '1/270' or '0.005' into an exact Fraction"""
+    fraction = Fraction(str(value))
+    if not 0 <= fraction <= 1:
+        raise ValueError(f"Fraction must be between 0 and 1: {value}")
+    return fraction
+
+class DeceptionScheduler:
+    """Places deceptive posts at an exact fraction of a global post sequence.
+
+    Each batch reserves a range of sequence numbers from the shared counter and
+    post n is deceptive when floor((n + 1) * fraction) > floor(n * fraction), so
+    the first N posts across all generators hold exactly floor(N * fraction)
+    deceptive ones however the ranges were split.
+    """
+
+    def __init__(self, fraction=None, store=None, counter_name='posts'):
+        if fraction is None:
+            fraction = os.environ.get('DECEPTIVE_FRACTION', DEFAULT_DECEPTIVE_FRACTION)
+        self.fraction = parse_fraction(fraction)
+        self.store = store
+        self.counter_name = counter_name
+
+    def positions(self, start, count):
+        """Offsets within [start, start + count) that should be deceptive"""
+        num, den = self.fraction.numerator, self.fraction.denominator
+        return [
+            offset for offset in range(count)
+            if (start + offset + 1) * num // den > (start + offset) * num // den
+        ]
+
+    def reserve(self, count):
+        """Reserve count sequence numbers and return (start, deceptive offsets)"""
+        # The shared store is only needed once ranges are reserved from it
+        if self.store is None:
+            self.store = get_state_store()
+        start = self.store.increment(self.counter_name, count) - count
+        return start, self.positions(start, count)
+
+    def inject(self, posts, stream=None):
+        """Swap scheduled posts in a batch for deceptive ones.
+
+        Returns the first sequence number of the batch and the number injected.
+        """
+        start, offsets = self.reserve(len(posts))
+        injected = 0
+        for offset in offsets:
+            deceptive_post = generate_deceptive_post(stream)
+            if deceptive_post:
+                posts[offset] = deceptive_post
+                injected += 1
+        return start, injected
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def run_throughput_mode(target_rate, duration_seconds, batch_size=None, context=None, scheduler=None):
+    """Stream posts to Kinesis at a target posts-per-second rate for a fixed duration"""
+    if target_rate <= 0 or duration_seconds <= 0:
+        raise ValueError("target_posts_per_second and duration_seconds must be positive")
+
+    # Size batches to roughly one tick worth of posts unless told otherwise
+    if not batch_size:
+        batch_size = int(target_rate * THROUGHPUT_TICK_SECONDS)
+    batch_size = max(1, min(int(batch_size), MAX_RECORDS_PER_PUT))
+
+    report = {
+        'mode': 'throughput',
+        'target_posts_per_second': target_rate,
+        'duration_seconds': duration_seconds,
+        'batch_size': batch_size,
+        'batches': 0,
+        'posts_generated': 0,
+        'deceptive_posts': 0,
+        'successful_records': 0,
+        'failed_records': 0,
+        'throttled_records': 0,
+        'put_records_calls': 0,
+        'shard_counts': {},
+        'stopped_early': False,
+        'errors': []
+    }
+    batch_latencies = []
+    distribution = DistributionAggregator()
+    scheduler = scheduler or DeceptionScheduler()
+    label_counts = LabelCounts()
+    report['deceptive_fraction'] = str(scheduler.fraction)
+
+    start = time.monotonic()
+    while True:
+        elapsed = time.monotonic() - start
+        if elapsed >= duration_seconds:
+            break
+        if context is not None and context.get_remaining_time_in_millis() < LAMBDA_TIME_BUFFER_MS:
+            report['stopped_early'] = True
+            break
+
+        posts = generate_mixed_posts(batch_size)
+        _, injected = scheduler.inject(posts)
+        valid_posts, encoded, failed_records, errors = validate_and_encode_posts(posts)
+
+        batch_start = time.monotonic()
+        send_result = send_posts_batch(valid_posts, encoded)
+        batch_latencies.append((time.monotonic() - batch_start) * 1000)
+
+        distribution.update(valid_posts)
+        labels = label_posts(valid_posts)
+        label_counts.update(labels)
+        emit_labels(labels)
+        report['batches'] += 1
+        report['posts_generated'] += len(posts)
+        report['deceptive_posts'] += injected
+        report['successful_records'] += send_result['successful_records']
+        report['failed_records'] += failed_records + send_result['failed_records']
+        report['throttled_records'] += send_result['throttled_records']
+        report['put_records_calls'] += send_result['put_records_calls']
+        for shard_id, count in send_result['shard_counts'].items():
+            report['shard_counts'][shard_id] = report['shard_counts'].get(shard_id, 0) + count
+        # Keep the report bounded on long runs
+        if len(report['errors']) < 50:
+            report['errors'].extend((errors + send_result['errors'])[:50 - len(report['errors'])])
+
+        # Pace the stream so the generated post count tracks the target rate
+        scheduled = report['posts_generated'] / target_rate
+        delay = scheduled - (time.monotonic() - start)
+        if delay > 0:
+            time.sleep(min(delay, max(0, duration_seconds - (time.monotonic() - start))))
+
+    elapsed = time.monotonic() - start
+    report['elapsed_seconds'] = round(elapsed, 3)
+    report['achieved_posts_per_second'] = round(report['successful_records'] / elapsed, 2) if elapsed > 0 else 0
+    report['batch_latency_ms'] = {
+        'p50': round(percentile(batch_latencies, 50), 2),
+        'p99': round(percentile(batch_latencies, 99), 2),
+        'max': round(max(batch_latencies), 2) if batch_latencies else 0
+    }
+    report['distribution'] = distribution.analysis()
+    report['cumulative_distribution'] = update_cumulative_distribution(distribution)
+    report['label_counts'] = label_counts.to_dict()['windows']
+    report['label_stream'] = LABEL_STREAM_NAME
+    report['errors'] = report['errors'] or None
+
+    return report
+
 def lambda_handler(event, context):
     """Main Lambda handler function"""
     try:
-        # Get or initialize batch counter from environment variable
-        batch_counter = int(os.environ.get('BATCH_COUNTER', 0))
-        batch_counter += 1
-        
-        # Fixed batch size of 15
-        batch_size = 15
+        # Pick up an updated catalog file without a cold start
+        refresh_catalog()
+        require_shared_state_store()
+
+        # Throughput mode streams posts at a target rate instead of sending one batch
+        target_rate = event.get('target_posts_per_second') or os.environ.get('TARGET_POSTS_PER_SECOND')
+        if target_rate:
+            duration = event.get('duration_seconds') or os.environ.get('DURATION_SECONDS', DEFAULT_DURATION_SECONDS)
+            report = run_throughput_mode(
+                float(target_rate),
+                float(duration),
+                batch_size=event.get('batch_size'),
+                context=context,
+                scheduler=DeceptionScheduler(event.get('deceptive_fraction'))
+            )
+            return {
+                'statusCode': 200 if report['failed_records'] == 0 else 207,
+                'body': json.dumps(report, indent=2)
+            }
+
+        batch_size = int(event.get('batch_size') or os.environ.get('BATCH_SIZE', DEFAULT_BATCH_SIZE))
         records_sent = 0
-        failed_records = 0
-        errors = []
-        
+
         # Generate regular posts
         posts = generate_mixed_posts(batch_size)
         
-        # Every 18th batch, replace one random post with a deceptive post
-        if batch_counter % 18 == 0:
-            deceptive_post = generate_deceptive_post()
-            if deceptive_post:
-                replace_index = random.randint(0, len(posts) - 1)
-                posts[replace_index] = deceptive_post
-                print(f"Inserted deceptive post in batch {batch_counter}")
-        
-        # Process and send each post
-        for post in posts:
-            try:
-                if not post:
-                    failed_records += 1
-                    continue
-                
-                # Validate post
-                is_valid, validation_message = validate_post(post)
-                if not is_valid:
-                    failed_records += 1
-                    errors.append(f"Post {post.get('post_id', 'unknown')}: {validation_message}")
-                    continue
-                
-                # Send to Kinesis
-                response = kinesis_client.put_record(
-                    StreamName=STREAM_NAME,
-                    Data=json.dumps(post) + '\n',
-                    PartitionKey=str(random.randint(1, 100))
-                )
-                
-                records_sent += 1
-                time.sleep(0.1)  # Small delay between records
-                
-            except Exception as e:
-                failed_records += 1
-                errors.append(f"Error processing post: {str(e)}")
-        
-        # Update batch counter in environment
-        os.environ['BATCH_COUNTER'] = str(batch_counter)
-        
+        # Count batches and inject deceptive posts from state shared by every container
+        batch_counter = get_state_store().increment('batches')
+        scheduler = DeceptionScheduler(event.get('deceptive_fraction'))
+        sequence_start, deceptive_count = scheduler.inject(posts)
+        if deceptive_count:
+            print(f"Inserted {deceptive_count} deceptive post(s) in batch {batch_counter}")
+
+        # Validate each post before sending
+        valid_posts, encoded, failed_records, errors = validate_and_encode_posts(posts)
+
+        # Send to Kinesis in batched PutRecords calls
+        send_result = send_posts_batch(valid_posts, encoded)
+        records_sent = send_result['successful_records']
+        failed_records += send_result['failed_records']
+        errors.extend(send_result['errors'])
+
+        # Ground truth for the posts that made it onto the stream
+        labels = label_posts(valid_posts)
+        label_result = emit_labels(labels)
+
         # Analyze distribution
-        distribution_analysis = analyze_distribution(posts)
+        distribution = DistributionAggregator().update(posts)
+        distribution_analysis = distribution.analysis()
+        cumulative_analysis = update_cumulative_distribution(distribution)
         
         # Calculate additional metrics
         avg_engagement = 0
@@ -1166,13 +2745,24 @@ def lambda_handler(event, context):
                     'batch_size': batch_size,
                     'successful_records': records_sent,
                     'failed_records': failed_records,
-                    'contains_deceptive': (batch_counter % 18 == 0)
+                    'contains_deceptive': deceptive_count > 0,
+                    'deceptive_posts': deceptive_count,
+                    'sequence_start': sequence_start,
+                    'deceptive_fraction': str(scheduler.fraction)
                 },
                 'stream_info': {
                     'stream_name': STREAM_NAME,
-                    'average_engagement': avg_engagement
+                    'average_engagement': avg_engagement,
+                    'put_records_calls': send_result['put_records_calls'],
+                    'throttled_records': send_result['throttled_records'],
+                    'shard_counts': send_result['shard_counts']
                 },
                 'distribution': distribution_analysis,
+                'cumulative_distribution': cumulative_analysis,
+                'labels': {
+                    'counts': LabelCounts().update(labels).to_dict()['windows'],
+                    'stream': label_result
+                },
                 'timing': {
                     'processed_at': datetime.now(pytz.UTC).isoformat(),
                     'next_batch_due': (
@@ -1198,29 +2788,364 @@ def lambda_handler(event, context):
             }, indent=2)
         }
 
-def local_test():
-    """Function for local testing"""
-    test_event = {
-        'batch_size': 15,
-        'batch_counter': 0
-    }
-    
-    # Test multiple batches
-    for i in range(20):  # Test 20 batches
-        test_event['batch_counter'] = i
+# Output sinks
+def post_arrow_schema():
+    """Arrow schema covering every post type"""
+    return pa.schema([
+        ("post_id", pa.string()),
+        ("timestamp", pa.string()),
+        ("username", pa.string()),
+        ("location", pa.string()),
+        ("language", pa.string()),
+        ("content", pa.string()),
+        ("hashtags", pa.list_(pa.string())),
+        ("mentions", pa.list_(pa.string())),
+        ("topic", pa.string()),
+        ("engagement", pa.struct([
+            ("likes", pa.int64()), ("retweets", pa.int64()), ("replies", pa.int64())
+        ])),
+        ("source", pa.string()),
+        ("user_age", pa.int64()),
+        ("user_gender", pa.string()),
+        ("post_type", pa.string()),
+        ("category", pa.string()),
+        ("brand", pa.string()),
+        ("platform", pa.string()),
+        ("comparison_type", pa.string()),
+        ("age_group", pa.string())
+    ])
+
+def columns_to_arrow(columns, engine=None):
+    """Build an Arrow table straight from columnar engine output"""
+    engine = engine or COLUMNAR_ENGINE
+    n = columns["size"]
+    entity = columns["entity"]
+    kind = columns["kind"]
+
+    def take(values, indices):
+        return pa.array(values, type=pa.string()).take(pa.array(indices))
+
+    unique_seconds, timestamp_index = np.unique(columns["timestamp"], return_inverse=True)
+    timestamps = [
+        datetime.fromtimestamp(int(s), pytz.UTC).strftime("%Y-%m-%d %H:%M:%S UTC")
+        for s in unique_seconds
+    ]
+    contents = [f"{text} {engine.entity_hashtag[e]}" for text, e in engine._content_entities()]
+
+    mention_mask = np.arange(2)[None, :] < columns["mention_count"][:, None]
+    mention_values = np.char.add("@user_", columns["mentions"][mention_mask].astype(str))
+    mention_offsets = np.concatenate([[0], np.cumsum(columns["mention_count"])]).astype(np.int32)
+
+    # Kind-specific fields come from per-entity tables, null where they don't apply
+    brands = [e_name if e_kind == "secondary" else None
+              for e_name, e_kind in zip(engine.entity_name, engine.entity_kind)]
+    platforms = [e_name if e_kind == "competitor" else None
+                 for e_name, e_kind in zip(engine.entity_name, engine.entity_kind)]
+    comparison_index = np.where(kind == 2, columns["variant"], 2)
+
+    id_prefix = columns["id_prefix"]
+    id_start = columns["id_start"]
+    arrays = [
+        pa.array([f"p{id_prefix}-{id_start + i}" for i in range(n)], type=pa.string()),
+        take(timestamps, timestamp_index),
+        pa.array(np.char.add("user_", columns["username"].astype(str)), type=pa.string()),
+        take(list(engine.locations), columns["location"]),
+        pa.array(["en"] * n, type=pa.string()),
+        take(contents, columns["content"]),
+        pa.ListArray.from_arrays(pa.array(np.arange(n + 1, dtype=np.int32)), take(engine.entity_hashtag, entity)),
+        pa.ListArray.from_arrays(pa.array(mention_offsets), pa.array(mention_values, type=pa.string())),
+        take(engine.entity_topic, entity),
+        pa.StructArray.from_arrays(
+            [pa.array(columns["likes"]), pa.array(columns["retweets"]), pa.array(columns["replies"])],
+            names=["likes", "retweets", "replies"]
+        ),
+        take(SOURCES, columns["source"]),
+        pa.array(columns["age"], type=pa.int64()),
+        take(GENDERS, columns["gender"]),
+        take(POST_KINDS, kind),
+        take(engine.entity_category, entity),
+        take(brands, entity),
+        take(platforms, entity),
+        take(KIND_VARIANTS["competitor"] + [None], comparison_index),
+        take(AGE_GROUPS, columns["age_group"])
+    ]
+    table = pa.Table.from_arrays(arrays, schema=post_arrow_schema())
+    deceptive = columns.get("deceptive")
+    if deceptive:
+        # Splice the deceptive posts in over the rows they replace
+        order = sorted(deceptive)
+        replacements = pa.Table.from_pylist([deceptive[offset] for offset in order], schema=table.schema)
+        pieces = []
+        previous = 0
+        for index, offset in enumerate(order):
+            pieces.append(table.slice(previous, offset - previous))
+            pieces.append(replacements.slice(index, 1))
+            previous = offset + 1
+        pieces.append(table.slice(previous))
+        table = pa.concat_tables(pieces)
+    return table
+
+class PostSink(ABC):
+    """Base class for post outputs; chunks may be JSONL text, columns or post dicts"""
+
+    def write_chunk(self, chunk):
+        if isinstance(chunk, str):
+            self.write_jsonl(chunk)
+        elif isinstance(chunk, dict):
+            self.write_columns(chunk)
+        else:
+            self.write_posts(chunk)
+
+    def write_jsonl(self, text):
+        self.write_posts([json.loads(line) for line in text.splitlines() if line])
+
+    def write_columns(self, columns):
+        self.write_posts(materialize_posts(columns))
+
+    @abstractmethod
+    def write_posts(self, posts):
+        """Write a list of post dicts"""
+
+    def close(self):
+        return {}
+
+class JsonlSink(PostSink):
+    """Newline-delimited JSON file, gzip-compressed when the path ends in .gz"""
+
+    def __init__(self, path, compresslevel=6):
+        self.path = path
+        if path.endswith('.gz'):
+            self.file = gzip.open(path, 'wb', compresslevel=compresslevel)
+        else:
+            self.file = open(path, 'wb')
+        self.encoder = PostEncoder()
+        self.rows = 0
+
+    def write_jsonl(self, text):
+        self.file.write(text.encode('utf-8'))
+        self.rows += text.count('\n')
+
+    def write_columns(self, columns):
+        self.write_jsonl(COLUMNAR_ENGINE.to_jsonl(columns))
+
+    def write_posts(self, posts):
+        self.file.write(self.encoder.encode_jsonl(posts))
+        self.rows += len(posts)
+
+    def close(self):
+        self.file.close()
+        return {'sink': 'jsonl', 'path': self.path, 'rows': self.rows}
+
+class ArrowTableSink(PostSink):
+    """Buffers Arrow tables and writes them out in large row groups"""
+
+    def __init__(self, path, row_group_size=1000000):
+        if pa is None:
+            raise ImportError("pyarrow is required for Parquet and Arrow sinks")
+        self.path = path
+        self.row_group_size = row_group_size
+        self.schema = post_arrow_schema()
+        self.pending = []
+        self.pending_rows = 0
+        self.rows = 0
+
+    def write_columns(self, columns):
+        self._append(columns_to_arrow(columns))
+
+    def write_posts(self, posts):
+        self._append(pa.Table.from_pylist(posts, schema=self.schema))
+
+    def _append(self, table):
+        self.pending.append(table)
+        self.pending_rows += table.num_rows
+        if self.pending_rows >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        table = pa.concat_tables(self.pending)
+        self._write_table(table)
+        self.rows += table.num_rows
+        self.pending = []
+        self.pending_rows = 0
+
+    def close(self):
+        self._flush()
+        self._close_writer()
+        return {'sink': self.sink_name, 'path': self.path, 'rows': self.rows}
+
+class ParquetSink(ArrowTableSink):
+    """Parquet file written in large, compressed row groups"""
+
+    sink_name = 'parquet'
+
+    def __init__(self, path, row_group_size=1000000, compression='zstd'):
+        super().__init__(path, row_group_size)
+        self.writer = pq.ParquetWriter(path, self.schema, compression=compression)
+
+    def _write_table(self, table):
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+
+    def _close_writer(self):
+        self.writer.close()
+
+class ArrowSink(ArrowTableSink):
+    """Arrow IPC file written as large record batches"""
+
+    sink_name = 'arrow'
+
+    def __init__(self, path, row_group_size=1000000, compression='zstd'):
+        super().__init__(path, row_group_size)
+        self.file = pa.OSFile(path, 'wb')
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        self.writer = pa.ipc.new_file(self.file, self.schema, options=options)
+
+    def _write_table(self, table):
+        self.writer.write_table(table, max_chunksize=self.row_group_size)
+
+    def _close_writer(self):
+        self.writer.close()
+        self.file.close()
+
+class KinesisSink(PostSink):
+    """Validates posts and sends them to the Kinesis stream in batches"""
+
+    def __init__(self):
+        self.summary = {'successful_records': 0, 'failed_records': 0, 'throttled_records': 0}
+
+    def write_posts(self, posts):
+        valid_posts, encoded, failed_records, _ = validate_and_encode_posts(posts)
+        result = send_posts_batch(valid_posts, encoded)
+        self.summary['successful_records'] += result['successful_records']
+        self.summary['failed_records'] += failed_records + result['failed_records']
+        self.summary['throttled_records'] += result['throttled_records']
+
+    def close(self):
+        return dict(self.summary, sink='kinesis', stream_name=STREAM_NAME)
+
+def create_sink(kind, path=None, row_group_size=1000000):
+    """Create a sink by name"""
+    if kind == 'kinesis':
+        return KinesisSink()
+    if not path:
+        raise ValueError(f"An output path is required for the {kind} sink")
+    if kind == 'jsonl':
+        return JsonlSink(path)
+    if kind == 'parquet':
+        return ParquetSink(path, row_group_size=row_group_size)
+    if kind == 'arrow':
+        return ArrowSink(path, row_group_size=row_group_size)
+    raise ValueError(f"Unknown sink: {kind}")
+
+def run_lambda_batches(batches):
+    """Invoke lambda_handler locally for a number of batches"""
+    for i in range(batches):
         print(f"\nProcessing batch {i+1}")
-        result = lambda_handler(test_event, None)
-        
+        result = lambda_handler({'batch_size': DEFAULT_BATCH_SIZE}, None)
+
         # Parse and print relevant information
         response_body = json.loads(result['body'])
         print(f"Status Code: {result['statusCode']}")
         print(f"Successful Records: {response_body.get('batch_details', {}).get('successful_records', 0)}")
         print(f"Contains Deceptive Post: {response_body.get('batch_details', {}).get('contains_deceptive', False)}")
-        
+
         if response_body.get('errors'):
             print("Errors:", response_body['errors'])
-        
-        time.sleep(1)  # Pause between batches
+
+def parse_args(argv=None):
+    """Command line options for local generation"""
+    parser = argparse.ArgumentParser(description="Generate synthetic social media posts")
+    parser.add_argument('--sink', choices=['lambda', 'kinesis', 'jsonl', 'parquet', 'arrow'], default='lambda',
+                        help="'lambda' runs lambda_handler batches like the scheduled function")
+    parser.add_argument('--output', help="Output file for jsonl/parquet/arrow sinks (.gz compresses JSONL)")
+    parser.add_argument('--count', type=int, default=100000, help="Number of posts to generate")
+    parser.add_argument('--batches', type=int, default=20, help="Number of batches for the lambda sink")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for reproducible output")
+    parser.add_argument('--start-time', default=None,
+                        help="Simulated ISO-8601 UTC time for the posts, e.g. 2025-08-01T00:00:00")
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--row-group-size', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, default=None, help="Generator processes (default: all cores)")
+    parser.add_argument('--no-columnar', action='store_true', help="Use the per-post dict generators")
+    parser.add_argument('--deceptive-fraction', default=None,
+                        help="Exact share of deceptive posts, e.g. 1/270 (default: none; the lambda sink "
+                             "uses DECEPTIVE_FRACTION or 1/270)")
+    parser.add_argument('--backfill-days', type=float, default=None,
+                        help="Generate this many days of history on a simulated clock instead of --count posts")
+    parser.add_argument('--end-time', default=None, help="Simulated ISO-8601 UTC end of the backfill (default: now)")
+    parser.add_argument('--posts-per-day', type=int, default=DEFAULT_POSTS_PER_DAY)
+    parser.add_argument('--bursts', default=None, help="Burst definitions as a JSON list or a path to a JSON file")
+    parser.add_argument('--labels', default=None, help="Also write ground-truth labels as JSON lines to this path")
+    parser.add_argument('--label-counts', default=None, help="Write per-window label counts as JSON to this path")
+    parser.add_argument('--label-window-minutes', type=int, default=1)
+    return parser.parse_args(argv)
+
+def parse_utc(value):
+    """Parse an ISO-8601 string as a UTC datetime"""
+    parsed = datetime.fromisoformat(value)
+    return parsed.replace(tzinfo=pytz.UTC) if parsed.tzinfo is None else parsed.astimezone(pytz.UTC)
+
+def run_backfill(args, sink, label_writer=None):
+    """Stream backfilled hours into a sink"""
+    bursts = None
+    if args.bursts:
+        if os.path.exists(args.bursts):
+            with open(args.bursts, encoding='utf-8') as f:
+                bursts = json.load(f)
+        else:
+            bursts = json.loads(args.bursts)
+    end_time = parse_utc(args.end_time) if args.end_time else None
+
+    total = 0
+    for hour_start, chunk in generate_backfill(args.backfill_days, end_time=end_time,
+                                               posts_per_day=args.posts_per_day, bursts=bursts, seed=args.seed,
+                                               workers=args.workers, columnar=not args.no_columnar,
+                                               deceptive_fraction=args.deceptive_fraction):
+        if label_writer:
+            label_writer.write_chunk(chunk)
+        sink.write_chunk(chunk)
+        total += chunk["size"] if isinstance(chunk, dict) else len(chunk)
+    return total
+
+def main(argv=None):
+    """Command line entry point"""
+    args = parse_args(argv)
+    if args.sink == 'lambda':
+        run_lambda_batches(args.batches)
+        return
+
+    start_time = parse_utc(args.start_time) if args.start_time else None
+    if args.seed is None:
+        args.seed = random.getrandbits(32)
+    # Kinesis and the Arrow sinks take raw chunks; JSONL is rendered in the workers
+    # unless the chunks also have to be labelled
+    as_jsonl = args.sink == 'jsonl' and not (args.labels or args.label_counts)
+
+    start = time.monotonic()
+    sink = create_sink(args.sink, args.output, args.row_group_size)
+    label_writer = None
+    if args.labels or args.label_counts:
+        label_writer = LabelWriter(args.labels, args.label_counts, args.label_window_minutes)
+    try:
+        if args.backfill_days:
+            count = run_backfill(args, sink, label_writer)
+        else:
+            count = args.count
+            for chunk in generate_parallel(args.count, args.seed, chunk_size=args.chunk_size,
+                                           workers=args.workers, start_time=start_time,
+                                           columnar=not args.no_columnar, as_jsonl=as_jsonl,
+                                           deceptive_fraction=args.deceptive_fraction):
+                if label_writer:
+                    label_writer.write_chunk(chunk)
+                sink.write_chunk(chunk)
+    finally:
+        summary = sink.close()
+        if label_writer:
+            summary['labels'] = label_writer.close()
+    elapsed = time.monotonic() - start
+    print(json.dumps(dict(summary, seed=args.seed, elapsed_seconds=round(elapsed, 2),
+                          posts_per_second=round(count / elapsed) if elapsed else None), indent=2))
 
 if __name__ == "__main__":
-    local_test()
+    main()
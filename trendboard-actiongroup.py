@@ -1,75 +1,1230 @@
+import time
+_MODULE_START = time.perf_counter()
+
 import json
 import boto3
-from datetime import datetime, timedelta
+import base64
+import calendar
+import gzip
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import traceback
 
-# Initialize Bedrock client
-bedrock_runtime = boto3.client('bedrock-agent-runtime', region_name='us-east-1')
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for conversation clustering
+    np = None
+
+# Milliseconds spent on imports and on each lazily initialized dependency, printed on cold start
+INIT_TIMINGS = {}
+INIT_TIMINGS_REPORTED = False
+
+def record_init(name, started):
+    """Record how long an initialization step took since started"""
+    INIT_TIMINGS[name] = round((time.perf_counter() - started) * 1000, 2)
+
+record_init('imports', _MODULE_START)
+
+def report_init_timings():
+    """Print the initialization profile once per container"""
+    global INIT_TIMINGS_REPORTED
+    if not INIT_TIMINGS_REPORTED:
+        INIT_TIMINGS_REPORTED = True
+        print(f"Cold start init timings (ms): {json.dumps(INIT_TIMINGS)}")
+
+# Bedrock client, created on first use; corpus-backed deployments never need it
+bedrock_runtime = None
+# Retrievals run on worker threads and the default boto3 session is not thread-safe
+bedrock_runtime_lock = threading.Lock()
 KNOWLEDGE_BASE_ID = '83OR6IMGRL'
 
+def get_bedrock_runtime():
+    global bedrock_runtime
+    if bedrock_runtime is None:
+        with bedrock_runtime_lock:
+            if bedrock_runtime is None:
+                started = time.perf_counter()
+                bedrock_runtime = boto3.client('bedrock-agent-runtime', region_name='us-east-1')
+                record_init('bedrock_agent_runtime_client', started)
+    return bedrock_runtime
+
+# Local JSONL corpus of post records; the knowledge base is queried when unset
+POSTS_CORPUS_PATH = os.environ.get('POSTS_CORPUS_PATH')
+# 'latest' anchors windows on the newest post instead of the wall clock (useful for replayed corpora)
+ANALYSIS_REFERENCE_TIME = os.environ.get('ANALYSIS_REFERENCE_TIME', 'now')
+BUCKET_RETENTION_MINUTES = int(os.environ.get('BUCKET_RETENTION_MINUTES', 24 * 60))
+KB_RESULTS_PER_QUERY = 100
+MAX_SEEN_POST_IDS = 200000
+# Snapshot file for the bucket store, restored on cold start
+BUCKET_SNAPSHOT_PATH = os.environ.get('BUCKET_SNAPSHOT_PATH')
+# Minimum seconds between snapshots; the source read positions are saved with them, so posts
+# ingested after the last snapshot are simply read again after a cold start
+BUCKET_SNAPSHOT_INTERVAL_SECONDS = float(os.environ.get('BUCKET_SNAPSHOT_INTERVAL_SECONDS', 60))
+# Fixed per-minute memory: sketch sizes and a cap on exact keys per slot
+SKETCH_CAPACITY = int(os.environ.get('SKETCH_CAPACITY', 64))
+COUNT_MIN_WIDTH = 128
+COUNT_MIN_DEPTH = 4
+MAX_KEYS_PER_SLOT = 500
+MAX_REFERENCE_IDS = 5
+MAX_RELATED_TOPICS = 5
+# Viral detection: EWMA baselines of engagement velocity and a bounded candidate heap
+VIRAL_EWMA_ALPHA = 0.05
+VIRAL_MIN_BASELINE = 20
+VIRAL_SCORE_MIDPOINT = 3.0
+VIRAL_CANDIDATE_SCORE = 0.5
+MAX_VIRAL_CANDIDATES = 200
+MAX_TRACKED_POSTS = 50000
+MAX_HASHTAG_BASELINES = 10000
+# Conversation clustering: feature-hashed post vectors and per-sentiment mini-batch k-means
+CLUSTER_EMBEDDING_DIM = 256
+MAX_CLUSTERS = int(os.environ.get('MAX_CLUSTERS', 8))
+CLUSTER_BATCH_SIZE = 64
+CLUSTER_SEED_SIMILARITY = 0.2
+MAX_CLUSTER_TERMS = 20
+MAX_CLUSTER_SAMPLES = 3
+# Operations of one agent turn share the loaded window, for at most this long
+WINDOW_REFRESH_SECONDS = int(os.environ.get('WINDOW_REFRESH_SECONDS', 60))
+# Operation results are cached until the end of the minute bucket they were computed in;
+# a size of 0 turns both cache tiers off
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 256))
+DEFAULT_RESULT_CACHE_DB_PATH = '/tmp/trendboard-result-cache.db'
+# Brand comparisons: brands per request and concurrent knowledge base retrievals
+MAX_COMPARED_BRANDS = 20
+RETRIEVAL_WORKERS = int(os.environ.get('RETRIEVAL_WORKERS', 4))
+
+SENTIMENTS = ("positive", "negative", "neutral")
+POSITIVE_WORDS = frozenset("""
+    affordable amazing awesome beats best better breathtaking brilliant civilized clean cleaner comfortable
+    cool epic excellent exceptional exciting fantastic favorite finally finest fire flawless game-changing
+    gorgeous great happy impressive improving incredible incredibly innovative intense intuitive legendary
+    love loved loving lovely magical masterpiece outstanding perfect perfectly professional promise
+    promising protects record records refreshing responsive revolutionary safer seamless sleek smooth solid
+    spot stable stunning stylish superb superior thriller thrilling top transparent unbeatable unmatched
+    win winning wonderful worth
+""".split())
+NEGATIVE_WORDS = frozenset("""
+    annoying awful bad broken buggy chaos controversial controversies controversy crashed crashes crashing
+    demanding disappoints disappointed disappointing disappointment expensive fail failed failing
+    frustrating hate horrible imbalance inconsistency inconsistent issues lacking lag laggy limited missing
+    needs overpriced poor problem problems ridiculous ruined ruining scam slow steep struggling terrible
+    too ugly unfair worse worst wish
+""".split())
+NEGATIONS = frozenset(("not", "no", "never", "don't", "doesn't", "isn't", "wasn't", "can't", "won't", "without"))
+WORD_PATTERN = re.compile(r"[a-z][a-z'-]*")
+KEYWORD_PATTERN = re.compile(r"(?<![#@\w./])[a-z][a-z'-]{3,}")
+STOPWORDS = frozenset("""
+    about after again also always been before being best better between both could does doing done down
+    each even ever every from getting going have having here into just keep know last like made make many
+    more most much must need never next only other over really same should since some still such than
+    that their them then there these they this those through today very want what when where which while
+    will with would your their's they're it's that's
+""".split())
+
+def extract_keywords(text):
+    """Distinct content words of a post, without hashtags, mentions, links or stopwords"""
+    keywords = set()
+    for word in KEYWORD_PATTERN.findall(text.lower()):
+        word = word.strip("'-")
+        if word.endswith("'s"):
+            word = word[:-2]
+        if len(word) >= 4 and word not in STOPWORDS:
+            keywords.add(word)
+    return keywords
+
+def classify_sentiment(text):
+    """Lexicon sentiment of a post, returning (label, score in [-1, 1])"""
+    score = 0
+    negate = False
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word in NEGATIONS:
+            negate = True
+            continue
+        polarity = (word in POSITIVE_WORDS) - (word in NEGATIVE_WORDS)
+        if polarity:
+            score += -polarity if negate else polarity
+        negate = False
+    if score > 0:
+        return "positive", min(1.0, score / 3)
+    if score < 0:
+        return "negative", max(-1.0, score / 3)
+    return "neutral", 0.0
+
+def parse_time_window(time_window):
+    """Window length in minutes from values like '2h', '90m' or '120 minutes'"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*", str(time_window or "2h"))
+    if not match:
+        raise ValueError(f"Invalid time window: {time_window}")
+    value, unit = float(match.group(1)), match.group(2).lower()
+    if unit in ("h", "hr", "hrs", "hour", "hours"):
+        value *= 60
+    elif unit in ("d", "day", "days"):
+        value *= 24 * 60
+    elif unit not in ("", "m", "min", "mins", "minute", "minutes"):
+        raise ValueError(f"Invalid time window unit: {time_window}")
+    return max(1, int(value))
+
+_minute_cache = {}
+
+def post_minute(timestamp):
+    """Epoch minute of a post timestamp such as '2025-08-01 10:15:00 UTC' or an ISO-8601 string"""
+    prefix = timestamp[:16]
+    minute = _minute_cache.get(prefix)
+    if minute is None:
+        parsed = datetime.strptime(prefix.replace('T', ' '), "%Y-%m-%d %H:%M")
+        minute = calendar.timegm(parsed.timetuple()) // 60
+        if len(_minute_cache) > 100000:
+            _minute_cache.clear()
+        _minute_cache[prefix] = minute
+    return minute
+
+def minute_to_iso(minute):
+    return datetime.fromtimestamp(minute * 60, timezone.utc).isoformat()
+
+SENTIMENT_INDEX = {sentiment: i for i, sentiment in enumerate(SENTIMENTS)}
+# Positive and negative swap, neutral stays
+OPPOSITE_SENTIMENT = (1, 0, 2)
+
+def post_brand_sentiments(post, sentiment):
+    """Lower-cased brands a post counts towards, its brand field and hashtags, with its sentiment index for each.
+
+    Competitor comparisons are about AnyCompany as well as the platform they
+    name. They are written from AnyCompany's side ("better privacy than
+    Instagram"), so the platform gets the opposite sentiment.
+    """
+    brands = {tag.lstrip('#').lower(): sentiment for tag in post.get("hashtags", []) if tag}
+    if post.get("brand"):
+        brands[post["brand"].lower()] = sentiment
+    if post.get("platform"):
+        platform = post["platform"].lower()
+        if platform in brands:
+            brands[platform] = OPPOSITE_SENTIMENT[sentiment]
+        brands["anycompany"] = sentiment
+    return brands
+
+def is_own_hashtag(hashtag, brand):
+    return hashtag.lstrip('#').lower() == brand.lower()
+
+def counts_dict(counts):
+    return dict(zip(SENTIMENTS, counts))
+
+# Heavy-hitter entries: [count, error, engagement score, positive, negative, neutral,
+# sentiment score sum, reference ids, related topic counts]
+HH_COUNT, HH_ERROR, HH_ENGAGEMENT, HH_SENTIMENT, HH_SCORE, HH_REFS, HH_RELATED = 0, 1, 2, 3, 6, 7, 8
+
+class CountMinSketch:
+    """Fixed-size frequency estimates that never undercount"""
+
+    def __init__(self, width=COUNT_MIN_WIDTH, depth=COUNT_MIN_DEPTH, table=None):
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else array('I', bytes(4 * width * depth))
+
+    def _indexes(self, key):
+        data = key.encode('utf-8')
+        return [row * self.width + zlib.crc32(data, row) % self.width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        for index in self._indexes(key):
+            self.table[index] += count
+
+    def estimate(self, key):
+        return min(self.table[index] for index in self._indexes(key))
+
+    def to_dict(self):
+        return {"width": self.width, "depth": self.depth, "table": base64.b64encode(self.table.tobytes()).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        table = array('I')
+        table.frombytes(base64.b64decode(data["table"]))
+        return cls(data["width"], data["depth"], table)
+
+class SpaceSaving:
+    """Space-Saving heavy hitters over at most capacity keys.
+
+    When full, a new key takes over the entry with the smallest count and
+    inherits that count as its error bound, so counts never undercount and
+    any key with more than total / capacity occurrences is always kept.
+    """
+
+    def __init__(self, capacity=SKETCH_CAPACITY, entries=None):
+        self.capacity = capacity
+        self.entries = entries if entries is not None else {}
+        # Lazy min-heap of (count, key); stale pairs are skipped when popped
+        self.heap = [(entry[HH_COUNT], key) for key, entry in self.entries.items()]
+        heapq.heapify(self.heap)
+
+    def _pop_min(self):
+        while True:
+            count, key = heapq.heappop(self.heap)
+            entry = self.entries.get(key)
+            if entry is not None and entry[HH_COUNT] == count:
+                return key
+
+    def add(self, key, sentiment, score, engagement, post_id, related=()):
+        entry = self.entries.get(key)
+        if entry is None:
+            if len(self.entries) < self.capacity:
+                entry = self.entries[key] = [0, 0, 0.0, 0, 0, 0, 0.0, [], {}]
+            else:
+                floor = self.entries.pop(self._pop_min())[HH_COUNT]
+                entry = self.entries[key] = [floor, floor, 0.0, 0, 0, 0, 0.0, [], {}]
+        entry[HH_COUNT] += 1
+        heapq.heappush(self.heap, (entry[HH_COUNT], key))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(e[HH_COUNT], k) for k, e in self.entries.items()]
+            heapq.heapify(self.heap)
+        entry[HH_ENGAGEMENT] += engagement
+        entry[HH_SENTIMENT + sentiment] += 1
+        entry[HH_SCORE] += score
+        refs = entry[HH_REFS]
+        if post_id is not None:
+            refs.append(post_id)
+            if len(refs) > MAX_REFERENCE_IDS:
+                del refs[0]
+        topics = entry[HH_RELATED]
+        for topic in related:
+            if topic in topics or len(topics) < MAX_RELATED_TOPICS:
+                topics[topic] = topics.get(topic, 0) + 1
+
+    def is_full(self):
+        return len(self.entries) >= self.capacity
+
+    def min_count(self):
+        return min((entry[HH_COUNT] for entry in self.entries.values()), default=0)
+
+    def to_dict(self):
+        return {"capacity": self.capacity, "entries": self.entries}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["capacity"], data["entries"])
+
+def merge_heavy_hitters(sketches, limit):
+    """Merge per-minute Space-Saving summaries and return the top entries by count.
+
+    A key missing from a full minute summary may still have occurred up to that
+    minute's smallest count; the Count-Min estimate tightens that bound for the
+    leading candidates, which is folded into their count and error.
+    """
+    # Rank keys on summed counts first, then merge full entries for the leaders only
+    counts = {}
+    for summary, _ in sketches:
+        for key, entry in summary.entries.items():
+            counts[key] = counts.get(key, 0) + entry[HH_COUNT]
+    leaders = heapq.nlargest(limit * 3, counts, key=counts.get)
+
+    candidates = []
+    for key in leaders:
+        total = [0, 0, 0.0, 0, 0, 0, 0.0, [], {}]
+        for summary, _ in sketches:
+            entry = summary.entries.get(key)
+            if entry is None:
+                continue
+            for field in range(HH_REFS):
+                total[field] += entry[field]
+            total[HH_REFS] = (total[HH_REFS] + entry[HH_REFS])[-MAX_REFERENCE_IDS:]
+            for topic, count in entry[HH_RELATED].items():
+                total[HH_RELATED][topic] = total[HH_RELATED].get(topic, 0) + count
+        candidates.append((key, total))
+
+    full = [(summary, sketch, summary.min_count()) for summary, sketch in sketches if summary.is_full()]
+    if full:
+        for key, total in candidates:
+            for summary, sketch, floor in full:
+                if key not in summary.entries:
+                    missed = min(sketch.estimate(key), floor)
+                    total[HH_COUNT] += missed
+                    total[HH_ERROR] += missed
+    candidates.sort(key=lambda item: item[1][HH_COUNT], reverse=True)
+    return candidates[:limit]
+
+def post_engagement(post):
+    engagement = post.get("engagement") or {}
+    return sum(value for value in engagement.values() if isinstance(value, (int, float)))
+
+def ewma_update(baseline, value, alpha=VIRAL_EWMA_ALPHA):
+    """Fold a value into an EWMA [mean, variance, observations] baseline.
+
+    Early on the weight falls back to a plain running mean, and once the
+    baseline is warm outliers are clipped so they can't drag it upwards.
+    """
+    mean, variance, observations = baseline
+    if observations >= VIRAL_MIN_BASELINE and variance > 0:
+        value = min(value, mean + 5 * math.sqrt(variance))
+    weight = max(alpha, 1 / (observations + 1))
+    diff = value - mean
+    increment = weight * diff
+    baseline[0] = mean + increment
+    baseline[1] = (1 - weight) * (variance + diff * increment)
+    baseline[2] = observations + 1
+
+def baseline_z_score(baseline, value):
+    """Standard score against a warm baseline, None while it is still warming up"""
+    mean, variance, observations = baseline
+    if observations < VIRAL_MIN_BASELINE:
+        return None
+    return (value - mean) / max(math.sqrt(variance), 0.1)
+
+class ViralDetector:
+    """Streaming engagement-velocity anomaly detector.
+
+    Each sighting of a post turns its engagement delta since the last sighting,
+    or since it was posted on the first one, into a velocity (engagement per
+    minute), scores its log against EWMA baselines for its hashtag and for the
+    whole stream, then folds it into them; engagement is heavy-tailed, so log
+    velocities keep ordinary popular posts well inside the baseline spread.
+    Posts scoring at least VIRAL_CANDIDATE_SCORE compete for a bounded min-heap
+    of candidates, so every update is O(1) apart from the O(log n) heap push.
+    """
+
+    def __init__(self):
+        self.stream_baseline = [0.0, 0.0, 0]
+        self.hashtag_baselines = {}
+        self.tracked = {}
+        self.candidates = {}
+        self.heap = []
+
+    def observe(self, post, minute, now_minute):
+        """Score one sighting of a post, seen at now_minute unless it carries its own observation time"""
+        post_id = post.get("post_id")
+        engagement = post.get("engagement") or {}
+        total = post_engagement(post)
+        observed_at = post.get("observed_at")
+        observed_minute = post_minute(observed_at) if observed_at else now_minute
+
+        previous = self.tracked.get(post_id) if post_id is not None else None
+        if previous is None:
+            # Engagement so far accrued over the post's whole age
+            age = max(1, observed_minute - minute)
+            delta, previous_velocity = total, None
+        else:
+            last_total, last_minute, previous_velocity = previous
+            age = max(1, observed_minute - last_minute)
+            delta = total - last_total
+            if delta <= 0:
+                return None
+        velocity = delta / age
+        log_velocity = math.log1p(velocity)
+
+        if post_id is not None:
+            if previous is None and len(self.tracked) >= MAX_TRACKED_POSTS:
+                del self.tracked[next(iter(self.tracked))]
+            self.tracked[post_id] = [total, observed_minute, velocity]
+
+        hashtags = [tag for tag in post.get("hashtags", []) if tag]
+        hashtag = hashtags[0] if hashtags else None
+        hashtag_baseline = self.hashtag_baselines.get(hashtag) if hashtag else None
+        scores = [baseline_z_score(self.stream_baseline, log_velocity)]
+        if hashtag_baseline is not None:
+            scores.append(baseline_z_score(hashtag_baseline, log_velocity))
+        scores = [score for score in scores if score is not None]
+        anomaly = max(scores) if scores else None
+
+        record = None
+        if anomaly is not None:
+            viral_score = 1 / (1 + math.exp(-(anomaly - VIRAL_SCORE_MIDPOINT)))
+            if viral_score >= VIRAL_CANDIDATE_SCORE and post_id is not None:
+                record = self._candidate(post, minute, engagement, total, velocity, previous_velocity,
+                                         hashtag, hashtag_baseline, anomaly, viral_score)
+                self._offer(record)
+
+        ewma_update(self.stream_baseline, log_velocity)
+        if hashtag:
+            if hashtag_baseline is None:
+                if len(self.hashtag_baselines) >= MAX_HASHTAG_BASELINES:
+                    del self.hashtag_baselines[next(iter(self.hashtag_baselines))]
+                hashtag_baseline = self.hashtag_baselines[hashtag] = [0.0, 0.0, 0]
+            ewma_update(hashtag_baseline, log_velocity)
+        return record
+
+    def _candidate(self, post, minute, engagement, total, velocity, previous_velocity,
+                   hashtag, hashtag_baseline, anomaly, viral_score):
+        # Baselines hold log velocities; compare against their geometric means
+        stream_mean = math.expm1(self.stream_baseline[0])
+        hashtag_warm = hashtag_baseline is not None and hashtag_baseline[2] >= VIRAL_MIN_BASELINE
+        hashtag_mean = math.expm1(hashtag_baseline[0]) if hashtag_warm else None
+        baseline_mean = hashtag_mean if hashtag_warm else stream_mean
+        if previous_velocity is not None:
+            growth = (velocity - previous_velocity) / max(previous_velocity, 1.0)
+        else:
+            growth = (velocity - baseline_mean) / max(baseline_mean, 1.0)
+
+        indicators = [f"Anomalous engagement velocity (z={anomaly:.1f})"]
+        if hashtag_warm and velocity >= 2 * hashtag_mean:
+            indicators.append(f"Velocity {velocity / max(hashtag_mean, 1.0):.1f}x the {hashtag} baseline")
+        elif not hashtag_warm:
+            indicators.append("No engagement history for this hashtag")
+        if velocity >= 2 * stream_mean:
+            indicators.append(f"Velocity {velocity / max(stream_mean, 1.0):.1f}x the stream baseline")
+        likes = engagement.get("likes") or 0
+        if likes and (engagement.get("retweets") or 0) / likes >= 0.45:
+            indicators.append("High share-to-like ratio")
+        if likes and (engagement.get("replies") or 0) / likes >= 0.2:
+            indicators.append("Reply surge")
+        if previous_velocity is not None and velocity >= 2 * previous_velocity:
+            indicators.append("Accelerating since the last observation")
+
+        content = post.get("content", "")
+        return {
+            "content_id": post["post_id"],
+            "text_preview": content[:100],
+            "viral_score": round(viral_score, 4),
+            "engagement_velocity": round(velocity, 2),
+            "growth_rate": round(growth, 4),
+            "anomaly_score": round(anomaly, 2),
+            "current_engagement": total,
+            "timestamp": post.get("timestamp"),
+            "confidence": "high" if anomaly >= 6 else "medium" if anomaly >= 4 else "low",
+            "viral_indicators": indicators,
+            "hashtags": post.get("hashtags", []),
+            "keywords": sorted(extract_keywords(content))[:5],
+            "minute": minute
+        }
+
+    def _offer(self, record):
+        """Keep the record if it ranks among the top MAX_VIRAL_CANDIDATES"""
+        post_id = record["content_id"]
+        score = record["viral_score"]
+        if post_id not in self.candidates and len(self.candidates) >= MAX_VIRAL_CANDIDATES:
+            # Drop stale heap entries left behind by updated or evicted candidates
+            while self.heap and self.candidates.get(self.heap[0][1], {}).get("viral_score") != self.heap[0][0]:
+                heapq.heappop(self.heap)
+            if score <= self.heap[0][0]:
+                return
+            del self.candidates[heapq.heappop(self.heap)[1]]
+        self.candidates[post_id] = record
+        heapq.heappush(self.heap, (score, post_id))
+        if len(self.heap) > 4 * MAX_VIRAL_CANDIDATES:
+            self.heap = [(c["viral_score"], pid) for pid, c in self.candidates.items()]
+            heapq.heapify(self.heap)
+
+    def top(self, end_minute, minutes, threshold, limit):
+        """Candidates posted inside the window with a viral score of at least threshold"""
+        start_minute = end_minute - minutes
+        matches = [
+            record for record in self.candidates.values()
+            if start_minute <= record["minute"] < end_minute and record["viral_score"] >= threshold
+        ]
+        matches.sort(key=lambda record: record["viral_score"], reverse=True)
+        return matches[:limit]
+
+    def to_dict(self):
+        return {
+            "stream_baseline": self.stream_baseline,
+            "hashtag_baselines": self.hashtag_baselines,
+            "tracked": self.tracked,
+            "candidates": list(self.candidates.values())
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        detector = cls()
+        detector.stream_baseline = data["stream_baseline"]
+        detector.hashtag_baselines = data["hashtag_baselines"]
+        detector.tracked = data["tracked"]
+        for record in data["candidates"]:
+            detector._offer(record)
+        return detector
+
+def post_terms(post, keywords):
+    """Tokens a post is embedded from: its keywords and lower-cased hashtags"""
+    terms = list(keywords)
+    terms.extend(tag.lower() for tag in post.get("hashtags", []) if tag)
+    return terms
+
+def embed_terms(term_lists, dim=CLUSTER_EMBEDDING_DIM):
+    """Unit-length feature-hashed bag-of-words vectors, one row per term list"""
+    rows, columns, signs = [], [], []
+    for row, terms in enumerate(term_lists):
+        for term in terms:
+            digest = zlib.crc32(term.encode('utf-8'))
+            rows.append(row)
+            columns.append(digest % dim)
+            signs.append(1.0 if digest & 0x80000000 else -1.0)
+    vectors = np.zeros((len(term_lists), dim), dtype=np.float32)
+    np.add.at(vectors, (rows, columns), signs)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+class ConversationClusterer:
+    """Streaming mini-batch k-means over post vectors, one model per sentiment.
+
+    Posts are embedded once, buffered and assigned in batches of
+    CLUSTER_BATCH_SIZE: a batch is scored against every centroid with one
+    matrix product and each centroid moves towards the mean of its new members
+    at rate (batch members / lifetime members), the mini-batch form of the
+    1/n per-post update. A model seeds a new centroid from any post less than
+    CLUSTER_SEED_SIMILARITY cosine-similar to all of them, up to MAX_CLUSTERS.
+    Cluster ids are unique across sentiments: sentiment index * MAX_CLUSTERS
+    + centroid index.
+    """
+
+    def __init__(self, max_clusters=MAX_CLUSTERS, dim=CLUSTER_EMBEDDING_DIM):
+        self.max_clusters = max_clusters
+        self.dim = dim
+        self.centroids = {sentiment: np.zeros((0, dim), dtype=np.float32) for sentiment in SENTIMENTS}
+        self.counts = {sentiment: np.zeros(0) for sentiment in SENTIMENTS}
+        self.pending = []
+
+    def add(self, sentiment, minute, terms, sample):
+        """Queue one post; returns the assignments of a batch once it is full"""
+        if terms:
+            self.pending.append((sentiment, minute, terms, sample))
+        if len(self.pending) >= CLUSTER_BATCH_SIZE:
+            return self.flush()
+        return []
+
+    def flush(self):
+        """Cluster the queued posts, returning (minute, cluster id, terms, sample) per post"""
+        assignments = []
+        for sentiment in SENTIMENTS:
+            batch = [item for item in self.pending if item[0] == sentiment]
+            if not batch:
+                continue
+            labels = self._partial_fit(sentiment, embed_terms([terms for _, _, terms, _ in batch], self.dim))
+            offset = SENTIMENT_INDEX[sentiment] * self.max_clusters
+            for (_, minute, terms, sample), label in zip(batch, labels.tolist()):
+                assignments.append((minute, offset + label, terms, sample))
+        self.pending = []
+        return assignments
+
+    def _partial_fit(self, sentiment, vectors):
+        centroids = self.centroids[sentiment]
+        counts = self.counts[sentiment]
+        if len(centroids) < self.max_clusters:
+            seeds = []
+            for vector in vectors:
+                if len(centroids) + len(seeds) >= self.max_clusters:
+                    break
+                known = np.vstack([centroids] + seeds) if seeds else centroids
+                if not len(known) or (known @ vector).max() < CLUSTER_SEED_SIMILARITY:
+                    seeds.append(vector[None, :])
+            if seeds:
+                centroids = np.vstack([centroids] + seeds)
+                counts = np.concatenate([counts, np.zeros(len(seeds))])
+
+        labels = (vectors @ centroids.T).argmax(axis=1)
+        batch_counts = np.bincount(labels, minlength=len(centroids))
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = counts + batch_counts
+        moved = batch_counts > 0
+        rates = (batch_counts[moved] / counts[moved])[:, None]
+        centroids[moved] += rates * (sums[moved] / batch_counts[moved][:, None] - centroids[moved])
+        centroids[moved] /= np.maximum(np.linalg.norm(centroids[moved], axis=1, keepdims=True), 1e-6)
+
+        self.centroids[sentiment] = centroids
+        self.counts[sentiment] = counts
+        return labels
+
+    def to_dict(self):
+        return {
+            "max_clusters": self.max_clusters,
+            "dim": self.dim,
+            "centroids": {sentiment: centroids.round(5).tolist() for sentiment, centroids in self.centroids.items()},
+            "counts": {sentiment: counts.tolist() for sentiment, counts in self.counts.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        clusterer = cls(data["max_clusters"], data["dim"])
+        for sentiment in SENTIMENTS:
+            centroids = np.array(data["centroids"][sentiment], dtype=np.float32)
+            clusterer.centroids[sentiment] = centroids.reshape(-1, clusterer.dim)
+            clusterer.counts[sentiment] = np.array(data["counts"][sentiment], dtype=float)
+        return clusterer
+
+def add_cluster_member(clusters, cluster_id, terms, sample):
+    """Fold one assigned post into a slot's per-cluster counters"""
+    entry = clusters.get(cluster_id)
+    if entry is None:
+        entry = clusters[cluster_id] = {"count": 0, "engagement": 0, "terms": {}, "samples": []}
+    entry["count"] += 1
+    entry["engagement"] += sample["engagement"]
+    for term in terms:
+        if term in entry["terms"] or len(entry["terms"]) < MAX_CLUSTER_TERMS:
+            entry["terms"][term] = entry["terms"].get(term, 0) + 1
+    samples = entry["samples"]
+    if len(samples) < MAX_CLUSTER_SAMPLES:
+        samples.append(sample)
+    else:
+        lowest = min(range(len(samples)), key=lambda i: samples[i]["engagement"])
+        if sample["engagement"] > samples[lowest]["engagement"]:
+            samples[lowest] = sample
+
+class MinuteBucketStore:
+    """Ring buffer of per-minute counters keyed by brand, hashtag and sentiment.
+
+    Minute m lives in slot m % capacity, so ingest is O(1), a window query
+    touches one slot per minute and buckets older than the capacity expire by
+    being overwritten. Each slot counts posts per sentiment under "brand" and
+    "brand_hashtag" (brand -> hashtag) as [positive, negative, neutral], and
+    keeps Space-Saving and Count-Min sketches of hashtags and keywords so its
+    memory stays fixed however many distinct hashtags show up. Posts clustered
+    by the conversation clusterer are counted per cluster id under "clusters"
+    in the slot of the minute they were posted.
+    """
+
+    def __init__(self, capacity=BUCKET_RETENTION_MINUTES):
+        self.capacity = capacity
+        self.slot_minutes = [None] * capacity
+        self.slots = [None] * capacity
+        self.latest_minute = None
+        # Buckets up to this minute have been cleared by expire()
+        self.expired_through = None
+        self.seen = {}
+        # Read positions of the post sources, saved with the buckets so restores don't double count
+        self.sources = {}
+        self.viral = ViralDetector()
+        self.clusterer = ConversationClusterer() if np is not None else None
+
+    @staticmethod
+    def _new_slot():
+        return {
+            "posts": 0,
+            "brand": {},
+            "brand_hashtag": {},
+            "hashtags": SpaceSaving(),
+            "hashtag_counts": CountMinSketch(),
+            "keywords": SpaceSaving(),
+            "keyword_counts": CountMinSketch(),
+            "clusters": {}
+        }
+
+    def _slot(self, minute):
+        index = minute % self.capacity
+        if self.slot_minutes[index] != minute:
+            self.slot_minutes[index] = minute
+            self.slots[index] = self._new_slot()
+        return self.slots[index]
+
+    def _mark_seen(self, post_id):
+        if post_id in self.seen:
+            return False
+        if len(self.seen) >= MAX_SEEN_POST_IDS:
+            # Drop the oldest half; dicts keep insertion order
+            for old_id in list(self.seen)[:MAX_SEEN_POST_IDS // 2]:
+                del self.seen[old_id]
+        self.seen[post_id] = True
+        return True
+
+    def add(self, post):
+        """Count one post, skipping duplicates and posts older than the buffer"""
+        minute = post_minute(post["timestamp"])
+        if self.latest_minute is not None and minute <= self.latest_minute - self.capacity:
+            return False
+        if self.expired_through is not None and minute <= self.expired_through:
+            return False
+        # Every sighting counts for viral detection, even of posts already bucketed; sightings are
+        # timed by the same clock as the analysis window, the newest post when replaying a corpus
+        if ANALYSIS_REFERENCE_TIME == 'latest':
+            now_minute = minute if self.latest_minute is None else max(self.latest_minute, minute)
+        else:
+            now_minute = int(datetime.now(timezone.utc).timestamp()) // 60
+        self.viral.observe(post, minute, now_minute)
+        post_id = post.get("post_id")
+        if post_id is not None and not self._mark_seen(post_id):
+            return False
+
+        content = post.get("content", "")
+        label, score = classify_sentiment(content)
+        sentiment = SENTIMENT_INDEX[label]
+        hashtags = [tag for tag in post.get("hashtags", []) if tag]
+        weight = math.log1p(post_engagement(post))
+        slot = self._slot(minute)
+        slot["posts"] += 1
+
+        topic = post.get("topic")
+        for hashtag in hashtags:
+            related = [tag for tag in hashtags if tag != hashtag]
+            if topic and topic != hashtag.lstrip('#'):
+                related.append(topic)
+            slot["hashtags"].add(hashtag, sentiment, score, weight, post_id, related)
+            slot["hashtag_counts"].add(hashtag)
+        keywords = extract_keywords(content)
+        for keyword in keywords:
+            slot["keywords"].add(keyword, sentiment, score, weight, post_id, hashtags)
+            slot["keyword_counts"].add(keyword)
+        if self.clusterer is not None:
+            sample = {
+                "text_preview": content[:100],
+                "engagement": post_engagement(post),
+                "timestamp": post["timestamp"],
+                "sentiment_score": round(score, 3),
+                "hashtags": hashtags
+            }
+            self._record_clusters(self.clusterer.add(label, minute, post_terms(post, keywords), sample))
+
+        explicit = {post["brand"].lower()} if post.get("brand") else set()
+        for brand, brand_sentiment in post_brand_sentiments(post, sentiment).items():
+            counts = slot["brand"].get(brand)
+            if counts is None:
+                # Hashtag-derived brands stop being tracked once a slot is full
+                if len(slot["brand"]) >= MAX_KEYS_PER_SLOT and brand not in explicit:
+                    continue
+                counts = slot["brand"][brand] = [0, 0, 0]
+            counts[brand_sentiment] += 1
+            topics = slot["brand_hashtag"].setdefault(brand, {})
+            for hashtag in hashtags:
+                counts = topics.get(hashtag)
+                if counts is None:
+                    if len(topics) >= MAX_KEYS_PER_SLOT:
+                        continue
+                    counts = topics[hashtag] = [0, 0, 0]
+                counts[brand_sentiment] += 1
+
+        if self.latest_minute is None or minute > self.latest_minute:
+            self.latest_minute = minute
+        return True
+
+    def _record_clusters(self, assignments):
+        for minute, cluster_id, terms, sample in assignments:
+            index = minute % self.capacity
+            # The post's bucket may have expired while it waited for its batch
+            if self.slot_minutes[index] == minute:
+                add_cluster_member(self.slots[index]["clusters"], str(cluster_id), terms, sample)
+
+    def flush_clusters(self):
+        """Cluster any posts still waiting for a full batch"""
+        if self.clusterer is not None and self.clusterer.pending:
+            self._record_clusters(self.clusterer.flush())
+
+    def expire(self, now_minute):
+        """Clear buckets that fell out of the buffer as of now_minute"""
+        cutoff = now_minute - self.capacity
+        if self.expired_through is not None and cutoff <= self.expired_through:
+            return
+        if self.expired_through is None or cutoff - self.expired_through >= self.capacity:
+            minutes = self.slot_minutes
+        else:
+            # Only the minutes that fell out since the last call can hold expired buckets
+            minutes = range(self.expired_through + 1, cutoff + 1)
+        for minute in minutes:
+            if minute is None:
+                continue
+            index = minute % self.capacity
+            if self.slot_minutes[index] is not None and self.slot_minutes[index] <= cutoff:
+                self.slot_minutes[index] = None
+                self.slots[index] = None
+        self.expired_through = cutoff
+
+    def iter_window(self, end_minute, minutes):
+        """(minute, slot) for each live bucket in [end_minute - minutes, end_minute)"""
+        start = max(end_minute - minutes, end_minute - self.capacity)
+        for minute in range(start, end_minute):
+            index = minute % self.capacity
+            if self.slot_minutes[index] == minute:
+                yield minute, self.slots[index]
+
+    def window(self, dimension, key, end_minute, minutes):
+        """Sentiment totals and per-minute counts for one brand or hashtag"""
+        totals = [0, 0, 0]
+        per_minute = []
+        for minute, slot in self.iter_window(end_minute, minutes):
+            counts = slot[dimension].get(key)
+            if counts is None:
+                continue
+            totals[0] += counts[0]
+            totals[1] += counts[1]
+            totals[2] += counts[2]
+            per_minute.append((minute, counts))
+        return {"counts": counts_dict(totals), "per_minute": per_minute}
+
+    def totals(self, dimension, end_minute, minutes, brand=None):
+        """Sentiment totals for every key of a dimension, or every hashtag of one brand"""
+        totals = {}
+        for _, slot in self.iter_window(end_minute, minutes):
+            counters = slot["brand_hashtag"].get(brand, {}) if brand is not None else slot[dimension]
+            for key, counts in counters.items():
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = list(counts)
+                else:
+                    total[0] += counts[0]
+                    total[1] += counts[1]
+                    total[2] += counts[2]
+        return totals
+
+    def compare(self, brands, end_minute, minutes):
+        """Sentiment totals of several brands for a window and the one before it, in one pass"""
+        results = {brand: {"current": [0, 0, 0], "previous": [0, 0, 0], "topics": {}} for brand in brands}
+        start_minute = end_minute - minutes
+        for minute, slot in self.iter_window(end_minute, 2 * minutes):
+            period = "current" if minute >= start_minute else "previous"
+            for brand, result in results.items():
+                counts = slot["brand"].get(brand)
+                if counts is None:
+                    continue
+                totals = result[period]
+                totals[0] += counts[0]
+                totals[1] += counts[1]
+                totals[2] += counts[2]
+                if period == "current":
+                    topics = result["topics"]
+                    for hashtag, topic_counts in slot["brand_hashtag"].get(brand, {}).items():
+                        topics[hashtag] = topics.get(hashtag, 0) + sum(topic_counts)
+        return results
+
+    def post_count(self, end_minute, minutes):
+        return sum(slot["posts"] for _, slot in self.iter_window(end_minute, minutes))
+
+    def top(self, name, end_minute, minutes, limit):
+        """Top hashtags or keywords in a window as (key, merged heavy-hitter entry)"""
+        sketches = [(slot[name], slot[f"{name[:-1]}_counts"]) for _, slot in self.iter_window(end_minute, minutes)]
+        return merge_heavy_hitters(sketches, limit)
+
+    def estimate(self, name, key, end_minute, minutes):
+        """Upper-bound count of one hashtag or keyword in a window"""
+        total = 0
+        for _, slot in self.iter_window(end_minute, minutes):
+            entry = slot[name].entries.get(key)
+            if entry is not None:
+                total += entry[HH_COUNT]
+            elif slot[name].is_full():
+                total += min(slot[f"{name[:-1]}_counts"].estimate(key), slot[name].min_count())
+        return total
+
+    def clusters(self, end_minute, minutes):
+        """Per-cluster counts, engagement, terms and top samples over a window"""
+        merged = {}
+        for _, slot in self.iter_window(end_minute, minutes):
+            for cluster_id, entry in slot.get("clusters", {}).items():
+                total = merged.get(cluster_id)
+                if total is None:
+                    total = merged[cluster_id] = {"count": 0, "engagement": 0, "terms": {}, "samples": []}
+                total["count"] += entry["count"]
+                total["engagement"] += entry["engagement"]
+                for term, count in entry["terms"].items():
+                    total["terms"][term] = total["terms"].get(term, 0) + count
+                total["samples"].extend(entry["samples"])
+        for total in merged.values():
+            total["samples"] = heapq.nlargest(MAX_CLUSTER_SAMPLES, total["samples"], key=lambda sample: sample["engagement"])
+        return merged
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "latest_minute": self.latest_minute,
+            "slots": {
+                str(minute): {
+                    name: value.to_dict() if hasattr(value, 'to_dict') else value
+                    for name, value in slot.items()
+                }
+                for minute, slot in zip(self.slot_minutes, self.slots) if minute is not None
+            },
+            "seen": list(self.seen),
+            "sources": self.sources,
+            "viral": self.viral.to_dict(),
+            "clusterer": self.clusterer.to_dict() if self.clusterer is not None else None
+        }
+
+    @classmethod
+    def from_dict(cls, data, capacity=None):
+        store = cls(capacity or data["capacity"])
+        for minute, slot in data["slots"].items():
+            minute = int(minute)
+            index = minute % store.capacity
+            if store.slot_minutes[index] is None or store.slot_minutes[index] < minute:
+                for name in ("hashtags", "keywords"):
+                    slot[name] = SpaceSaving.from_dict(slot[name])
+                for name in ("hashtag_counts", "keyword_counts"):
+                    slot[name] = CountMinSketch.from_dict(slot[name])
+                slot.setdefault("clusters", {})
+                store.slot_minutes[index] = minute
+                store.slots[index] = slot
+        store.latest_minute = data.get("latest_minute")
+        store.seen = dict.fromkeys(data.get("seen", []), True)
+        store.sources = data.get("sources", {})
+        if data.get("viral"):
+            store.viral = ViralDetector.from_dict(data["viral"])
+        if data.get("clusterer") and np is not None:
+            store.clusterer = ConversationClusterer.from_dict(data["clusterer"])
+        return store
+
+    def save(self, path):
+        """Write a snapshot atomically"""
+        self.flush_clusters()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, capacity=None):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f), capacity)
+
+def restore_bucket_store():
+    """Restore the store from BUCKET_SNAPSHOT_PATH if a snapshot exists"""
+    if BUCKET_SNAPSHOT_PATH and os.path.exists(BUCKET_SNAPSHOT_PATH):
+        try:
+            return MinuteBucketStore.load(BUCKET_SNAPSHOT_PATH, BUCKET_RETENTION_MINUTES)
+        except Exception as e:
+            print(f"Could not restore bucket snapshot: {str(e)}")
+    return MinuteBucketStore()
+
+# Built once per container and topped up on each invocation
+_restore_started = time.perf_counter()
+BUCKET_STORE = restore_bucket_store()
+record_init('bucket_store_restore', _restore_started)
+LAST_SNAPSHOT = time.monotonic()
+
+def read_corpus_posts(path):
+    """Posts appended to the corpus since the last read; gzip corpora are re-read when they change"""
+    global BUCKET_STORE
+    mtime = os.path.getmtime(path)
+    state = BUCKET_STORE.sources.get("corpus")
+    if state is None or state["path"] != path:
+        state = BUCKET_STORE.sources["corpus"] = {"path": path, "offset": 0, "mtime": None}
+
+    if path.endswith('.gz'):
+        if mtime == state["mtime"]:
+            return []
+        BUCKET_STORE = MinuteBucketStore()
+        BUCKET_STORE.sources["corpus"] = {"path": path, "offset": 0, "mtime": mtime}
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    state["mtime"] = mtime
+    with open(path, 'rb') as f:
+        f.seek(state["offset"])
+        data = f.read()
+    # Leave a partially written last line for the next read
+    end = data.rfind(b'\n') + 1
+    state["offset"] += end
+    return [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+
+def parse_retrieved_posts(response):
+    """Post records in knowledge base retrieval results, one JSON object per line"""
+    posts = []
+    for result in response.get('retrievalResults', []):
+        text = result.get('content', {}).get('text', '')
+        for line in text.splitlines():
+            line = line.strip()
+            if not line.startswith('{'):
+                continue
+            try:
+                post = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(post, dict) and post.get("timestamp") and "content" in post:
+                posts.append(post)
+    return posts
+
+def retrieve_posts(query):
+    """Fetch recent posts matching a query from the knowledge base"""
+    response = get_bedrock_runtime().retrieve(
+        knowledgeBaseId=KNOWLEDGE_BASE_ID,
+        retrievalQuery={
+            'text': query
+        },
+        retrievalConfiguration={
+            'vectorSearchConfiguration': {
+                'numberOfResults': KB_RESULTS_PER_QUERY
+            }
+        }
+    )
+    return parse_retrieved_posts(response)
+
+def refresh_bucket_store(query):
+    """Fold any new posts into the minute buckets and snapshot them"""
+    return ingest_posts(read_corpus_posts(POSTS_CORPUS_PATH) if POSTS_CORPUS_PATH else retrieve_posts(query))
+
+def save_bucket_snapshot():
+    """Snapshot the store at most every BUCKET_SNAPSHOT_INTERVAL_SECONDS"""
+    global LAST_SNAPSHOT
+    if not BUCKET_SNAPSHOT_PATH:
+        return False
+    if time.monotonic() - LAST_SNAPSHOT < BUCKET_SNAPSHOT_INTERVAL_SECONDS:
+        return False
+    BUCKET_STORE.save(BUCKET_SNAPSHOT_PATH)
+    LAST_SNAPSHOT = time.monotonic()
+    return True
+
+def ingest_posts(posts):
+    """Add posts to the minute buckets, snapshotting them if any were new and the last snapshot is due"""
+    added = 0
+    for post in posts:
+        try:
+            added += BUCKET_STORE.add(post)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Skipping malformed post {post.get('post_id', 'unknown')}: {str(e)}")
+    if added:
+        save_bucket_snapshot()
+    return added
+
+def reference_minute():
+    """Exclusive end minute of the analysis window"""
+    if ANALYSIS_REFERENCE_TIME == 'latest' and BUCKET_STORE.latest_minute is not None:
+        return BUCKET_STORE.latest_minute + 1
+    now_minute = int(datetime.now(timezone.utc).timestamp()) // 60
+    BUCKET_STORE.expire(now_minute)
+    return now_minute + 1
+
+class SharedWindow:
+    """The bucket store as loaded for one agent turn.
+
+    A turn often calls several operations back to back, each in its own
+    invocation; they share the corpus read and knowledge base retrievals of
+    the first one, retrieving only queries not run yet, and analyse windows
+    ending at the same minute. A turn is identified by the session id and
+    input text of the agent event, and its window is dropped after
+    WINDOW_REFRESH_SECONDS even if the same question comes again.
+    """
+
+    def __init__(self, turn=None):
+        self.turn = turn
+        self.loaded_at = time.monotonic()
+        self.loaded = set()
+        self.end_minute = None
+
+    def is_fresh(self):
+        return time.monotonic() - self.loaded_at < WINDOW_REFRESH_SECONDS
+
+    def load(self, query):
+        """Fold in posts for a query unless this window already has"""
+        source = "corpus" if POSTS_CORPUS_PATH else query
+        if source not in self.loaded:
+            refresh_bucket_store(query)
+            self.loaded.add(source)
+            self.end_minute = None
+        if self.end_minute is None:
+            self.end_minute = reference_minute()
+        return self
+
+    def load_all(self, queries):
+        """Load several queries, running the knowledge base retrievals concurrently"""
+        pending = [query for query in dict.fromkeys(queries) if query not in self.loaded]
+        if POSTS_CORPUS_PATH or len(pending) < 2:
+            for query in queries:
+                self.load(query)
+            return self
+        # Create the client before the workers share it
+        get_bedrock_runtime()
+        with ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS) as executor:
+            results = list(executor.map(retrieve_posts, pending))
+        # The store is not thread-safe, so posts are added once every retrieval is back
+        ingest_posts([post for posts in results for post in posts])
+        self.loaded.update(pending)
+        self.end_minute = reference_minute()
+        return self
+
+SHARED_WINDOW = None
+
+def start_turn(event):
+    """Start a new shared window unless the event continues the agent turn of the current one"""
+    global SHARED_WINDOW
+    turn = (event.get('sessionId'), event.get('inputText'))
+    if (turn[0] is None or SHARED_WINDOW is None or SHARED_WINDOW.turn != turn
+            or not SHARED_WINDOW.is_fresh()):
+        SHARED_WINDOW = SharedWindow(turn)
+
+def shared_window(query, *queries):
+    """The shared window of the current turn, loaded for every query"""
+    global SHARED_WINDOW
+    if SHARED_WINDOW is None or not SHARED_WINDOW.is_fresh():
+        SHARED_WINDOW = SharedWindow()
+    if queries:
+        return SHARED_WINDOW.load_all((query,) + queries)
+    return SHARED_WINDOW.load(query)
+
+def percentage(count, total):
+    return round(count * 100 / total, 1) if total else 0.0
+
+def sentiment_trend(change):
+    if change > 1:
+        return "increasing"
+    if change < -1:
+        return "decreasing"
+    return "stable"
+
+def find_significant_events(brand, per_minute, total, max_events=3):
+    """Minutes whose mention volume spikes well above the window average"""
+    if len(per_minute) < 2 or not total:
+        return []
+    volumes = [sum(counts) for _, counts in per_minute]
+    mean = sum(volumes) / len(volumes)
+    std = math.sqrt(sum((v - mean) ** 2 for v in volumes) / len(volumes))
+    window_positive = sum(counts[0] for _, counts in per_minute) * 100 / total
+    spikes = [
+        (volume, minute, counts) for volume, (minute, counts) in zip(volumes, per_minute)
+        if volume >= 5 and volume > mean + 2 * std
+    ]
+    spikes.sort(key=lambda spike: spike[0], reverse=True)
+    return [
+        {
+            "event": f"Spike in {brand} mentions ({volume} posts in one minute)",
+            "timestamp": minute_to_iso(minute),
+            "sentimentImpact": round(counts[0] * 100 / volume - window_positive, 1)
+        }
+        for volume, minute, counts in spikes[:max_events]
+    ]
+
+def data_quality(sample_size):
+    """Reliability and confidence from the sample size (95% margin of error at p = 0.5)"""
+    if not sample_size:
+        return {"reliability": "Low", "sampleSize": 0, "confidence": 0.0}
+    margin = 1.96 * math.sqrt(0.25 / sample_size) * 100
+    reliability = "High" if sample_size >= 400 else "Medium" if sample_size >= 100 else "Low"
+    return {"reliability": reliability, "sampleSize": sample_size, "confidence": round(max(0.0, 100 - margin), 1)}
+
 def analyze_brand_sentiment(brand, time_window):
     """
-    Analyze brand sentiment using knowledge base
+    Analyze brand sentiment from per-minute brand/sentiment buckets
     """
     try:
-        response = bedrock_runtime.retrieve(
-            knowledgeBaseId=KNOWLEDGE_BASE_ID,
-            retrievalQuery={
-                'text': f'Get sentiment analysis data for {brand} in the last {time_window}'
-            },
-            retrievalConfiguration={
-                'vectorSearchConfiguration': {
-                    'numberOfResults': 5
-                }
+        window = shared_window(f'Get sentiment analysis data for {brand} in the last {time_window}')
+        minutes = parse_time_window(time_window)
+        end_minute = window.end_minute
+        brand_key = brand.lower()
+        current = BUCKET_STORE.window("brand", brand_key, end_minute, minutes)
+        previous = BUCKET_STORE.window("brand", brand_key, end_minute - minutes, minutes)
+        topics = BUCKET_STORE.totals("brand_hashtag", end_minute, minutes, brand=brand_key)
+
+        total = sum(current["counts"].values())
+        previous_total = sum(previous["counts"].values())
+        distribution = {}
+        for sentiment in SENTIMENTS:
+            share = percentage(current["counts"][sentiment], total)
+            change = round(share - percentage(previous["counts"][sentiment], previous_total), 1) if previous_total else 0.0
+            distribution[sentiment] = {
+                "percentage": share,
+                "count": current["counts"][sentiment],
+                "trend": sentiment_trend(change),
+                "changeFromPrevious": change
             }
-        )
-        
-        current_time = datetime.now()
-        
+
+        top_topics = sorted(
+            ((hashtag, counts) for hashtag, counts in topics.items() if not is_own_hashtag(hashtag, brand)),
+            key=lambda item: sum(item[1]), reverse=True
+        )[:5]
+
         return {
             "brand": brand,
             "timeWindow": time_window,
-            "totalPosts": 1250,
-            "sentimentDistribution": {
-                "positive": {
-                    "percentage": 65.5,
-                    "count": 819,
-                    "trend": "increasing",
-                    "changeFromPrevious": 8.3
-                },
-                "negative": {
-                    "percentage": 15.5,
-                    "count": 194,
-                    "trend": "stable",
-                    "changeFromPrevious": -0.2
-                },
-                "neutral": {
-                    "percentage": 19.0,
-                    "count": 237,
-                    "trend": "decreasing",
-                    "changeFromPrevious": -8.1
-                }
-            },
-            "significantEvents": [
-                {
-                    "event": f"New {brand} product launch",
-                    "timestamp": current_time.isoformat(),
-                    "sentimentImpact": 12.5
-                }
-            ],
+            "totalPosts": total,
+            "sentimentDistribution": distribution,
+            "significantEvents": find_significant_events(brand, current["per_minute"], total),
             "topTopics": [
                 {
-                    "topic": f"#{brand}Launch",
-                    "count": 450,
-                    "sentiment": "positive"
+                    "topic": hashtag,
+                    "count": sum(counts),
+                    "sentiment": SENTIMENTS[counts.index(max(counts))]
                 }
+                for hashtag, counts in top_topics
             ],
-            "dataQuality": {
-                "reliability": "High",
-                "sampleSize": 1250,
-                "confidence": 95.5
-            },
-            "analysisTimestamp": current_time.isoformat()
+            "dataQuality": data_quality(total),
+            "analysisTimestamp": datetime.now(timezone.utc).isoformat()
         }
     except Exception as e:
         print(f"Error in sentiment analysis: {str(e)}")
@@ -80,17 +1235,7 @@ def detect_fake_news(brand, time_window):
     Detect fake news using knowledge base
     """
     try:
-        response = bedrock_runtime.retrieve(
-            knowledgeBaseId=KNOWLEDGE_BASE_ID,
-            retrievalQuery={
-                'text': f'Check for fake news about {brand} in the last {time_window}'
-            },
-            retrievalConfiguration={
-                'vectorSearchConfiguration': {
-                    'numberOfResults': 5
-                }
-            }
-        )
+        shared_window(f'Check for fake news about {brand} in the last {time_window}')
         
         current_time = datetime.now()
         
@@ -123,36 +1268,463 @@ def detect_fake_news(brand, time_window):
         print(f"Error in fake news detection: {str(e)}")
         raise
 
+def compare_brand_sentiment(brands, time_window="2h"):
+    """
+    Side-by-side sentiment of several brands from one pass over the minute buckets
+    """
+    try:
+        window = shared_window(*[f'Get sentiment analysis data for {brand} in the last {time_window}' for brand in brands])
+        minutes = parse_time_window(time_window)
+        results = BUCKET_STORE.compare([brand.lower() for brand in brands], window.end_minute, minutes)
+        # A post can count towards several brands, so shares are of the distinct posts in the window
+        total_posts = BUCKET_STORE.post_count(window.end_minute, minutes)
+
+        comparison = []
+        for brand in brands:
+            result = results[brand.lower()]
+            total = sum(result["current"])
+            previous_total = sum(result["previous"])
+            shares = [percentage(count, total) for count in result["current"]]
+            net = round(shares[0] - shares[1], 1)
+            previous_shares = [percentage(count, previous_total) for count in result["previous"]]
+            change = round(net - (previous_shares[0] - previous_shares[1]), 1) if previous_total else 0.0
+            topics = [(hashtag, count) for hashtag, count in result["topics"].items()
+                      if not is_own_hashtag(hashtag, brand)]
+            top_topic = max(topics, key=lambda item: item[1])[0] if topics else None
+            comparison.append({
+                "brand": brand,
+                "totalPosts": total,
+                "shareOfVoice": percentage(total, total_posts),
+                "positivePercentage": shares[0],
+                "negativePercentage": shares[1],
+                "neutralPercentage": shares[2],
+                "netSentiment": net,
+                "netSentimentChange": change,
+                "trend": sentiment_trend(change),
+                "topTopic": top_topic,
+                "reliability": data_quality(total)["reliability"]
+            })
+        comparison.sort(key=lambda row: (row["totalPosts"] > 0, row["netSentiment"]), reverse=True)
+
+        return {
+            "brands": brands,
+            "timeWindow": time_window,
+            "totalPosts": total_posts,
+            "comparison": comparison,
+            "leader": comparison[0]["brand"] if comparison and comparison[0]["totalPosts"] else None,
+            "analysisTimestamp": datetime.now(timezone.utc).isoformat()
+        }
+    except Exception as e:
+        print(f"Error in brand comparison: {str(e)}")
+        raise
+
+def growth_rate(current, previous):
+    """Relative change against the previous window; new items count as 100% growth"""
+    if previous <= 0:
+        return 1.0 if current > 0 else 0.0
+    return round((current - previous) / previous, 4)
+
+def related_topics(entry):
+    return [topic for topic, _ in sorted(entry[HH_RELATED].items(), key=lambda item: item[1], reverse=True)]
+
+def extract_top_hashtags_keywords(time_window="120 minutes", limit=10):
+    """
+    Top hashtags and keywords for a window from the per-minute heavy-hitter sketches
+    """
+    try:
+        window = shared_window(f'Get trending hashtags and keywords from the last {time_window}')
+        minutes = parse_time_window(time_window)
+        limit = max(1, int(limit))
+        end_minute = window.end_minute
+        total_posts = BUCKET_STORE.post_count(end_minute, minutes)
+
+        top_hashtags = []
+        for hashtag, entry in BUCKET_STORE.top("hashtags", end_minute, minutes, limit):
+            previous = BUCKET_STORE.estimate("hashtags", hashtag, end_minute - minutes, minutes)
+            top_hashtags.append({
+                "hashtag": hashtag,
+                "count": entry[HH_COUNT],
+                "engagement_weighted_score": round(entry[HH_ENGAGEMENT], 2),
+                "growth_rate": growth_rate(entry[HH_COUNT], previous),
+                "related_topics": related_topics(entry),
+                "reference_ids": entry[HH_REFS]
+            })
+
+        top_keywords = []
+        for keyword, entry in BUCKET_STORE.top("keywords", end_minute, minutes, limit):
+            observed = entry[HH_COUNT] - entry[HH_ERROR]
+            frequency = entry[HH_COUNT]
+            top_keywords.append({
+                "keyword": keyword,
+                "frequency": frequency,
+                "relevance_score": round(frequency / total_posts * math.log1p(total_posts / frequency), 4)
+                if total_posts else 0.0,
+                "context_topics": related_topics(entry),
+                "sentiment_score": round(entry[HH_SCORE] / observed, 3) if observed > 0 else 0.0,
+                "reference_ids": entry[HH_REFS]
+            })
+
+        return {
+            "top_hashtags": top_hashtags,
+            "top_keywords": top_keywords,
+            "time_window": time_window,
+            "total_conversations_analyzed": total_posts,
+            "analysis_timestamp": datetime.now(timezone.utc).isoformat()
+        }
+    except Exception as e:
+        print(f"Error in hashtag extraction: {str(e)}")
+        raise
+
+def cluster_conversations(time_window="120 minutes", cluster_count=5):
+    """
+    Sentiment-split topic clusters for a window from the streaming k-means models
+    """
+    try:
+        if BUCKET_STORE.clusterer is None:
+            raise ImportError("NumPy is required for conversation clustering")
+        cluster_count = max(1, int(cluster_count))
+        # The streaming models keep a fixed number of centroids per sentiment
+        if cluster_count > BUCKET_STORE.clusterer.max_clusters:
+            raise ValueError(f"cluster_count must be at most {BUCKET_STORE.clusterer.max_clusters}")
+        window = shared_window(f'Get recent conversations and their topics from the last {time_window}')
+        BUCKET_STORE.flush_clusters()
+        minutes = parse_time_window(time_window)
+        end_minute = window.end_minute
+
+        sentiment_clusters = {sentiment: [] for sentiment in SENTIMENTS}
+        for cluster_id, entry in BUCKET_STORE.clusters(end_minute, minutes).items():
+            cluster_id = int(cluster_id)
+            terms = sorted(entry["terms"].items(), key=lambda item: (-item[1], item[0]))
+            sentiment_clusters[SENTIMENTS[cluster_id // BUCKET_STORE.clusterer.max_clusters]].append({
+                "cluster_id": cluster_id,
+                "topic_keywords": [term for term, _ in terms if not term.startswith('#')][:5],
+                "conversation_count": entry["count"],
+                "total_engagement": entry["engagement"],
+                "sample_conversations": entry["samples"],
+                "hashtags": [term for term, _ in terms if term.startswith('#')][:5]
+            })
+        for clusters in sentiment_clusters.values():
+            clusters.sort(key=lambda cluster: cluster["conversation_count"], reverse=True)
+            del clusters[cluster_count:]
+
+        return {
+            "sentiment_clusters": sentiment_clusters,
+            "time_window": time_window,
+            "total_conversations": BUCKET_STORE.post_count(end_minute, minutes),
+            "analysis_timestamp": datetime.now(timezone.utc).isoformat()
+        }
+    except Exception as e:
+        print(f"Error in conversation clustering: {str(e)}")
+        raise
+
+def identify_viral_content(time_window="120 minutes", viral_threshold=0.7, max_results=10):
+    """
+    Viral content candidates for a window from the streaming velocity detector
+    """
+    try:
+        window = shared_window(f'Get the most engaging posts from the last {time_window}')
+        minutes = parse_time_window(time_window)
+        viral_threshold = float(viral_threshold)
+        end_minute = window.end_minute
+
+        candidates = BUCKET_STORE.viral.top(end_minute, minutes, viral_threshold, max(1, int(max_results)))
+        return {
+            "viral_candidates": [
+                {field: value for field, value in record.items() if field != "minute"}
+                for record in candidates
+            ],
+            "time_window": time_window,
+            "total_content_analyzed": BUCKET_STORE.post_count(end_minute, minutes),
+            "analysis_timestamp": datetime.now(timezone.utc).isoformat(),
+            "detection_criteria": {
+                "viral_score_threshold": viral_threshold,
+                "velocity_based": True,
+                "anomaly_detection": True
+            }
+        }
+    except Exception as e:
+        print(f"Error in viral content detection: {str(e)}")
+        raise
+
+def parse_text(name, value):
+    value = str(value).strip()
+    if not value:
+        raise ValueError(f"{name.capitalize()} parameter is required")
+    return value
+
+def parse_brands(name, value):
+    """Brands from a JSON array or a comma-separated list, deduplicated ignoring case"""
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            value = json.loads(text) if text.startswith('[') else None
+        except ValueError:
+            value = None
+        if value is None:
+            # Agents also send arrays as "[Nike, Adidas]"
+            value = text.strip('[]').split(',')
+    if not isinstance(value, list):
+        raise ValueError(f"Invalid {name}: {value}")
+    brands = {}
+    for brand in value:
+        brand = str(brand).strip().strip('"\'')
+        if brand:
+            brands.setdefault(brand.lower(), brand)
+    if not brands:
+        raise ValueError(f"{name.capitalize()} parameter is required")
+    if len(brands) > MAX_COMPARED_BRANDS:
+        raise ValueError(f"At most {MAX_COMPARED_BRANDS} brands can be compared")
+    return list(brands.values())
+
+def parse_window(name, value):
+    parse_time_window(value)
+    return str(value)
+
+def parse_count(name, value):
+    try:
+        count = int(float(value))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}: {value}")
+    if count < 1:
+        raise ValueError(f"{name} must be at least 1")
+    return count
+
+def parse_score(name, value):
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}: {value}")
+    if not 0 <= score <= 1:
+        raise ValueError(f"{name} must be between 0 and 1")
+    return score
+
+class SQLiteResultBackend:
+    """Shared result store in a local SQLite file, standing in for DynamoDB off AWS"""
+
+    def __init__(self, path=DEFAULT_RESULT_CACHE_DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key):
+        row = self.conn.execute(
+            "SELECT value FROM results WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, value, expires_at):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), expires_at)
+        )
+        self.conn.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+
+class DynamoDBResultBackend:
+    """Shared result store on a DynamoDB table
+
+    The table needs a string partition key named cache_key; enable TTL on
+    expires_at to have expired results deleted.
+    """
+
+    def __init__(self, table_name, client=None):
+        self.table_name = table_name
+        self.client = client or boto3.client('dynamodb', region_name='us-east-1')
+
+    def get(self, key):
+        item = self.client.get_item(TableName=self.table_name, Key={'cache_key': {'S': key}}).get('Item')
+        # TTL deletion lags, so expired items can still be returned
+        if not item or float(item['expires_at']['N']) <= time.time():
+            return None
+        return json.loads(item['result']['S'])
+
+    def put(self, key, value, expires_at):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                'cache_key': {'S': key},
+                'result': {'S': json.dumps(value)},
+                'expires_at': {'N': str(int(expires_at))}
+            }
+        )
+
+def create_result_backend(backend=None):
+    """Pick the shared result store from RESULT_CACHE_BACKEND, using DynamoDB when a table is configured"""
+    table_name = os.environ.get('RESULT_CACHE_TABLE')
+    backend = backend or os.environ.get('RESULT_CACHE_BACKEND') or ('dynamodb' if table_name else 'sqlite')
+    if backend == 'dynamodb':
+        if not table_name:
+            raise ValueError("RESULT_CACHE_TABLE is required for the dynamodb result cache backend")
+        return DynamoDBResultBackend(table_name)
+    if backend == 'sqlite':
+        return SQLiteResultBackend(os.environ.get('RESULT_CACHE_DB_PATH', DEFAULT_RESULT_CACHE_DB_PATH))
+    if backend == 'none':
+        return None
+    raise ValueError(f"Unknown result cache backend: {backend}")
+
+class ResultCache:
+    """Two-tier cache of operation results: an in-process LRU over a shared backend.
+
+    Results expire at the end of the minute bucket they were computed in.
+    Shared backend errors are logged and count as misses, so the cache can
+    slow a request down but never fail it.
+    """
+
+    def __init__(self, backend=None, size=RESULT_CACHE_SIZE):
+        self.backend = backend
+        self.size = size
+        self.entries = OrderedDict()
+        self.metrics = {"local_hits": 0, "shared_hits": 0, "misses": 0, "errors": 0}
+
+    def get(self, key):
+        """Cached result for key and the tier it came from, or (None, 'miss')"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[1] > time.time():
+                self.entries.move_to_end(key)
+                self.metrics["local_hits"] += 1
+                return entry[0], "local"
+            del self.entries[key]
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key)
+            except Exception as e:
+                print(f"Result cache read failed: {str(e)}")
+                self.metrics["errors"] += 1
+                value = None
+            if value is not None:
+                self._remember(key, value, (int(time.time()) // 60 + 1) * 60)
+                self.metrics["shared_hits"] += 1
+                return value, "shared"
+        self.metrics["misses"] += 1
+        return None, "miss"
+
+    def put(self, key, value, expires_at):
+        self._remember(key, value, expires_at)
+        if self.backend is not None:
+            try:
+                self.backend.put(key, value, expires_at)
+            except Exception as e:
+                print(f"Result cache write failed: {str(e)}")
+                self.metrics["errors"] += 1
+
+    def _remember(self, key, value, expires_at):
+        self.entries[key] = (value, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+RESULT_CACHE = None
+
+def get_result_cache():
+    """Shared result cache, created on first use, or None when RESULT_CACHE_SIZE is 0"""
+    global RESULT_CACHE
+    if RESULT_CACHE_SIZE <= 0:
+        return None
+    if RESULT_CACHE is None:
+        try:
+            backend = create_result_backend()
+        except Exception as e:
+            print(f"Result cache backend unavailable, caching in process only: {str(e)}")
+            backend = None
+        RESULT_CACHE = ResultCache(backend)
+    return RESULT_CACHE
+
+REQUIRED = object()
+
+# Operations of both OpenAPI specs with their request parameters as
+# name -> (handler argument, parser, default); REQUIRED marks required ones
+OPERATIONS = {
+    '/analyze-brand-sentiment': (analyze_brand_sentiment, {
+        "brand": ("brand", parse_text, REQUIRED),
+        "timeWindow": ("time_window", parse_window, "2h")
+    }),
+    '/detect-fake-news': (detect_fake_news, {
+        "brand": ("brand", parse_text, REQUIRED),
+        "timeWindow": ("time_window", parse_window, "2h")
+    }),
+    '/compare-brand-sentiment': (compare_brand_sentiment, {
+        "brands": ("brands", parse_brands, REQUIRED),
+        "timeWindow": ("time_window", parse_window, "2h")
+    }),
+    '/cluster-conversations': (cluster_conversations, {
+        "time_window": ("time_window", parse_window, "120 minutes"),
+        "cluster_count": ("cluster_count", parse_count, 5)
+    }),
+    '/extract-top-hashtags-keywords': (extract_top_hashtags_keywords, {
+        "time_window": ("time_window", parse_window, "120 minutes"),
+        "limit": ("limit", parse_count, 10)
+    }),
+    '/identify-viral-content': (identify_viral_content, {
+        "time_window": ("time_window", parse_window, "120 minutes"),
+        "viral_threshold": ("viral_threshold", parse_score, 0.7),
+        "max_results": ("max_results", parse_count, 10)
+    })
+}
+
+def parse_parameters(event, parameters):
+    """Validated handler arguments from the request body properties"""
+    content = (event.get('requestBody') or {}).get('content', {}).get('application/json') or {}
+    values = {
+        prop['name']: prop['value'] for prop in content.get('properties', [])
+        if prop.get('name') and prop.get('value') not in (None, '')
+    }
+    arguments = {}
+    for name, (argument, parse, default) in parameters.items():
+        if name in values:
+            arguments[argument] = parse(name, values[name])
+        elif default is REQUIRED:
+            raise ValueError(f"{name.capitalize()} parameter is required")
+        else:
+            arguments[argument] = default
+    return arguments
+
+def result_cache_key(api_path, parameters, arguments, minute):
+    """Cache key from the API path, the normalized arguments and the minute bucket"""
+    parts = [api_path, str(minute)]
+    for argument, parse, _ in sorted(parameters.values(), key=lambda parameter: parameter[0]):
+        value = arguments[argument]
+        if parse is parse_window:
+            value = parse_time_window(value)
+        elif isinstance(value, str):
+            value = value.lower()
+        elif isinstance(value, list):
+            value = ",".join(sorted(str(item).lower() for item in value))
+        parts.append(f"{argument}={value}")
+    return "|".join(parts)
+
+def call_operation(api_path, handler, parameters, arguments):
+    """Run an operation, answering repeats within the same minute bucket from the result cache"""
+    cache = get_result_cache()
+    if cache is None:
+        return handler(**arguments)
+    minute = int(time.time()) // 60
+    key = result_cache_key(api_path, parameters, arguments, minute)
+    result, tier = cache.get(key)
+    if result is None:
+        result = handler(**arguments)
+        cache.put(key, result, (minute + 1) * 60)
+    else:
+        # Keys are normalized, so echo the brand and window exactly as asked
+        result = dict(result)
+        for name, (argument, parse, _) in parameters.items():
+            if name in result and parse in (parse_text, parse_brands, parse_window):
+                result[name] = arguments[argument]
+    print(json.dumps({"result_cache": tier, "api_path": api_path, **cache.metrics}))
+    return result
+
 def lambda_handler(event, context):
     try:
         print(f"Received event: {json.dumps(event, indent=2)}")
-        
-        # Extract parameters
-        brand = None
-        time_window = "2h"  # default value
-        
-        if ('requestBody' in event and 'content' in event['requestBody'] and 
-            'application/json' in event['requestBody']['content']):
-            properties = event['requestBody']['content']['application/json'].get('properties', [])
-            for prop in properties:
-                if prop.get('name') == 'brand':
-                    brand = prop.get('value')
-                elif prop.get('name') == 'timeWindow':
-                    if prop.get('value'):
-                        time_window = prop.get('value')
-        
-        if not brand:
-            raise ValueError("Brand parameter is required")
+        report_init_timings()
 
-        # Determine which analysis to perform based on API path
         api_path = event.get('apiPath', '')
-        
-        if api_path == '/analyze-brand-sentiment':
-            response_data = analyze_brand_sentiment(brand, time_window)
-        elif api_path == '/detect-fake-news':
-            response_data = detect_fake_news(brand, time_window)
-        else:
+        if api_path not in OPERATIONS:
             raise ValueError(f"Unknown API path: {api_path}")
+        handler, parameters = OPERATIONS[api_path]
+        start_turn(event)
+        response_data = call_operation(api_path, handler, parameters, parse_parameters(event, parameters))
 
         return {
             "messageVersion": "1.0",